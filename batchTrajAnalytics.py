@@ -0,0 +1,319 @@
+"""Processes many trajectory files in parallel.
+
+    python batchTrajAnalytics.py "runs/*.hdf" ./data/i80.txt -o ./results \\
+        --start_time "2005-04-13 17:00:00" --end_time "2005-04-13 17:30:00" \\
+        --processes 4 --memory 8G --report
+
+Files ending in .hdf or .h5 are read as model data and every other file as raw
+NGSIM trajectories. Every file is processed by its own worker process, whose
+address space is limited to the memory budget, and gets an output directory
+with its tables (and the pdf report with --report). The summary of all the
+files is written to summary.csv in the output directory. A report that fails
+is recorded in the report and reportError columns and does not fail the
+tables of its file."""
+
+import os                       # operating system io commands
+import sys
+import glob
+import time
+import argparse
+import traceback
+import multiprocessing
+
+import numpy as np              # numerical computing with arrays
+import pandas as pd             # dataframe as in R
+
+from vehicleTrajectoryAnalytics import VTAnalytics
+from trajectoryCache import DatasetCache
+from instrumentation import StageRecorder
+
+MODEL_EXTENSIONS = ('.hdf', '.h5')
+
+SUMMARY_COLUMNS = ['file', 'status', 'rows', 'vehicles', 'lanes', 'start', 'end',
+                   'meanSpeed', 'medianSpeed', 'meanAbsAcceleration', 'laneChanges',
+                   'meanTravelTime', 'meanCorridorSpeed', 'seconds', 'peakMemoryMB', 'error',
+                   'report', 'reportError']
+
+
+def parseBytes(value):
+    """Returns the number of bytes of a size such as 512M or 8G"""
+
+    units = {'K':2**10, 'M':2**20, 'G':2**30, 'T':2**40}
+
+    value = value.strip().upper().rstrip('B')
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+
+    return int(value)
+
+
+def parseTime(value):
+    """Returns a time given either in seconds or as a date and time"""
+
+    try:
+        return float(value)
+    except ValueError:
+        return np.datetime64(value)
+
+
+def _timeInSeconds(value):
+    """NGSIM times are seconds since the epoch"""
+
+    if isinstance(value, np.datetime64):
+        return (value - np.datetime64('1970-01-01T00:00:00')) / np.timedelta64(1, 's')
+
+    return value
+
+
+def expandInputs(patterns):
+    """Returns the files matching a list of file names and glob patterns in
+    the order they are given, without duplicates"""
+
+    files = []
+    for pattern in patterns:
+
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for fileName in matches:
+            if fileName not in files:
+                files.append(fileName)
+
+    return files
+
+
+def outputName(fileName, files):
+    """Returns the name of the output directory of a file. The parent directory
+    is added when two input files have the same name"""
+
+    name = os.path.splitext(os.path.basename(fileName))[0]
+    others = [f for f in files if f != fileName and
+              os.path.splitext(os.path.basename(f))[0] == name]
+
+    if others:
+        parent = os.path.basename(os.path.dirname(os.path.abspath(fileName)))
+        name = "%s_%s" % (parent, name)
+
+    return name
+
+
+def readFile(fileName, options):
+
+    cache = DatasetCache(options.cache) if options.cache else None
+
+    if fileName.lower().endswith(MODEL_EXTENSIONS):
+        return VTAnalytics.readModelData(fileName, start_time=options.start_time,
+                                         end_time=options.end_time, cache=cache,
+                                         compact=options.compact)
+
+    return VTAnalytics.readNGISIMData(fileName, start_time=_timeInSeconds(options.start_time),
+                                      end_time=_timeInSeconds(options.end_time),
+                                      chunksize=options.chunksize, cache=cache,
+                                      compact=options.compact)
+
+
+def summarize(vt):
+    """Returns the summary row of a dataset"""
+
+    df = vt.df
+    travelTimes = vt.calculateCorridorTravelTimes()
+
+    duration = travelTimes.dur
+    if duration.dtype.kind == 'm':
+        duration = duration.dt.total_seconds()
+
+    return {'rows':df.shape[0],
+            'vehicles':travelTimes.shape[0],
+            'lanes':df._lane.nunique(),
+            'start':df._time.min(),
+            'end':df._time.max(),
+            'meanSpeed':df._spd.mean(),
+            'medianSpeed':df._spd.median(),
+            'meanAbsAcceleration':df._acc.abs().mean(),
+            'laneChanges':int(df._leaveLane.sum()),
+            'meanTravelTime':duration.mean(),
+            'meanCorridorSpeed':travelTimes._spd.replace([np.inf, -np.inf], np.nan).mean()}
+
+
+def writeOutputs(vt, outputDir):
+    """Writes the tables of a dataset into outputDir"""
+
+    vt.calculateCorridorTravelTimes().to_csv(os.path.join(outputDir, 'travelTimes.csv'), index=False)
+    vt.getTTCDistribution().to_csv(os.path.join(outputDir, 'ttc.csv'))
+    vt.getARMSDistribution().to_csv(os.path.join(outputDir, 'arms.csv'), index=False)
+    vt.getNumOfLaneChangesPerLane().to_csv(os.path.join(outputDir, 'laneChanges.csv'), index=False)
+    vt.df_macro.to_csv(os.path.join(outputDir, 'macro.csv'))
+
+
+def writeReport(vt, outputDir):
+    """Writes the pdf report of a dataset into outputDir"""
+
+    #the worker is already one process of the pool so the charts are rendered serially
+    from reportPipeline import buildReport, reportJobs
+    times = vt.df._time.values
+    lanes = sorted(vt.df._lane.unique())
+    buildReport(vt, outputDir, processes=1,
+                jobs=reportJobs(times.min(), times.max(), lanes))
+
+
+def _peakMemoryMB():
+
+    try:
+        import resource
+    except ImportError:
+        return np.nan
+
+    #ru_maxrss is in kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _limitMemory(max_bytes):
+    """Limits the address space of the worker process. Allocations beyond the
+    limit raise a MemoryError instead of swapping or being killed"""
+
+    if not max_bytes:
+        return
+
+    try:
+        import resource
+    except ImportError:
+        return
+
+    resource.setrlimit(resource.RLIMIT_AS, (max_bytes, max_bytes))
+
+
+def _writeTraceback(fileName):
+
+    with open(fileName, 'w') as f:
+        f.write(traceback.format_exc())
+
+
+def processFile(job):
+    """Reads one file, writes its outputs and returns its summary row.
+    Errors are reported in the summary instead of stopping the batch. The
+    errors of the report are reported apart from those of the data"""
+
+    fileName, outputDir, options = job
+
+    row = dict.fromkeys(SUMMARY_COLUMNS)
+    row['file'] = fileName
+
+    start = time.perf_counter()
+    try:
+        if not os.path.exists(outputDir):
+            os.makedirs(outputDir)
+
+        #the stages are timed without tracing the memory, which would slow them 
+        #down, and are also written when the file fails 
+        recorder = StageRecorder(memory=False)
+        try:
+            with recorder:
+                vt = readFile(fileName, options)
+                row.update(summarize(vt))
+                writeOutputs(vt, outputDir)
+
+                if options.report:
+                    try:
+                        writeReport(vt, outputDir)
+                        row['report'] = 'ok'
+                    except Exception as e:
+                        row['report'] = 'error'
+                        row['reportError'] = "%s: %s" % (type(e).__name__, e)
+                        _writeTraceback(os.path.join(outputDir, 'report_error.txt'))
+        finally:
+            if options.stages:
+                recorder.toFrame().to_csv(os.path.join(outputDir, 'stages.csv'), index=False)
+
+        row['status'] = 'ok'
+
+    except MemoryError:
+        row['status'] = 'memory'
+        row['error'] = "memory budget of %s bytes exceeded" % options.memory
+
+    except Exception as e:
+        row['status'] = 'error'
+        row['error'] = "%s: %s" % (type(e).__name__, e)
+        if os.path.isdir(outputDir):
+            _writeTraceback(os.path.join(outputDir, 'error.txt'))
+
+    row['seconds'] = time.perf_counter() - start
+    row['peakMemoryMB'] = _peakMemoryMB()
+
+    return row
+
+
+def runBatch(files, outputDir, options):
+    """Processes the files in a pool of worker processes and returns the
+    summary table in the order of the files. A single file or --processes 1
+    also uses a worker process, so the memory budget always applies"""
+
+    jobs = [(f, os.path.join(outputDir, outputName(f, files)), options) for f in files]
+
+    processes = max(min(options.processes or os.cpu_count() or 1, len(jobs)), 1)
+
+    #every worker processes a single file so its memory is returned to the
+    #system, and its peak memory is measured, file by file
+    pool = multiprocessing.Pool(processes, initializer=_limitMemory,
+                                initargs=(options.memory,), maxtasksperchild=1)
+    try:
+        rows = []
+        for row in pool.imap(processFile, jobs):
+            print("%-8s %7.1fs %s%s" % (row['status'], row['seconds'], row['file'],
+                                        " (report failed)" if row['report'] == 'error' else ""))
+            rows.append(row)
+    finally:
+        pool.close()
+        pool.join()
+
+    return pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+
+
+def parseArguments(argv=None):
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help='trajectory files or glob patterns')
+    parser.add_argument('-o', '--output', default='./results', help='output directory')
+    parser.add_argument('--start_time', type=parseTime, default=None,
+                        help='start of the time window, a date and time or seconds since the epoch')
+    parser.add_argument('--end_time', type=parseTime, default=None)
+    parser.add_argument('--processes', type=int, default=None,
+                        help='number of worker processes, defaults to the number of cores')
+    parser.add_argument('--memory', type=parseBytes, default=None,
+                        help='memory budget of every worker, e.g. 8G')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='stream NGSIM files this many rows at a time')
+    parser.add_argument('--cache', default=None, help='directory of the dataset cache')
+    parser.add_argument('--compact', action='store_true', help='use compact dtypes')
+    parser.add_argument('--report', action='store_true', help='also write the pdf report of every file')
+    parser.add_argument('--stages', action='store_true', 
+                        help='write the wall time and rows of every processing stage to stages.csv')
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+
+    options = parseArguments(argv)
+
+    files = expandInputs(options.inputs)
+    if not files:
+        print("no input files")
+        return 1
+
+    if not os.path.exists(options.output):
+        os.makedirs(options.output)
+
+    summary = runBatch(files, options.output, options)
+    summary.to_csv(os.path.join(options.output, 'summary.csv'), index=False)
+
+    reportErrors = (summary.report == 'error').sum()
+
+    print("%d of %d files processed, %d reports failed, summary written to %s" %
+          ((summary.status == 'ok').sum(), len(files), reportErrors,
+           os.path.join(options.output, 'summary.csv')))
+
+    return 0 if (summary.status == 'ok').all() and reportErrors == 0 else 1
+
+
+if __name__ == "__main__":
+
+    sys.exit(main())
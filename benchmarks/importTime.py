@@ -0,0 +1,82 @@
+"""Checks the import time of the numeric core against a budget.
+
+    python benchmarks/importTime.py --budget 0.15 --repeat 7
+
+Every measurement is made in a fresh interpreter. numpy and pandas are imported
+first and timed on their own, so the budget applies to the time the package
+adds on top of them. The check fails if importing the core loads any of the
+plotting or reporting libraries, or if the median added time exceeds the budget."""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#modules that must not be loaded by importing the numeric core
+HEAVY_MODULES = ['matplotlib', 'matplotlib.pyplot', 'seaborn', 'reportlab', 'pdb']
+
+_SCRIPT = """
+import sys, time, json
+sys.path.insert(0, %r)
+start = time.perf_counter()
+import numpy, pandas
+base = time.perf_counter()
+import %s
+end = time.perf_counter()
+print(json.dumps({'base':base - start, 'module':end - base,
+                  'loaded':[m for m in %r if m in sys.modules]}))
+"""
+
+
+def measure(module, repeat):
+    """Imports the module in repeat fresh interpreters and returns the
+    measurements of every run"""
+
+    script = _SCRIPT % (ROOT, module, HEAVY_MODULES)
+
+    runs = []
+    for i in range(repeat):
+        out = subprocess.check_output([sys.executable, '-c', script])
+        runs.append(json.loads(out.decode().strip().splitlines()[-1]))
+
+    return runs
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='vehicleTrajectoryAnalytics')
+    parser.add_argument('--budget', type=float, default=0.15,
+                        help='seconds the module may add to the import of numpy and pandas')
+    parser.add_argument('--repeat', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    runs = measure(args.module, args.repeat)
+
+    base = np.median([r['base'] for r in runs])
+    added = np.median([r['module'] for r in runs])
+    loaded = sorted(set(m for r in runs for m in r['loaded']))
+
+    print("%-28s %.3fs" % ("numpy + pandas", base))
+    print("%-28s %.3fs (budget %.3fs)" % (args.module, added, args.budget))
+
+    failed = False
+    if loaded:
+        print("FAIL: importing %s loads %s" % (args.module, ", ".join(loaded)))
+        failed = True
+    if added > args.budget:
+        print("FAIL: import time over budget")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+
+    sys.exit(main())
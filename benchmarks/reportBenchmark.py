@@ -0,0 +1,115 @@
+"""Times the standard report of a dataset.
+
+    python benchmarks/reportBenchmark.py ./data/ai21.hdf --processes 1 4 --repeat 3
+
+Every configuration builds report.pdf and tables.xlsx for the standard chart
+set into a temporary directory. The 'disk' mode saves every chart to a png
+file before adding it to the pdf, which is how the report used to be built."""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib
+matplotlib.use('Agg')
+
+import reportPipeline
+from vehicleTrajectoryAnalytics import VTAnalytics, PdfReport
+
+
+def readData(fileName, start_time, end_time):
+
+    if fileName.endswith("hdf"):
+        return VTAnalytics.readModelData(fileName, start_time=start_time, end_time=end_time)
+
+    return VTAnalytics.readNGISIMData(fileName, start_time=start_time, end_time=end_time)
+
+
+def buildReportOnDisk(vt, outputDir, jobs):
+    """Builds the report the way it was built before the pipeline existed:
+    one chart after the other, each saved to a png file and read back"""
+
+    import matplotlib.pyplot as plt
+
+    pdfReport = PdfReport(os.path.join(outputDir, 'report.pdf'), reportPipeline.PAGE_SIZE)
+    writer = pd.ExcelWriter(os.path.join(outputDir, 'tables.xlsx'))
+
+    for job in jobs:
+
+        fig, ax = plt.subplots(figsize=(10, 8), dpi=100)
+        table = job.render(vt, fig, ax)
+
+        out_fileName = os.path.join(outputDir, job.fileName)
+        fig.savefig(out_fileName, dpi=100)
+        plt.close(fig)
+
+        pdfReport.addChart2(out_fileName, job.title)
+        if job.sheet is not None:
+            table.to_excel(writer, sheet_name=job.sheet)
+
+    writer.close()
+    pdfReport.write()
+
+
+def timeReport(build, repeat):
+
+    times = []
+    for i in range(repeat):
+
+        outputDir = tempfile.mkdtemp()
+        try:
+            start = time.perf_counter()
+            build(outputDir)
+            times.append(time.perf_counter() - start)
+        finally:
+            shutil.rmtree(outputDir)
+
+    return min(times), np.median(times)
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('fileName', help='model data (.hdf) or NGSIM trajectories (.txt)')
+    parser.add_argument('--start_time', default='2005-04-13 17:00:00')
+    parser.add_argument('--end_time', default='2005-04-13 17:30:00')
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--vector', action='store_true', help='also time the vector (svg) report')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    vt = readData(args.fileName, np.datetime64(args.start_time), np.datetime64(args.end_time))
+    print("read %d rows in %.2fs" % (vt.df.shape[0], time.perf_counter() - start))
+
+    jobs = reportPipeline.reportJobs()
+
+    configs = [('disk', 1, lambda d: buildReportOnDisk(vt, d, jobs))]
+    for processes in sorted(set(args.processes)):
+        configs.append(('png', processes,
+                        lambda d, p=processes: reportPipeline.buildReport(vt, d, p, jobs)))
+        if args.vector:
+            configs.append(('svg', processes,
+                            lambda d, p=processes: reportPipeline.buildReport(vt, d, p, jobs, vector=True)))
+
+    result = []
+    for mode, processes, build in configs:
+        best, median = timeReport(build, args.repeat)
+        result.append((mode, processes, len(jobs), best, median))
+        print("%-5s processes=%-3d best %.2fs median %.2fs" % (mode, processes, best, median))
+
+    return pd.DataFrame(result, columns=['mode', 'processes', 'charts', 'best', 'median'])
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,397 @@
+"""Times and memory profiles the public methods on synthetic data.
+
+    python benchmarks/scalingBenchmark.py --min_rows 1e5 --max_rows 1e8 -o scaling.csv
+    python benchmarks/scalingBenchmark.py --max_rows 1e7 --compare scaling.csv
+
+For every power of ten between min_rows and max_rows a synthetic NGSIM file (and
+a model HDF file when pytables is installed) is written to a temporary directory.
+The readers and their modes (chunked, compact, multi-core, cached, partitioned)
+are timed, and so are the VTAnalytics methods and charts on both the NGSIM and
+the model dataset, the PartitionedVTAnalytics methods and LiveMacroStats. Every
+call is timed over --repeat calls and called once more under tracemalloc to
+measure the peak of the memory it allocates. The result has one row per
+dataset, method and size, and the scaling exponent of every method is estimated
+from the largest sizes. The exit status is 1 when a call fails, and with
+--compare also when a method became slower than the tolerance allows."""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib
+matplotlib.use('Agg')
+
+import syntheticTrajectories
+from vehicleTrajectoryAnalytics import VTAnalytics
+from partitionedAnalytics import PartitionedVTAnalytics
+from liveMacroStats import LiveMacroStats
+from trajectoryCache import DatasetCache
+
+#the time span of the frames fed to LiveMacroStats in seconds
+LIVE_FRAME_SECONDS = 10
+
+RESULT_COLUMNS = ['data', 'rows', 'method', 'seconds', 'peakMB', 'error']
+
+#the methods that need the _ttc column of the NGSIM data
+TTC_METHODS = ['getTTCDistribution', 'ttcHistogram']
+
+
+def _figure():
+
+    import matplotlib.pyplot as plt
+
+    return plt.subplots(figsize=(10, 8), dpi=100)
+
+
+def _plot(method, *args, **kwargs):
+    """Calls a chart method on a new figure and closes the figure"""
+
+    import matplotlib.pyplot as plt
+
+    fig, ax = _figure()
+    try:
+        return method(fig, ax, *args, **kwargs)
+    finally:
+        plt.close(fig)
+
+
+def _plotAxes(method, *args, **kwargs):
+
+    import matplotlib.pyplot as plt
+
+    fig, ax = _figure()
+    try:
+        return method(*(args + (ax,)), **kwargs)
+    finally:
+        plt.close(fig)
+
+
+def _plotFigure(method, **kwargs):
+
+    import matplotlib.pyplot as plt
+
+    fig, ax = _figure()
+    try:
+        return method(fig, **kwargs)
+    finally:
+        plt.close(fig)
+
+
+def methodCalls(vt, workDir):
+    """Returns the calls of the public methods of a prepared dataset as
+    (name, function) pairs. Every function takes no arguments"""
+
+    times = vt.df._time.values
+    start, end = times.min(), times.min() + (times.max() - times.min()) / 4
+    storeDir = os.path.join(workDir, 'store')
+    stations = np.arange(0, vt.df._locy.max(), 500)
+    vehicles = vt.df._vid.unique()[:10]
+
+    def saveColumnStore():
+        if os.path.exists(storeDir):
+            shutil.rmtree(storeDir)
+        os.makedirs(storeDir)
+        vt.saveColumnStore(storeDir)
+
+    def dfMacro():
+        #the property caches the table of the current bins
+        vt._df_macro = None
+        return vt.df_macro
+
+    calls = [('__init__', lambda: VTAnalytics(vt.df)),
+             ('describe', lambda: VTAnalytics.describe(vt.df._spd)),
+             ('compactFrame', lambda: VTAnalytics.compactFrame(vt.df)),
+             ('resample', lambda: vt.resample(1)),
+             ('window', lambda: vt.window(1, start, end)),
+             ('window_distance', lambda: vt.window(1, start, end, 0, 1000)),
+             ('getTTCDistribution', vt.getTTCDistribution),
+             ('calculateCorridorTravelTimes', vt.calculateCorridorTravelTimes),
+             ('getAccelerationJerk', vt.getAccelerationJerk),
+             ('getARMSDistribution', vt.getARMSDistribution),
+             ('getNumOfLaneChangesPerLane', vt.getNumOfLaneChangesPerLane),
+             ('recalculateMacroVars', lambda: vt.recalculateMacroVars(vt.space_bin, vt.time_bin)),
+             ('recalculateLaneChangeRates', lambda: vt.recalculateLaneChangeRates(vt.space_bin, vt.time_bin)),
+             ('df_macro', dfMacro),
+             ('speedHistogram', vt.speedHistogram),
+             ('accelerationHistogram', vt.accelerationHistogram),
+             ('ttcHistogram', vt.ttcHistogram),
+             ('getDetectorData', lambda: vt.getDetectorData(stations)),
+             ('saveColumnStore', saveColumnStore),
+             ('openColumnStore', lambda: VTAnalytics.openColumnStore(storeDir)),
+             ('plotSpeedDistribution', lambda: _plotAxes(vt.plotSpeedDistribution)),
+             ('plotAccelerationDistribution', lambda: _plotAxes(vt.plotAccelerationDistribution)),
+             ('plotJerkDistribution', lambda: _plotAxes(vt.plotJerkDistribution, vt.df1s)),
+             ('plotARMS', lambda: _plotAxes(vt.plotARMS, vt.getARMSDistribution())),
+             ('plotMeanCorridorSpeedDistribution',
+              lambda: _plotAxes(vt.plotMeanCorridorSpeedDistribution, vt.calculateCorridorTravelTimes())),
+             ('plotAllTrajectories', lambda: _plot(vt.plotAllTrajectories, 1, start, end, 0, 1000)),
+             ('plotAllTrajectories_raster',
+              lambda: _plot(vt.plotAllTrajectories, 1, start, end, 0, 1000, raster=True)),
+             ('plotSelectedTrajectories', lambda: _plot(vt.plotSelectedTrajectories, vehicles)),
+             ('plotSpeedVsDensity', lambda: _plot(vt.plotSpeedVsDensity)),
+             ('plotSpeedVsDensityByLane', lambda: _plotFigure(vt.plotSpeedVsDensityByLane)),
+             ('plotLCR', lambda: _plotFigure(vt.plotLCR))]
+
+    #the model data has no gaps, so no time to collision
+    if '_ttc' not in vt.df.columns:
+        calls = [(name, function) for name, function in calls if name not in TTC_METHODS]
+
+    return calls
+
+
+def partitionedCalls(p, stations):
+    """Returns the calls of the public methods of a partitioned dataset with
+    detectors at the stations"""
+
+    def dfMacro():
+        p._df_macro = None
+        return p.df_macro
+
+    return [('partitioned.describe', lambda: p.describe('_spd')),
+            ('partitioned.speedHistogram', p.speedHistogram),
+            ('partitioned.accelerationHistogram', p.accelerationHistogram),
+            ('partitioned.ttcHistogram', p.ttcHistogram),
+            ('partitioned.getTTCDistribution', p.getTTCDistribution),
+            ('partitioned.getARMSDistribution', p.getARMSDistribution),
+            ('partitioned.calculateCorridorTravelTimes', p.calculateCorridorTravelTimes),
+            ('partitioned.getNumOfLaneChangesPerLane', p.getNumOfLaneChangesPerLane),
+            ('partitioned.recalculateMacroVars', lambda: p.recalculateMacroVars(p.space_bin, p.time_bin)),
+            ('partitioned.df_macro', dfMacro),
+            ('partitioned.getDetectorData', lambda: p.getDetectorData(stations))]
+
+
+def liveFeed(vt):
+    """Returns a call that feeds the rows of a dataset to LiveMacroStats in
+    frames of LIVE_FRAME_SECONDS in time order"""
+
+    df = vt.df[['_vid', '_time', '_locy', '_lane', '_spd']]
+    elapsed = np.asarray(df._time.values - df._time.values.min())
+    if elapsed.dtype.kind == 'm':
+        elapsed = elapsed / np.timedelta64(1, 's')
+
+    frameIds = (elapsed // LIVE_FRAME_SECONDS).astype(np.int64)
+    frames = [frame for key, frame in df.groupby(frameIds, sort=True)]
+
+    def feed():
+        live = LiveMacroStats(vt.space_bin, vt.time_bin, horizon=600,
+                              time_step=_seconds(vt.time_step))
+        for frame in frames:
+            live.update(frame)
+        return live.variables()
+
+    return feed
+
+
+def _seconds(timeStep):
+
+    if isinstance(timeStep, (pd.Timedelta, np.timedelta64)):
+        return pd.Timedelta(timeStep).total_seconds()
+
+    return float(timeStep)
+
+
+def measure(function, memory=True, repeat=2):
+    """Returns the shortest wall time of repeat calls and the peak of the memory
+    a call allocates in MB. The peak is measured in another call under tracemalloc"""
+
+    seconds = np.inf
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds = min(seconds, time.perf_counter() - start)
+
+    peak = np.nan
+    if memory:
+        tracemalloc.start()
+        try:
+            function()
+            peak = tracemalloc.get_traced_memory()[1] / 2.0**20
+        finally:
+            tracemalloc.stop()
+
+    return seconds, peak
+
+
+def _run(result, data, rows, name, function, memory, repeat):
+    """Measures a call and adds its row to result. A failing call is recorded
+    with its error, which fails the run"""
+
+    try:
+        seconds, peak = measure(function, memory, repeat)
+        error = None
+    except Exception as e:
+        seconds, peak, error = np.nan, np.nan, "%s: %s" % (type(e).__name__, e)
+
+    result.append({'data':data, 'rows':rows, 'method':name, 'seconds':seconds, 'peakMB':peak,
+                   'error':error})
+    print("%-6s %10d %-42s %9.3fs %10.1fMB %s" % (data, rows, name, seconds, peak, error or ''))
+
+
+def _modelDataset(rows, seed):
+    """Returns the synthetic model dataset prepared like readModelData. Used
+    when pytables is not installed and no model HDF file can be written"""
+
+    ai = VTAnalytics._addModelAliases(syntheticTrajectories.syntheticModelFrame(rows, seed))
+    ai, vehicleOrder = VTAnalytics._prepareModelData(ai)
+
+    return VTAnalytics(ai, orders={'vehicle':vehicleOrder})
+
+
+def benchmarkSize(rows, workDir, memory=True, seed=0, repeat=2):
+    """Benchmarks the readers and the methods on the synthetic NGSIM and model
+    datasets of about the given number of rows"""
+
+    result = []
+
+    ngsimFile = os.path.join(workDir, 'synthetic.txt')
+    written = syntheticTrajectories.writeNGSIM(ngsimFile, rows, seed)
+    duration = syntheticTrajectories.TrajectoryGenerator(rows, seed).duration
+
+    cacheDir = os.path.join(workDir, 'cache')
+    slabDir = os.path.join(workDir, 'slabs')
+
+    def partitioned():
+        if os.path.exists(slabDir):
+            shutil.rmtree(slabDir)
+        return PartitionedVTAnalytics.readNGISIMData(ngsimFile, slabDir,
+                                                     slab_seconds=max(duration / 4, 1))
+
+    readers = [('readNGISIMData', lambda: VTAnalytics.readNGISIMData(ngsimFile)),
+               ('readNGISIMData_chunked',
+                lambda: VTAnalytics.readNGISIMData(ngsimFile, chunksize=max(written // 4, 1))),
+               ('readNGISIMData_compact', lambda: VTAnalytics.readNGISIMData(ngsimFile, compact=True)),
+               ('readNGISIMData_processes', lambda: VTAnalytics.readNGISIMData(ngsimFile, processes=2)),
+               #the first call fills the cache, the shortest time is that of a hit
+               ('readNGISIMData_cached',
+                lambda: VTAnalytics.readNGISIMData(ngsimFile, cache=DatasetCache(cacheDir))),
+               ('partitioned.readNGISIMData', partitioned)]
+
+    for name, function in readers:
+        _run(result, 'ngsim', written, name, function, memory, repeat)
+
+    datasets = [('ngsim', VTAnalytics.readNGISIMData(ngsimFile))]
+
+    try:
+        import tables
+        modelFile = os.path.join(workDir, 'synthetic.hdf')
+        syntheticTrajectories.writeModelHDF(modelFile, rows, seed)
+        _run(result, 'model', written, 'readModelData', lambda: VTAnalytics.readModelData(modelFile),
+             memory, repeat)
+        datasets.append(('model', VTAnalytics.readModelData(modelFile)))
+    except ImportError:
+        datasets.append(('model', _modelDataset(rows, seed)))
+
+    for data, vt in datasets:
+
+        vt.getAccelerationJerk()
+        dataDir = os.path.join(workDir, data)
+        os.makedirs(dataDir)
+
+        calls = methodCalls(vt, dataDir) + [('LiveMacroStats.update', liveFeed(vt))]
+        for name, function in calls:
+            _run(result, data, written, name, function, memory, repeat)
+
+    p = PartitionedVTAnalytics.open(slabDir) if os.path.exists(slabDir) else partitioned()
+    stations = np.arange(0, datasets[0][1].df._locy.max(), 500)
+    for name, function in partitionedCalls(p, stations):
+        _run(result, 'ngsim', written, name, function, memory, repeat)
+
+    return result
+
+
+def scalingExponents(df):
+    """Returns the slope of log(seconds) over log(rows) between the two
+    largest sizes of every dataset and method"""
+
+    exponents = {}
+    for method, group in df.dropna(subset=['seconds']).groupby(['data', 'method']):
+
+        group = group.sort_values('rows').tail(2)
+        if group.shape[0] < 2 or (group.seconds <= 0).any():
+            continue
+
+        exponents[method] = (np.diff(np.log(group.seconds.values)) /
+                             np.diff(np.log(group.rows.values.astype(np.float64))))[0]
+
+    return pd.Series(exponents, name='exponent', dtype=np.float64)
+
+
+def compare(df, baseline, tolerance):
+    """Returns the rows of the methods that are slower than tolerance times
+    the baseline at the same size. Baselines written before the model dataset
+    was benchmarked only have NGSIM rows"""
+
+    if 'data' not in baseline.columns:
+        baseline = baseline.assign(data='ngsim')
+
+    merged = df.merge(baseline, on=['data', 'method', 'rows'], suffixes=('', '_baseline'))
+    merged['ratio'] = merged.seconds / merged.seconds_baseline
+
+    return merged[merged.ratio > tolerance][['data', 'method', 'rows', 'seconds', 'seconds_baseline',
+                                             'ratio']]
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--min_rows', type=float, default=1e5)
+    parser.add_argument('--max_rows', type=float, default=1e6)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=2, help='the shortest of repeat calls is reported')
+    parser.add_argument('--no_memory', action='store_true', help='only measure the wall time')
+    parser.add_argument('-o', '--output', default=None, help='csv file of the results')
+    parser.add_argument('--compare', default=None, help='csv file of a previous run')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='slow down relative to the previous run that counts as a regression')
+    args = parser.parse_args(argv)
+
+    sizes = [10**k for k in range(int(np.log10(args.min_rows)), int(np.log10(args.max_rows)) + 1)]
+
+    result = []
+    for rows in sizes:
+
+        workDir = tempfile.mkdtemp()
+        try:
+            result.extend(benchmarkSize(rows, workDir, not args.no_memory, args.seed, args.repeat))
+        finally:
+            shutil.rmtree(workDir)
+
+    df = pd.DataFrame(result, columns=RESULT_COLUMNS)
+
+    if len(sizes) > 1:
+        print(scalingExponents(df).round(2).to_string())
+
+    if args.output:
+        df.to_csv(args.output, index=False)
+
+    status = 0
+
+    failed = df[df.error.notnull()]
+    if failed.shape[0]:
+        print("%d calls failed" % failed.shape[0])
+        print(failed[['data', 'rows', 'method', 'error']].to_string(index=False))
+        status = 1
+
+    if args.compare:
+        slower = compare(df, pd.read_csv(args.compare), args.tolerance)
+        if slower.shape[0]:
+            print("methods slower than %.1f times the previous run" % args.tolerance)
+            print(slower.to_string(index=False))
+            status = 1
+
+    return status
+
+
+if __name__ == "__main__":
+
+    sys.exit(main())
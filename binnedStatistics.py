@@ -0,0 +1,159 @@
+"""Count, sum and sum of squares of a column per bin of one or more keys.
+
+BinnedStatistic reduces the rows of every bin with np.bincount when the keys
+are integers in a small range and with a sort and np.add.reduceat otherwise,
+so all the statistics of all the bins take one pass over the rows. It can be
+filled chunk by chunk and merged, and the mean, RMS and variance of the bins
+are calculated from the sums.
+
+>>> stat = BinnedStatistic().fill([df._lane.values, speedBins], df._acc.values)
+>>> stat.frame(['_lane', '_spd'])
+"""
+
+import numpy as np              # numerical computing with arrays
+import pandas as pd             # dataframe as in R
+
+#the sums kept per bin
+SUMS = ['count', 'n', 'sum', 'sumsq']
+
+#the bincount of a dense grid of bins is used while the grid has at most
+#this many bins per row
+DENSE_BINS_PER_ROW = 4
+
+
+def _reduce(keys, columns):
+    """Returns the distinct key tuples, sorted, and the sums of the columns for
+    every tuple"""
+
+    n = keys[0].shape[0]
+    if n == 0:
+        return [k[:0] for k in keys], [c[:0].astype(np.float64) for c in columns]
+
+    if all(k.dtype.kind in 'iu' for k in keys):
+        lows = [k.min() for k in keys]
+        shape = tuple(int(k.max()) - int(low) + 1 for k, low in zip(keys, lows))
+
+        if np.prod(shape, dtype=np.float64) <= max(DENSE_BINS_PER_ROW * n, 1024):
+            cells = np.ravel_multi_index([k - low for k, low in zip(keys, lows)], shape)
+            counts = np.bincount(cells, minlength=int(np.prod(shape)))
+            used = np.flatnonzero(counts)
+
+            sums = [np.bincount(cells, weights=c, minlength=counts.shape[0])[used] for c in columns]
+            bins = [index + low for index, low in zip(np.unravel_index(used, shape), lows)]
+
+            return bins, sums
+
+    order = np.lexsort(keys[::-1])
+    sortedKeys = [k[order] for k in keys]
+
+    change = np.zeros(n, dtype=bool)
+    change[0] = True
+    for k in sortedKeys:
+        change[1:] |= k[1:] != k[:-1]
+    starts = np.flatnonzero(change)
+
+    return ([k[starts] for k in sortedKeys],
+            [np.add.reduceat(np.asarray(c, dtype=np.float64)[order], starts) for c in columns])
+
+
+class BinnedStatistic(object):
+    """The sums of the values of the rows of every bin.
+
+    count is the number (or the total weight) of the rows of a bin and n that of
+    the rows whose value is not missing. The mean, the RMS and the (population)
+    variance are those of the values that are not missing.
+    """
+
+    def __init__(self):
+
+        self.bins = None
+        self.count = self.n = self.sum = self.sumsq = np.zeros(0)
+
+    def __len__(self):
+
+        return self.count.shape[0]
+
+    def fill(self, keys, values=None, weights=None):
+        """Adds rows with the bin keys (an array or a list of arrays of the same
+        length), the values and optional weights. Without values only the rows
+        are counted. Returns self"""
+
+        if not isinstance(keys, (list, tuple)):
+            keys = [keys]
+        keys = [np.asarray(k) for k in keys]
+
+        w = np.ones(keys[0].shape[0]) if weights is None else np.asarray(weights, dtype=np.float64)
+
+        if values is None:
+            columns = [w, w, np.zeros_like(w), np.zeros_like(w)]
+        else:
+            values = np.asarray(values, dtype=np.float64)
+            known = ~np.isnan(values)
+            x = np.where(known, values, 0)
+            columns = [w, w * known, w * x, w * x * x]
+
+        return self._add(*_reduce(keys, columns))
+
+    def _add(self, bins, sums):
+
+        if self.bins is not None:
+            if len(bins) != len(self.bins):
+                raise ValueError("The statistics have a different number of keys")
+
+            bins = [np.concatenate([old, new]) for old, new in zip(self.bins, bins)]
+            sums = [np.concatenate([getattr(self, name), new]) for name, new in zip(SUMS, sums)]
+            bins, sums = _reduce(bins, sums)
+
+        self.bins = bins
+        for name, values in zip(SUMS, sums):
+            setattr(self, name, values)
+
+        return self
+
+    def merge(self, other):
+        """Adds the sums of another statistic with the same keys and returns self"""
+
+        if other.bins is None:
+            return self
+
+        return self._add(other.bins, [getattr(other, name) for name in SUMS])
+
+    def regroup(self, keys):
+        """Returns a new statistic with the bins merged by new keys, which are
+        arrays with a value for every bin of this one"""
+
+        if not isinstance(keys, (list, tuple)):
+            keys = [keys]
+
+        return BinnedStatistic()._add(*_reduce([np.asarray(k) for k in keys],
+                                               [getattr(self, name) for name in SUMS]))
+
+    @property
+    def mean(self):
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.sum / self.n
+
+    @property
+    def rms(self):
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(self.sumsq / self.n)
+
+    @property
+    def var(self):
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.maximum(self.sumsq / self.n - self.mean ** 2, 0)
+
+    def frame(self, names=None):
+        """Returns a table with the keys and the statistics of every bin"""
+
+        bins = self.bins or []
+        names = names or ['key%d' % i for i in range(len(bins))]
+
+        df = pd.DataFrame(dict(zip(names, bins)))
+        for name in SUMS + ['mean', 'rms', 'var']:
+            df[name] = getattr(self, name)
+
+        return df
@@ -0,0 +1,231 @@
+import os                       # operating system io commands
+import json
+
+import numpy as np              # numerical computing with arrays
+import pandas as pd             # dataframe as in R
+
+
+def _saveArray(directory, fileName, values):
+
+    np.save(os.path.join(directory, fileName), values,
+            allow_pickle=(values.dtype == object))
+
+
+def _loadArray(directory, fileName, dtype, mmap_mode=None):
+
+    #object columns can not be memory mapped
+    if dtype == 'object':
+        return np.load(os.path.join(directory, fileName), allow_pickle=True)
+
+    return np.load(os.path.join(directory, fileName), mmap_mode=mmap_mode)
+
+
+def _readManifest(directory):
+
+    with open(os.path.join(directory, "manifest.json")) as f:
+        return json.load(f)
+
+
+def _writeManifest(directory, manifest):
+
+    with open(os.path.join(directory, "manifest.json"), 'w') as f:
+        json.dump(manifest, f)
+
+
+def _saveColumn(directory, fileName, values):
+    """Saves a column and returns its manifest entry. Nullable integer
+    columns are saved as their values and a separate missing value mask"""
+
+    col = {'file':fileName, 'dtype':str(values.dtype)}
+
+    if isinstance(values, pd.arrays.IntegerArray):
+        mask = np.asarray(values.isna())
+        _saveArray(directory, fileName, values.to_numpy(dtype=values.dtype.numpy_dtype, na_value=0))
+        col['mask'] = fileName.replace('.npy', '_mask.npy')
+        _saveArray(directory, col['mask'], mask)
+    else:
+        _saveArray(directory, fileName, np.asarray(values))
+
+    return col
+
+
+def _loadColumn(directory, col, mmap_mode=None):
+
+    if 'mask' in col:
+        values = _loadArray(directory, col['file'], col['dtype'].lower(), mmap_mode)
+        mask = _loadArray(directory, col['mask'], 'bool', mmap_mode)
+        return pd.arrays.IntegerArray(values, mask, copy=False)
+
+    return _loadArray(directory, col['file'], col['dtype'], mmap_mode)
+
+
+def writeColumns(df, directory):
+    """Writes every column of the dataframe as a separate .npy file
+    together with a manifest describing the column order and dtypes"""
+
+    columns = []
+    for i, name in enumerate(df.columns):
+
+        col = _saveColumn(directory, "col%03d.npy" % i, df[name].array)
+        col['name'] = name
+        columns.append(col)
+
+    _saveArray(directory, "index.npy", df.index.values)
+
+    manifest = {'columns':columns, 'rows':int(df.shape[0]), 'orders':{},
+                'index_dtype':str(df.index.dtype)}
+    _writeManifest(directory, manifest)
+
+    return manifest
+
+
+def readColumns(directory, mmap_mode=None):
+    """Reads a dataframe written by writeColumns. If mmap_mode is given
+    the columns of the dataframe are memory mapped instead of loaded"""
+
+    manifest = _readManifest(directory)
+
+    data = {}
+    for col in manifest['columns']:
+        data[col['name']] = _loadColumn(directory, col, mmap_mode)
+
+    index = _loadArray(directory, "index.npy", manifest.get('index_dtype', 'object'), mmap_mode)
+
+    return pd.DataFrame(data, index=index, columns=[c['name'] for c in manifest['columns']],
+                        copy=False)
+
+
+class ColumnStore(object):
+    """Trajectory columns kept on disk as memory mapped NumPy arrays.
+
+    Every column is a separate .npy file that is opened with np.load(mmap_mode='r'),
+    so any number of processes can open the same multi-hour dataset and share the
+    pages of the operating system cache instead of each holding a private copy.
+    Sort orders are stored as permutation arrays next to the columns so that the
+    data never has to be physically re-sorted.
+
+    >>> store = ColumnStore.create(vt.df, './data/i80.store')
+    >>> store.addOrder('vehicle', ['_vid', '_time'])
+    >>> spd = store.column('_spd', order='vehicle')
+    """
+
+    def __init__(self, directory, mmap_mode='r'):
+
+        self.directory = directory
+        self.mmap_mode = mmap_mode
+        self._manifest = _readManifest(directory)
+        self._columns = dict((c['name'], c) for c in self._manifest['columns'])
+        self._cache = {}
+
+    @classmethod
+    def create(cls, df, directory, orders=None):
+        """Writes the columns of the dataframe into a new store. orders is an
+        optional dictionary of permutation arrays keyed by the order name"""
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        writeColumns(df, directory)
+        store = cls(directory)
+
+        for name, perm in (orders or {}).items():
+            store.setOrder(name, perm)
+
+        return store
+
+    @property
+    def columns(self):
+
+        return [c['name'] for c in self._manifest['columns']]
+
+    @property
+    def orders(self):
+
+        return list(self._manifest['orders'].keys())
+
+    def __len__(self):
+
+        return self._manifest['rows']
+
+    def __contains__(self, name):
+
+        return name in self._columns
+
+    def column(self, name, order=None):
+        """Returns the memory mapped column. If an order is given the values
+        are returned in that order, which materializes a copy of the column"""
+
+        if name not in self._cache:
+            self._cache[name] = _loadColumn(self.directory, self._columns[name], self.mmap_mode)
+
+        values = self._cache[name]
+        if order is None:
+            return values
+
+        return values[self.order(order)]
+
+    def order(self, name):
+        """Returns the permutation array of the named order"""
+
+        key = 'order:' + name
+        if key not in self._cache:
+            self._cache[key] = _loadArray(self.directory, self._manifest['orders'][name],
+                                          'int64', self.mmap_mode)
+        return self._cache[key]
+
+    def setOrder(self, name, perm):
+        """Stores a permutation array under the given name"""
+
+        perm = np.asarray(perm, dtype=np.int64)
+        if perm.shape[0] != len(self):
+            raise ValueError("The order has %d rows but the store has %d" % (perm.shape[0], len(self)))
+
+        fileName = "order_%s.npy" % name
+        _saveArray(self.directory, fileName, perm)
+
+        self._manifest['orders'][name] = fileName
+        _writeManifest(self.directory, self._manifest)
+        self._cache.pop('order:' + name, None)
+
+    def addOrder(self, name, keys):
+        """Computes and stores the order that sorts the store by the given columns"""
+
+        #lexsort uses the last key as the primary one
+        perm = np.lexsort([self.column(k) for k in reversed(keys)])
+        self.setOrder(name, perm)
+
+        return self.order(name)
+
+    def addColumn(self, name, values):
+        """Stores a new column or replaces an existing one"""
+
+        values = values.array if isinstance(values, pd.Series) else np.asarray(values)
+        if values.shape[0] != len(self):
+            raise ValueError("The column has %d rows but the store has %d" % (values.shape[0], len(self)))
+
+        columns = self._manifest['columns']
+        if name in self._columns:
+            position = columns.index(self._columns[name])
+        else:
+            position = len(columns)
+            columns.append(None)
+
+        col = _saveColumn(self.directory, "col%03d.npy" % position, values)
+        col['name'] = name 
+
+        columns[position] = col
+        self._columns[name] = col
+        self._cache.pop(name, None)
+        _writeManifest(self.directory, self._manifest)
+
+    def frame(self, columns=None):
+        """Returns a dataframe whose columns are the memory mapped arrays"""
+
+        if columns is None:
+            columns = self.columns
+
+        data = dict((name, self.column(name)) for name in columns)
+        index = _loadArray(self.directory, "index.npy",
+                           self._manifest.get('index_dtype', 'object'), self.mmap_mode)
+
+        return pd.DataFrame(data, index=index, columns=columns, copy=False)
@@ -0,0 +1,25 @@
+"""Helpers for rows that are sorted by one or more group keys.
+
+The analytics, the charts, the detectors and the partitioned and live
+statistics all reduce sorted rows group by group with reduceat and friends.
+They find the groups with the same helper, which lives here so that every
+module can import it without importing the others.
+
+>>> order = np.lexsort((time, vid))
+>>> starts = _groupStarts(vid[order])
+>>> np.add.reduceat(dist[order], starts)
+"""
+
+import numpy as np              # numerical computing with arrays
+
+
+def _groupStarts(*keys):
+    """Returns the first row of every run of equal keys in sorted arrays"""
+
+    n = keys[0].shape[0]
+    change = np.zeros(n, dtype=bool)
+    change[:1] = True
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+
+    return np.flatnonzero(change)
@@ -0,0 +1,141 @@
+"""Fixed bin histograms that are filled chunk by chunk.
+
+A HistogramAccumulator counts values in the same bins as np.histogram, but it
+can be filled with any number of chunks, merged with the histograms of other
+chunks, files or processes that use the same bins, and saved as JSON. The
+distribution charts draw the counts instead of binning the raw data again.
+
+>>> h = HistogramAccumulator(np.arange(0, 80, 1))
+>>> for chunk in chunks:
+...     h.fill(chunk._spd.values)
+>>> h.merge(HistogramAccumulator.fromJSON(otherRun))
+>>> h.plot(ax)
+"""
+
+import json
+
+import numpy as np              # numerical computing with arrays
+
+
+class HistogramAccumulator(object):
+    """Counts of values in fixed bins. Like np.histogram every bin includes its
+    left edge and the last bin also its right edge.
+
+    total is the number of values filled, including the missing values (missing)
+    and the values below the first edge (under) or above the last one (over).
+    """
+
+    def __init__(self, edges, counts=None, total=0, missing=0, under=0, over=0):
+
+        self.edges = np.asarray(edges, dtype=np.float64)
+        if self.edges.ndim != 1 or self.edges.shape[0] < 2 or (np.diff(self.edges) <= 0).any():
+            raise ValueError("The edges must be at least two increasing values")
+
+        if counts is None:
+            counts = np.zeros(self.edges.shape[0] - 1, dtype=np.int64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+
+        self.total = total
+        self.missing = missing
+        self.under = under
+        self.over = over
+
+        #the bins of np.arange edges are found without a binary search
+        widths = np.diff(self.edges)
+        self._uniform = np.allclose(widths, widths[0], rtol=1e-9, atol=0)
+
+    @classmethod
+    def fromValues(cls, values, edges):
+
+        return cls(edges).fill(values)
+
+    def _binIndex(self, values):
+        """Returns the bin of values inside the edges, the same as np.histogram"""
+
+        edges = self.edges
+        n = edges.shape[0] - 1
+
+        if not self._uniform:
+            index = np.searchsorted(edges, values, side='right') - 1
+            index[values == edges[-1]] = n - 1
+            return index
+
+        index = ((values - edges[0]) * (n / (edges[-1] - edges[0]))).astype(np.intp)
+        index[index >= n] = n - 1
+
+        #the estimate is corrected with the edges as np.histogram does
+        index[values < edges[index]] -= 1
+        index[(values >= edges[index + 1]) & (index != n - 1)] += 1
+
+        return index
+
+    def fill(self, values):
+        """Adds values to the histogram and returns it"""
+
+        values = np.asarray(values, dtype=np.float64).ravel()
+        self.total += values.shape[0]
+
+        valid = ~np.isnan(values)
+        self.missing += int(values.shape[0] - valid.sum())
+        values = values[valid]
+
+        inside = (values >= self.edges[0]) & (values <= self.edges[-1])
+        self.under += int((values < self.edges[0]).sum())
+        self.over += int((values > self.edges[-1]).sum())
+
+        self.counts += np.bincount(self._binIndex(values[inside]),
+                                   minlength=self.counts.shape[0]).astype(np.int64)
+
+        return self
+
+    def merge(self, other):
+        """Adds the counts of a histogram with the same edges and returns self"""
+
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Only histograms with the same edges can be merged")
+
+        self.counts += other.counts
+        self.total += other.total
+        self.missing += other.missing
+        self.under += other.under
+        self.over += other.over
+
+        return self
+
+    def __add__(self, other):
+
+        return self.copy().merge(other)
+
+    def copy(self):
+
+        return HistogramAccumulator(self.edges.copy(), self.counts.copy(), self.total,
+                                    self.missing, self.under, self.over)
+
+    def toDict(self):
+
+        return {'edges':self.edges.tolist(), 'counts':self.counts.tolist(), 'total':int(self.total),
+                'missing':int(self.missing), 'under':int(self.under), 'over':int(self.over)}
+
+    @classmethod
+    def fromDict(cls, d):
+
+        return cls(d['edges'], d['counts'], d['total'], d['missing'], d['under'], d['over'])
+
+    def toJSON(self):
+
+        return json.dumps(self.toDict())
+
+    @classmethod
+    def fromJSON(cls, text):
+
+        return cls.fromDict(json.loads(text))
+
+    def plot(self, ax, color='blue', linewidth=2, **kwargs):
+        """Draws the outline of the histogram like ax.hist(histtype='step')"""
+
+        if hasattr(ax, 'stairs'):
+            return ax.stairs(self.counts, self.edges, color=color, linewidth=linewidth, **kwargs)
+
+        #matplotlib before 3.4
+        return ax.bar(self.edges[:-1], self.counts, width=np.diff(self.edges), align='edge',
+                      fill=False, edgecolor=color, linewidth=linewidth, **kwargs)
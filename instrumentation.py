@@ -0,0 +1,238 @@
+"""Opt-in timing and memory instrumentation of the processing stages.
+
+The readers, VTAnalytics.__init__ and the analytics methods are divided into
+named stages. While a StageRecorder is active every stage that runs records its
+wall time, the rows it received and returned and the peak of the memory it
+allocated. Without an active recorder the stages cost nothing.
+
+>>> with StageRecorder() as recorder:
+...     vt = VTAnalytics.readNGISIMData(fileName)
+...     vt.getTTCDistribution()
+>>> recorder.toFrame()
+>>> recorder.toJSON()
+"""
+
+import json
+import time
+import functools
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd             # dataframe as in R
+
+#the recorders that are currently active
+_RECORDERS = []
+
+RECORD_COLUMNS = ['stage', 'path', 'depth', 'start', 'seconds', 'rows_in', 'rows_out',
+                  'peak_mb', 'error']
+
+
+def _rows(obj):
+    """Returns the number of rows of a dataframe, array, VTAnalytics object or
+    of the first element of a tuple, or None"""
+
+    if isinstance(obj, tuple):
+        return _rows(obj[0]) if obj else None
+
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return obj.shape[0]
+
+    df = obj.__dict__.get('df') if hasattr(obj, '__dict__') else None
+    if isinstance(df, pd.DataFrame):
+        return df.shape[0]
+
+    shape = getattr(obj, 'shape', None)
+    if isinstance(shape, tuple) and shape:
+        return shape[0]
+
+    return None
+
+
+def _flushPeak():
+    """Passes the peak of the traced memory since the last flush to the open
+    stages of all the recorders and starts a new peak interval"""
+
+    if not tracemalloc.is_tracing():
+        return 0
+
+    current, peak = tracemalloc.get_traced_memory()
+    for recorder in _RECORDERS:
+        for entry in recorder._stack:
+            entry['peak'] = max(entry['peak'], peak)
+
+    #without reset_peak (python < 3.9) the peak is the one since tracing started
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+
+    return current
+
+
+class Stage(object):
+    """A running stage. rows_out can be set by the code of the stage"""
+
+    def __init__(self, name, rows_in=None):
+
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+
+
+class StageRecorder(object):
+    """Records the stages that run while it is active.
+
+    If memory is True the allocations are traced with tracemalloc, which slows
+    the stages down, and the peak_mb of a stage is the largest amount of memory
+    it held above what was allocated when it started. callbacks are called with
+    the record of every stage when the stage ends.
+    """
+
+    def __init__(self, memory=True, callbacks=None):
+
+        self.memory = memory
+        self.callbacks = list(callbacks or [])
+        self.records = []
+
+        self._stack = []
+        self._start = None
+        self._tracing = False
+
+    def addCallback(self, callback):
+
+        self.callbacks.append(callback)
+
+    def __enter__(self):
+
+        self._start = time.perf_counter()
+
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+
+        _RECORDERS.append(self)
+
+        return self
+
+    def __exit__(self, *exc):
+
+        _RECORDERS.remove(self)
+
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+        return False
+
+    def _begin(self, stage, current):
+
+        self._stack.append({'stage':stage, 'index':len(self.records),
+                            'start':time.perf_counter(), 'base':current, 'peak':current})
+
+        #the record keeps the position of the start of the stage
+        self.records.append(None)
+
+    def _end(self, stage, error):
+
+        if not self._stack or self._stack[-1]['stage'] is not stage:
+            return
+
+        path = "/".join(entry['stage'].name for entry in self._stack)
+        entry = self._stack.pop()
+
+        record = {'stage':stage.name,
+                  'path':path,
+                  'depth':len(self._stack),
+                  'start':entry['start'] - self._start,
+                  'seconds':time.perf_counter() - entry['start'],
+                  'rows_in':stage.rows_in,
+                  'rows_out':stage.rows_out,
+                  'peak_mb':(entry['peak'] - entry['base']) / 2.0**20 if tracemalloc.is_tracing() else None,
+                  'error':error}
+
+        self.records[entry['index']] = record
+
+        for callback in self.callbacks:
+            callback(record)
+
+    def toFrame(self):
+        """Returns a table with one row per stage in the order the stages started"""
+
+        df = pd.DataFrame([r for r in self.records if r is not None], columns=RECORD_COLUMNS)
+
+        return df.astype({'rows_in':'Int64', 'rows_out':'Int64'})
+
+    def toJSON(self, **kwargs):
+        """Returns the records of the stages as a JSON list"""
+
+        return json.dumps([r for r in self.records if r is not None], default=str, **kwargs)
+
+    def summary(self):
+        """Returns the number of calls, the total and the largest wall time and the
+        largest peak memory of every stage path, slowest first"""
+
+        df = self.toFrame()
+        if df.shape[0] == 0:
+            return pd.DataFrame(columns=['calls', 'seconds', 'max_seconds', 'peak_mb'])
+
+        result = df.groupby('path').agg(calls=('seconds', 'size'), seconds=('seconds', 'sum'),
+                                        max_seconds=('seconds', 'max'), peak_mb=('peak_mb', 'max'))
+
+        return result.sort_values('seconds', ascending=False)
+
+
+@contextmanager
+def stage(name, rows_in=None):
+    """Runs the body of the with statement as a named stage of the active
+    recorders and yields the Stage, whose rows_out can be set"""
+
+    current = Stage(name, rows_in)
+
+    if not _RECORDERS:
+        yield current
+        return
+
+    memory = _flushPeak()
+    for recorder in _RECORDERS:
+        recorder._begin(current, memory)
+
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = "%s: %s" % (type(e).__name__, e)
+        raise
+    finally:
+        _flushPeak()
+        for recorder in list(_RECORDERS):
+            recorder._end(current, error)
+
+
+def staged(name=None):
+    """Decorates a function or method so that every call is a stage. The rows in
+    are taken from the first argument with rows (e.g. self.df) and the rows out
+    from the returned value"""
+
+    def decorate(function):
+
+        stageName = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+
+            if not _RECORDERS:
+                return function(*args, **kwargs)
+
+            rows_in = None
+            for arg in args:
+                rows_in = _rows(arg)
+                if rows_in is not None:
+                    break
+
+            with stage(stageName, rows_in) as current:
+                result = function(*args, **kwargs)
+                current.rows_out = _rows(result)
+
+            return result
+
+        return wrapper
+
+    return decorate
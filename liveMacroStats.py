@@ -0,0 +1,247 @@
+"""Macroscopic variables of a live trajectory feed.
+
+LiveMacroStats accepts the rows of a running simulation frame by frame and keeps
+the lane x space bin x time bin accumulators of the MacroCube for a sliding
+window of time bins. Time bins older than the horizon are expired as the feed
+advances, so the memory does not grow with the length of the run, and the
+current speed, density and lane change rates are calculated from the
+accumulators without building a VTAnalytics object.
+
+>>> live = LiveMacroStats(space_bin=50, time_bin=10, horizon=600)
+>>> for frame in feed:
+...     live.update(frame)
+...     speed = live.variables()['speed']
+"""
+
+import numpy as np              # numerical computing with arrays
+
+from groupedArrays import _groupStarts
+from vehicleTrajectoryAnalytics import MacroCube, _timeTicks, _timeStepInTicks, _durationInSeconds
+
+#the accumulators in the order of the arguments of MacroCube
+ACCUMULATORS = ['speedSum', 'speedCount', 'count', 'leave', 'enter']
+
+
+class LiveMacroStats(object):
+    """Sliding window macroscopic accumulators of a stream of trajectory rows.
+
+    Every frame passed to update is a dataframe with the _vid, _time, _locy, _lane
+    and _spd columns of any number of rows, e.g. all the vehicles of one
+    simulation step. The rows of a vehicle must arrive in time order. Lane changes
+    are detected from consecutive rows of a vehicle, also across frames, and are
+    counted like the _leaveLane and _enterLane flags of the readers.
+
+    horizon is the length of the window in seconds. Rows of time bins that are
+    already expired are dropped and counted in the dropped attribute. time_step
+    is the time step of the trajectories in seconds, which is taken from the
+    first two rows of a vehicle when it is not given.
+    """
+
+    def __init__(self, space_bin=50, time_bin=10, horizon=3600, time_step=None):
+
+        self.space_bin = space_bin
+        self.time_bin = time_bin
+        self.horizon = horizon
+        self.time_step = time_step
+
+        #the bin that is being filled plus the bins of the horizon
+        self.numBins = int(np.ceil(horizon / float(time_bin))) + 1
+
+        self.lanes = np.zeros(0, dtype=np.int64)
+        self.spaceStart = 0
+        self.latest = None
+        self.first = None
+        self.rows = 0
+        self.dropped = 0
+
+        self._ticksPerSecond = None
+        self._datetimes = None
+        self._accumulators = dict((name, np.zeros((0, 0, self.numBins))) for name in ACCUMULATORS)
+
+        #the last row of every vehicle, sorted by vehicle id
+        self._state = {'vid':np.zeros(0, dtype=np.int64), 'lane':np.zeros(0, dtype=np.int64),
+                       'space':np.zeros(0, dtype=np.int64), 'time':np.zeros(0, dtype=np.int64),
+                       'ticks':np.zeros(0, dtype=np.int64)}
+
+    def _advance(self, newest):
+        """Moves the window to end at the time bin newest and clears the slots
+        of the bins that enter the window"""
+
+        if self.latest is None:
+            self.latest = self.first = newest
+            return
+
+        if newest <= self.latest:
+            return
+
+        ids = np.arange(max(self.latest + 1, newest - self.numBins + 1), newest + 1)
+        for values in self._accumulators.values():
+            values[:, :, ids % self.numBins] = 0
+
+        self.latest = newest
+
+    def _grow(self, lane, spaceIds):
+        """Adds the new lanes and space bins to the accumulators"""
+
+        lanes = np.union1d(self.lanes, lane)
+        spaceStart, spaceEnd = spaceIds.min(), spaceIds.max() + 1
+        if self.lanes.shape[0]:
+            spaceStart = min(spaceStart, self.spaceStart)
+            spaceEnd = max(spaceEnd, self.spaceStart + self._accumulators['count'].shape[1])
+
+        shape = (lanes.shape[0], spaceEnd - spaceStart, self.numBins)
+        if shape == self._accumulators['count'].shape:
+            return
+
+        laneIdx = np.searchsorted(lanes, self.lanes)
+        offset = self.spaceStart - spaceStart
+        for name, values in self._accumulators.items():
+            grown = np.zeros(shape)
+            grown[laneIdx, offset:offset + values.shape[1]] = values
+            self._accumulators[name] = grown
+
+        self.lanes = lanes
+        self.spaceStart = spaceStart
+
+    def _accumulate(self, lane, spaceIds, timeIds, weights):
+        """Adds the weights of the rows to their cells of every accumulator"""
+
+        shape = self._accumulators['count'].shape
+        cells = np.ravel_multi_index((np.searchsorted(self.lanes, lane), spaceIds - self.spaceStart,
+                                      timeIds % self.numBins), shape)
+
+        #np.add.at on a flat view of every accumulator costs as much as the rows,
+        #not as the cells of the window
+        for name, w in weights.items():
+            np.add.at(self._accumulators[name].reshape(-1), cells, w)
+
+    def update(self, frame):
+        """Adds the rows of a frame to the accumulators and expires the time bins
+        that fall out of the horizon. Returns self"""
+
+        if frame.shape[0] == 0:
+            return self
+
+        ticks, ticksPerSecond = _timeTicks(frame._time.values)
+        if self._ticksPerSecond is None:
+            self._ticksPerSecond = ticksPerSecond
+            self._datetimes = frame._time.values.dtype.kind == 'M'
+
+        timeIds = ticks // _timeStepInTicks(self.time_bin, ticksPerSecond)
+        self._advance(timeIds.max())
+
+        #rows of expired time bins are dropped
+        live = timeIds > self.latest - self.numBins
+        self.dropped += int((~live).sum())
+
+        vid = np.asarray(frame._vid.values, dtype=np.int64)[live]
+        perm = np.lexsort((ticks[live], vid))
+        vid = vid[perm]
+        ticks = ticks[live][perm]
+        timeIds = timeIds[live][perm]
+        lane = np.asarray(frame._lane.values, dtype=np.int64)[live][perm]
+        spaceIds = np.floor(np.asarray(frame._locy.values, dtype=np.float64)[live][perm] /
+                            self.space_bin).astype(np.int64)
+        speed = np.asarray(frame._spd.values, dtype=np.float64)[live][perm]
+
+        n = vid.shape[0]
+        if n == 0:
+            return self
+
+        self._grow(lane, spaceIds)
+
+        #the previous row of every row, from the frame or from the state of the vehicle
+        rows = {'vid':vid, 'lane':lane, 'space':spaceIds, 'time':timeIds, 'ticks':ticks}
+        starts = _groupStarts(vid)
+
+        state = self._state
+        found = np.zeros(starts.shape[0], dtype=bool)
+        pos = np.zeros(starts.shape[0], dtype=np.int64)
+        if state['vid'].shape[0]:
+            pos = np.minimum(np.searchsorted(state['vid'], vid[starts]), state['vid'].shape[0] - 1)
+            found = state['vid'][pos] == vid[starts]
+
+        prev = {}
+        for key, values in rows.items():
+            prev[key] = np.empty(n, dtype=np.int64)
+            prev[key][1:] = values[:-1]
+            prev[key][starts] = -1
+            prev[key][starts[found]] = state[key][pos[found]]
+
+        hasPrev = prev['vid'] == vid
+
+        if self.time_step is None and hasPrev.any():
+            steps = (ticks - prev['ticks'])[hasPrev]
+            if (steps > 0).any():
+                self.time_step = steps[steps > 0].min() / float(ticksPerSecond)
+
+        valid = ~np.isnan(speed)
+        self._accumulate(lane, spaceIds, timeIds,
+                         {'speedSum':np.where(valid, speed, 0),
+                          'speedCount':valid.astype(np.float64),
+                          'count':np.ones(n)})
+
+        #a vehicle enters the new lane at the first row after a lane change and
+        #leaves its lane at the last row before it, which may be in an expired bin
+        change = hasPrev & (lane != prev['lane'])
+        if change.any():
+            self._accumulate(lane[change], spaceIds[change], timeIds[change],
+                             {'enter':np.ones(change.sum())})
+
+            leave = change & (prev['time'] > self.latest - self.numBins)
+            self._accumulate(prev['lane'][leave], prev['space'][leave], prev['time'][leave],
+                             {'leave':np.ones(leave.sum())})
+
+        self._updateState(rows, starts)
+        self.rows += n
+
+        return self
+
+    def _updateState(self, rows, starts):
+        """Keeps the last row of every vehicle and forgets the vehicles whose
+        last row is older than the window"""
+
+        last = np.append(starts[1:], rows['vid'].shape[0]) - 1
+        new = dict((key, values[last]) for key, values in rows.items())
+
+        keep = ~np.isin(self._state['vid'], new['vid'])
+        keep &= self._state['time'] > self.latest - self.numBins
+
+        merged = dict((key, np.concatenate([self._state[key][keep], new[key]])) for key in new)
+        order = np.argsort(merged['vid'], kind='stable')
+
+        self._state = dict((key, values[order]) for key, values in merged.items())
+
+    @property
+    def vehicles(self):
+        """The number of vehicles seen within the window"""
+
+        return self._state['vid'].shape[0]
+
+    def cube(self):
+        """Returns a MacroCube with the accumulators of the time bins of the
+        window in time order"""
+
+        if self.latest is None:
+            raise ValueError("No rows have been added")
+
+        timeIds = np.arange(max(self.latest - self.numBins + 1, self.first), self.latest + 1)
+        slots = timeIds % self.numBins
+
+        arrays = [self._accumulators[name][:, :, slots] for name in ACCUMULATORS]
+        spaceIds = np.arange(self.spaceStart, self.spaceStart + arrays[0].shape[1])
+
+        return MacroCube(self.lanes, spaceIds, timeIds, self.space_bin, self.time_bin, *arrays,
+                         datetimes=self._datetimes)
+
+    def variables(self):
+        """Returns the (lane x space bin x time bin) arrays of the speed, density and
+        lane change rates of the window, see MacroCube.variables"""
+
+        return self.cube().variables(_durationInSeconds(self.time_step))
+
+    def toFrame(self):
+        """Returns the macroscopic variables of the window as a dataframe indexed
+        by lane, space bin and time bin"""
+
+        return self.cube().toFrame(_durationInSeconds(self.time_step))
@@ -0,0 +1,146 @@
+"""Runs the row kernels of the readers on groups of rows in a process pool.
+
+The kernels (_vehicleKinematics, _laneChangeFlags, _gapsAndTTC and
+_neighbourVehicles) only compare adjacent rows of the same vehicle or of the
+same (lane, time) frame. The sorted rows are therefore cut into one part per
+process at group boundaries, the inputs and outputs are placed in shared
+memory and every worker runs the kernel on its part. The result is identical
+to running the kernel on all the rows.
+
+>>> with kernelPool(4) as pool:
+...     dt, spd, acc = applyByGroups(_vehicleKinematics, [vid, time, locy], [vid], pool, 4)
+"""
+
+import multiprocessing
+from contextlib import contextmanager
+
+import numpy as np              # numerical computing with arrays
+
+from groupedArrays import _groupStarts
+
+def _groupCuts(keys, parts):
+    """Returns about parts + 1 row offsets, from 0 to the number of rows, that
+    fall on the first row of a group of equal keys"""
+
+    n = keys[0].shape[0]
+    starts = _groupStarts(*keys)
+
+    targets = np.arange(1, parts) * n // parts
+    cuts = starts[np.minimum(np.searchsorted(starts, targets), starts.shape[0] - 1)]
+
+    return np.unique(np.concatenate(([0], cuts, [n])))
+
+
+def _share(shape, dtype, values=None):
+    """Returns a new shared memory block and an array backed by it"""
+
+    from multiprocessing import shared_memory
+
+    dtype = np.dtype(dtype)
+    shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    if values is not None:
+        array[...] = values
+
+    return shm, array
+
+
+def _attach(name, shape, dtype):
+
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(name=name)
+
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _runPart(task):
+    """Runs the kernel on the rows lo:hi of the shared inputs and writes the
+    results into the same rows of the shared outputs"""
+
+    kernel, inputs, outputs, lo, hi = task
+
+    blocks, arrays = [], []
+    try:
+        for spec in inputs + outputs:
+            shm, array = _attach(*spec)
+            blocks.append(shm)
+            arrays.append(array)
+
+        results = kernel(*[a[lo:hi] for a in arrays[:len(inputs)]])
+        for i, values in enumerate(results):
+            arrays[len(inputs) + i][lo:hi] = values
+
+    finally:
+        #the blocks can only be closed when no array uses them
+        arrays = array = None
+        for shm in blocks:
+            shm.close()
+
+
+@contextmanager
+def kernelPool(processes=None):
+    """Yields a pool of processes for applyByGroups, or None when processes is
+    None or 1 or when the platform can not fork, which runs the kernels serially"""
+
+    if not processes or processes <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        yield None
+        return
+
+    #the workers must share the resource tracker of this process, otherwise
+    #each worker starts its own one which unlinks the shared blocks it saw
+    from multiprocessing import resource_tracker
+    resource_tracker.ensure_running()
+
+    pool = multiprocessing.get_context('fork').Pool(processes)
+    try:
+        yield pool
+    finally:
+        pool.close()
+        pool.join()
+
+
+def applyByGroups(kernel, arrays, keys, pool=None, processes=1):
+    """Returns the outputs of kernel(*arrays). The rows are sorted by the group
+    keys and the kernel must not compare rows of different groups. With a pool
+    of the given number of processes every process runs the kernel on a part
+    of the groups"""
+
+    arrays = [np.asarray(a) for a in arrays]
+
+    if pool is None or any(a.dtype.kind == 'O' for a in arrays):
+        return kernel(*arrays)
+
+    #one part per process of the pool
+    cuts = _groupCuts([np.asarray(k) for k in keys], processes)
+    if cuts.shape[0] <= 2:
+        return kernel(*arrays)
+
+    #the dtypes of the outputs
+    sample = kernel(*[a[:1] for a in arrays])
+
+    blocks = []
+    try:
+        inputs, outputs, results = [], [], []
+        for a in arrays:
+            shm, shared = _share(a.shape, a.dtype, a)
+            blocks.append(shm)
+            inputs.append((shm.name, a.shape, a.dtype.str))
+
+        for s in sample:
+            shape = (arrays[0].shape[0],) + np.shape(s)[1:]
+            shm, shared = _share(shape, np.asarray(s).dtype)
+            blocks.append(shm)
+            outputs.append((shm.name, shape, shared.dtype.str))
+            results.append(shared)
+
+        tasks = [(kernel, inputs, outputs, lo, hi) for lo, hi in zip(cuts[:-1], cuts[1:])]
+        pool.map(_runPart, tasks, chunksize=1)
+
+        return tuple(np.array(r) for r in results)
+
+    finally:
+        results = shared = None
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,466 @@
+"""Time partitioned analytics of datasets that do not fit in memory.
+
+The raw trajectories are streamed into time slabs on disk and every slab is
+prepared by the readers' own code together with a few halo rows of the
+neighbouring slabs: the rows of the previous slab that precede the first sample
+of every vehicle and the first samples of every vehicle in the next slab. The
+shift based variables (_dt, _spd, _acc, the lane change flags, _gap, _ttc, _prV
+and _flV) of the rows of the slab are then the same as the ones of the whole
+dataset. At most two raw slabs are in memory at a time.
+
+The prepared slabs are kept as column stores and the mergeable outputs, the
+MacroCube, the TTC histogram, the ARMS sums, the lane changes per lane and the
+first and last sample of every vehicle, are accumulated slab by slab.
+
+>>> pvt = PartitionedVTAnalytics.readModelData('./data/day.hdf', './data/day.slabs',
+...                                            slab_seconds=1800)
+>>> pvt.df_macro
+>>> pvt.calculateCorridorTravelTimes()
+>>> vt = pvt.slab(3)
+"""
+
+import os                       # operating system io commands
+import json
+import shutil
+
+import numpy as np              # numerical computing with arrays
+import pandas as pd             # dataframe as in R
+
+from columnStore import ColumnStore, writeColumns, readColumns
+from instrumentation import stage, staged
+from histograms import HistogramAccumulator
+from binnedStatistics import BinnedStatistic
+from virtualDetectors import VirtualDetectors
+from trajectoryPlots import TrajectoryPlots
+from groupedArrays import _groupStarts
+from vehicleTrajectoryAnalytics import (VTAnalytics, MacroCube, NGSIM_COLUMNS, NGSIM_DTYPES,
+                                        NGSIM_VEHICLE_KEYS, TTC_BINS, _timeTicks, _timeStepInTicks,
+                                        _filterOrder, _forwardDifference, _unsort,
+                                        _durationInSeconds,
+                                        _ttcFrequencies, _corridorSpeeds, _speedEdges,
+                                        _accelerationEdges, _armsTable)
+
+#the number of samples of every vehicle taken from the next slab. The speed of a
+#row needs the next sample and its acceleration the one after, and the third
+#sample decides whether the first one is kept by the NGSIM reader
+HALO_ROWS = 3
+
+#the charts of TrajectoryPlots that need the rows of the whole dataset
+UNSUPPORTED_CHART = ("%s needs the rows of the whole dataset and can not be drawn from the "
+                     "merged outputs of the slabs, draw it for one slab with slab(i)")
+
+
+def _firstRows(df, rows):
+    """Returns the first rows of every vehicle in time order"""
+
+    perm = np.lexsort((df._time.values, df._vid.values))
+    starts = _groupStarts(df._vid.values[perm])
+    sizes = np.diff(np.append(starts, perm.shape[0]))
+    rank = np.arange(perm.shape[0]) - np.repeat(starts, sizes)
+
+    return df.take(perm[rank < rows])
+
+
+def _lastRows(df, vehicleOrder, columns):
+    """Returns the columns of the last row of every vehicle"""
+
+    ends = np.append(_groupStarts(df._vid.values[vehicleOrder])[1:], vehicleOrder.shape[0]) - 1
+
+    return df[columns].take(vehicleOrder[ends])
+
+
+class PartitionedVTAnalytics(TrajectoryPlots):
+    """The slabs of a time partitioned dataset and their merged outputs. Use the
+    readers to partition and prepare a file and open to reopen the directory.
+    Of the charts only the distributions, from the histograms of the slabs, and
+    plotSpeedVsDensity can be drawn. The others raise NotImplementedError"""
+
+    def __init__(self, directory, space_bin=50, time_bin=10):
+
+        self.directory = directory
+
+        with open(os.path.join(directory, "slabs.json")) as f:
+            self.slabs = json.load(f)['slabs']
+
+        self.space_bin = space_bin
+        self.time_bin = time_bin
+
+        self.macroCube = None
+        self._df_macro = None
+
+        self._accumulate()
+        self.recalculateMacroVars(space_bin, time_bin)
+
+    @classmethod
+    def open(cls, directory, space_bin=50, time_bin=10):
+        """Opens the slabs prepared by one of the readers"""
+
+        return cls(directory, space_bin, time_bin)
+
+    def __len__(self):
+
+        return len(self.slabs)
+
+    def _slabDirectory(self, i):
+
+        return os.path.join(self.directory, self.slabs[i])
+
+    def slabFrame(self, i):
+        """Returns the prepared rows of slab i with memory mapped columns"""
+
+        return readColumns(self._slabDirectory(i), mmap_mode='r')
+
+    def slabFrames(self):
+
+        for i in range(len(self.slabs)):
+            yield self.slabFrame(i)
+
+    def slab(self, i):
+        """Returns slab i as a VTAnalytics object with memory mapped columns"""
+
+        return VTAnalytics.openColumnStore(self._slabDirectory(i), self.space_bin, self.time_bin)
+
+    @classmethod
+    @staged()
+    def readNGISIMData(cls, fName1, directory, slab_seconds=900, start_time=None, end_time=None,
+                       chunksize=10**6, space_bin=50, time_bin=10):
+        """Partitions a raw NGSIM file into time slabs of slab_seconds and prepares
+        every slab like VTAnalytics.readNGISIMData"""
+
+        chunks = pd.read_csv(fName1, header=None, names=NGSIM_COLUMNS,
+                             dtype=NGSIM_DTYPES, sep=r'\s+',
+                             chunksize=chunksize)
+
+        #the new vehicle ids depend on all the vehicles in the file
+        vehicleKeys = []
+
+        def raw():
+            for chunk in chunks:
+                vehicleKeys.append(chunk[NGSIM_VEHICLE_KEYS].drop_duplicates())
+                yield VTAnalytics._addNGSIMAliases(chunk)
+
+        keys = cls._partition(raw(), directory, slab_seconds, start_time, end_time)
+
+        newVehID = VTAnalytics._vehicleIdTable(pd.concat(vehicleKeys, ignore_index=True))
+
+        def load(rawDirectory):
+            return readColumns(rawDirectory).merge(newVehID, on=NGSIM_VEHICLE_KEYS)
+
+        cls._prepareSlabs(directory, keys, load, VTAnalytics._prepareNGSIMData)
+
+        return cls(directory, space_bin, time_bin)
+
+    @classmethod
+    @staged()
+    def readModelData(cls, fName1, directory, slab_seconds=900, start_time=None, end_time=None,
+                      chunksize=10**6, space_bin=50, time_bin=10):
+        """Partitions the trajectories of a simulation model into time slabs of
+        slab_seconds and prepares every slab like VTAnalytics.readModelData. Files
+        written in the table format are read chunksize rows at a time"""
+
+        def raw():
+            with pd.HDFStore(fName1, mode='r') as store:
+                if store.get_storer('trajectories').is_table:
+                    chunks = store.select('trajectories', chunksize=chunksize)
+                else:
+                    chunks = [store['trajectories']]
+
+                for chunk in chunks:
+                    yield VTAnalytics._addModelAliases(chunk)
+
+        keys = cls._partition(raw(), directory, slab_seconds, start_time, end_time)
+
+        cls._prepareSlabs(directory, keys, readColumns, VTAnalytics._prepareModelData)
+
+        return cls(directory, space_bin, time_bin)
+
+    @staticmethod
+    def _rawDirectory(directory, key):
+
+        return os.path.join(directory, "raw", "slab_%08d" % key)
+
+    @classmethod
+    @staged()
+    def _partition(cls, chunks, directory, slab_seconds, start_time, end_time):
+        """Writes the rows of the chunks inside the time window into a raw
+        directory per time slab and returns the sorted slab numbers"""
+
+        #only the slabs of an earlier run are replaced
+        if os.path.exists(directory):
+            if os.listdir(directory) and not os.path.exists(os.path.join(directory, "slabs.json")):
+                raise ValueError("%s is not empty and does not contain slabs" % directory)
+            shutil.rmtree(directory)
+        os.makedirs(directory)
+
+        parts = {}
+        for chunk in chunks:
+
+            times = chunk._time.values
+            mask = np.ones(chunk.shape[0], dtype=bool)
+            if start_time:
+                mask &= times >= start_time
+            if end_time:
+                mask &= times <= end_time
+            chunk = chunk[mask]
+
+            ticks, ticksPerSecond = _timeTicks(chunk._time.values)
+            slabIds = ticks // _timeStepInTicks(slab_seconds, ticksPerSecond)
+
+            for key in np.unique(slabIds):
+
+                part = parts.get(key, 0)
+                partDirectory = os.path.join(cls._rawDirectory(directory, key), "part_%06d" % part)
+                os.makedirs(partDirectory)
+
+                writeColumns(chunk[slabIds == key].reset_index(drop=True), partDirectory)
+                parts[key] = part + 1
+
+        return sorted(parts)
+
+    @classmethod
+    @staged()
+    def _prepareSlabs(cls, directory, keys, load, prepare):
+        """Prepares the slabs in time order with the halo rows of their neighbours.
+        load reads a raw part directory and prepare is the preparation of the reader"""
+
+        def loadSlab(key):
+            rawDirectory = cls._rawDirectory(directory, key)
+            return pd.concat([load(os.path.join(rawDirectory, part))
+                              for part in sorted(os.listdir(rawDirectory))], ignore_index=True)
+
+        names = []
+        before = None
+        current = loadSlab(keys[0]) if keys else None
+
+        for i, key in enumerate(keys):
+
+            with stage('slab', current.shape[0]) as slabStage:
+
+                following = loadSlab(keys[i + 1]) if i + 1 < len(keys) else None
+                columns = list(current.columns)
+
+                #the halo rows, the last prepared row of the vehicles of the slab
+                #in the previous slab and their first rows in the next slab
+                frames = [current]
+                if before is not None:
+                    frames.insert(0, before[np.isin(before._vid.values, current._vid.values)])
+                if following is not None:
+                    frames.append(_firstRows(following, HALO_ROWS))
+
+                sizes = [f.shape[0] for f in frames]
+                inSlab = np.zeros(sum(sizes), dtype=bool)
+                first = sizes[0] if before is not None else 0
+                inSlab[first:first + current.shape[0]] = True
+
+                frame = pd.concat(frames, ignore_index=True)
+                frame['_inSlab'] = inSlab
+
+                prepared, vehicleOrder = prepare(frame)
+
+                #VTAnalytics recalculates the time step on the kept rows, which
+                #needs the next kept sample of the halo
+                prepared['_dt'] = _unsort(_forwardDifference(prepared._time.values[vehicleOrder], 
+                                                             prepared._vid.values[vehicleOrder]), 
+                                          vehicleOrder)
+
+                keep = prepared._inSlab.values.astype(bool)
+                vehicleOrder = _filterOrder(vehicleOrder, keep)
+                prepared = prepared[keep].drop('_inSlab', axis=1).reset_index(drop=True)
+
+                name = "slab_%08d" % key
+                ColumnStore.create(prepared, os.path.join(directory, name),
+                                   orders={'vehicle':vehicleOrder,
+                                           'lane':np.arange(prepared.shape[0])})
+                names.append(name)
+
+                before = _lastRows(prepared, vehicleOrder, columns)
+                current = following
+                slabStage.rows_out = prepared.shape[0]
+
+        shutil.rmtree(os.path.join(directory, "raw"), ignore_errors=True)
+
+        with open(os.path.join(directory, "slabs.json"), 'w') as f:
+            json.dump({'slabs':names}, f)
+
+    @staged()
+    def _accumulate(self):
+        """Accumulates the mergeable outputs of the slabs"""
+
+        cubes = []
+        ttc = HistogramAccumulator(TTC_BINS)
+        ranges = []
+        arms = BinnedStatistic()
+        laneChanges, travelTimes = [], []
+        self.rows = 0
+        self.time_step = None
+
+        for i in range(len(self.slabs)):
+
+            store = ColumnStore(self._slabDirectory(i))
+            df = store.frame()
+            perm = store.order('vehicle')
+
+            self.rows += df.shape[0]
+            if self.time_step is None and df._dt.notnull().any():
+                self.time_step = df._dt.dropna().iloc[0]
+
+            cubes.append(MacroCube.fromFrame(df, self.space_bin, self.time_bin))
+
+            if '_ttc' in df.columns:
+                ttc.fill(df._ttc.values)
+
+            ranges.append([df._spd.min(), df._spd.max(), df._acc.min(), df._acc.max()])
+
+            #the sums are kept per mph so any speed bin can be calculated from them
+            speeds = np.asarray(df._spd.values, dtype=np.float64).astype(np.int64)
+            arms.fill(speeds, df._acc.values)
+
+            laneChanges.append(df.groupby('_lane')[['_leaveLane', '_enterLane']].sum())
+
+            starts = _groupStarts(df._vid.values[perm])
+            first, last = perm[starts], perm[np.append(starts[1:], perm.shape[0]) - 1]
+            travelTimes.append(pd.DataFrame({'_vid':df._vid.values[first],
+                                             'start':df._time.values[first],
+                                             'startDist':df._locy.values[first],
+                                             'end':df._time.values[last],
+                                             'endDist':df._locy.values[last]}))
+
+        self.macroCube = MacroCube.merge(cubes) if cubes else None
+        self._ttc = ttc
+        self._ranges = np.array(ranges, dtype=np.float64).reshape(-1, 4)
+        self._arms = arms
+        self._laneChanges = pd.concat(laneChanges).groupby(level=0).sum() if laneChanges else None
+
+        #the slabs are in time order so the first and the last sample of a vehicle
+        #are in the first and the last slab it appears in
+        if travelTimes:
+            self._travelTimes = (pd.concat(travelTimes, ignore_index=True)
+                                   .groupby('_vid', sort=True)
+                                   .agg({'start':'first', 'startDist':'first',
+                                         'end':'last', 'endDist':'last'})
+                                   .reset_index())
+
+    @staged()
+    def recalculateMacroVars(self, space_bin, time_bin):
+        """Recalculates the macroscopic variables, see VTAnalytics.recalculateMacroVars.
+        Bins that are not multiples of the bins of the current cube need another
+        pass over the slabs"""
+
+        if self.macroCube is None or not self.macroCube.isMultiple(space_bin, time_bin):
+            self.macroCube = MacroCube.merge(MacroCube.fromFrame(df, space_bin, time_bin)
+                                             for df in self.slabFrames())
+
+        self.space_bin = space_bin
+        self.time_bin = time_bin
+
+        self.macro = self.macroCube.coarsen(space_bin, time_bin).trim()
+        self.macroVars = self.macro.variables(_durationInSeconds(self.time_step))
+        self._df_macro = None
+
+    @property
+    def df_macro(self):
+        """The macroscopic variables as a dataframe indexed by lane, space bin and time bin"""
+
+        if self._df_macro is None:
+            self._df_macro = self.macro.toFrame(_durationInSeconds(self.time_step))
+
+        return self._df_macro
+
+    def _columnChunks(self, column):
+        """Yields the memory mapped column of every slab"""
+
+        for i in range(len(self.slabs)):
+            yield ColumnStore(self._slabDirectory(i)).column(column)
+
+    def _histogram(self, column, edges):
+        """Fills the histogram of a column slab by slab"""
+
+        histogram = HistogramAccumulator(edges)
+        for values in self._columnChunks(column):
+            histogram.fill(values)
+
+        return histogram
+
+    @staged()
+    def describe(self, column, numerical=True, decimals=1):
+        """Returns the stats table of VTAnalytics.describe for a column of all the
+        slabs, with the percentiles of a QuantileSketch"""
+
+        return VTAnalytics.describe(self._columnChunks(column), numerical, decimals)
+
+    def speedHistogram(self, lower=None, upper=None):
+        """Returns the HistogramAccumulator of the speed, see VTAnalytics.speedHistogram"""
+
+        edges = _speedEdges(np.nanmin(self._ranges[:, 0]), np.nanmax(self._ranges[:, 1]), lower, upper)
+
+        return self._histogram('_spd', edges)
+
+    def accelerationHistogram(self, lower=None, upper=None):
+        """Returns the HistogramAccumulator of the acceleration, see
+        VTAnalytics.accelerationHistogram"""
+
+        edges = _accelerationEdges(np.nanmin(self._ranges[:, 2]), np.nanmax(self._ranges[:, 3]),
+                                   lower, upper)
+
+        return self._histogram('_acc', edges)
+
+    def ttcHistogram(self):
+        """Returns the merged HistogramAccumulator of the time to collision"""
+
+        histogram = self._ttc.copy()
+        histogram.total = self.rows
+
+        return histogram
+
+    @staged()
+    def getTTCDistribution(self):
+
+        return _ttcFrequencies(self._ttc.counts, TTC_BINS, self.rows)
+
+    @staged()
+    def getARMSDistribution(self, speedbin=5):
+        """Calculates ARMS for each speed bin, see VTAnalytics.getARMSDistribution"""
+
+        return _armsTable(self._arms.regroup(self._arms.bins[0] // speedbin * speedbin))
+
+    @staged()
+    def calculateCorridorTravelTimes(self):
+
+        return _corridorSpeeds(self._travelTimes.copy())
+
+    @staged()
+    def getNumOfLaneChangesPerLane(self):
+
+        tmp = self._laneChanges.reset_index()
+        tmp.columns = ['_lane', 'NumOfVehiclesLeavingLane', 'NumOfVehiclesEnteringLane']
+
+        return tmp
+
+    @staged()
+    def getDetectorData(self, stations, interval=60, loop_length=0, vehicle_length=None):
+        """Returns the virtual detector data of all the slabs, see
+        VTAnalytics.getDetectorData. The slabs are filled in time order so the
+        crossings between the last sample of a slab and the next are found"""
+
+        detectors = VirtualDetectors(stations, interval, loop_length, vehicle_length)
+        for i in range(len(self.slabs)):
+            store = ColumnStore(self._slabDirectory(i))
+            detectors.fill(store.frame(), store.order('vehicle'))
+
+        return detectors.toFrame()
+
+    def plotAllTrajectories(self, *args, **kwargs):
+
+        raise NotImplementedError(UNSUPPORTED_CHART % 'plotAllTrajectories')
+
+    def plotSelectedTrajectories(self, *args, **kwargs):
+
+        raise NotImplementedError(UNSUPPORTED_CHART % 'plotSelectedTrajectories')
+
+    def plotSpeedVsDensityByLane(self, *args, **kwargs):
+
+        raise NotImplementedError(UNSUPPORTED_CHART % 'plotSpeedVsDensityByLane')
+
+    def plotLCR(self, *args, **kwargs):
+
+        raise NotImplementedError(UNSUPPORTED_CHART % 'plotLCR')
@@ -0,0 +1,191 @@
+"""Mergeable summary of a numeric column that is filled chunk by chunk.
+
+QuantileSketch keeps the exact count, missing values, mean, standard deviation,
+minimum and maximum of the values it is filled with and a KLL sketch (Karnin,
+Lang and Liberty, 2016) of their distribution, whose memory does not grow with
+the number of values. Sketches of chunks, files or processes can be merged and
+saved as JSON, and VTAnalytics.describe builds its table from a sketch.
+
+>>> sketch = QuantileSketch()
+>>> for chunk in chunks:
+...     sketch.fill(chunk._spd.values)
+>>> sketch.quantile([5, 50, 95])
+"""
+
+import json
+
+import numpy as np              # numerical computing with arrays
+
+
+class QuantileSketch(object):
+    """Exact moments and approximate percentiles of a stream of values.
+
+    Until the values exceed the capacity k of the first level of the sketch the
+    percentiles are exact and equal to np.percentile. After that level l of the
+    sketch keeps a sample of the sorted values, each standing for 2**l of them,
+    and the rank of a percentile is within about 2/k of the number of values of
+    the true rank (1% with the default k=200) with high probability.
+    """
+
+    def __init__(self, k=200, seed=None):
+
+        self.k = k
+        self.levels = [np.zeros(0)]
+
+        self.count = 0
+        self.missing = 0
+        self.mean = 0.0
+        self.m2 = 0.0               # the sum of squared deviations from the mean
+        self.min = np.nan
+        self.max = np.nan
+
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def fromChunks(cls, chunks, k=200, seed=None):
+        """Returns the sketch of an iterable of series or arrays"""
+
+        sketch = cls(k, seed)
+        for chunk in chunks:
+            sketch.fill(chunk)
+
+        return sketch
+
+    @property
+    def n(self):
+        """The number of values that are not missing"""
+
+        return self.count - self.missing
+
+    @property
+    def std(self):
+        """The population standard deviation, as np.std"""
+
+        return np.sqrt(self.m2 / self.n) if self.n else np.nan
+
+    def _capacity(self, level):
+
+        #the lower levels are smaller, by 2/3 per level
+        return max(int(np.ceil(self.k * (2.0 / 3.0) ** (len(self.levels) - 1 - level))), 2)
+
+    def _addMoments(self, n, mean, m2):
+        """Combines the moments with those of other values (Chan et al.)"""
+
+        if n == 0:
+            return
+
+        total = self.n + n
+        delta = mean - self.mean
+        self.m2 += m2 + delta ** 2 * self.n * n / total
+        self.mean += delta * n / total
+
+    def fill(self, values):
+        """Adds values, missing values are only counted. Returns the sketch"""
+
+        values = np.asarray(values, dtype=np.float64).ravel()
+        valid = values[~np.isnan(values)]
+
+        n = valid.shape[0]
+        mean = valid.mean() if n else 0.0
+        self._addMoments(n, mean, ((valid - mean) ** 2).sum())
+
+        self.count += values.shape[0]
+        self.missing += values.shape[0] - n
+
+        if n:
+            self.min = np.fmin(self.min, valid.min())
+            self.max = np.fmax(self.max, valid.max())
+            self.levels[0] = np.concatenate([self.levels[0], valid])
+            self._compress()
+
+        return self
+
+    def _compress(self):
+        """Compacts the lowest level that is above its capacity until all the
+        levels fit. A compaction sorts the level and promotes every other value,
+        from a random first one, to the next level with twice the weight"""
+
+        while True:
+            over = [h for h in range(len(self.levels)) if self.levels[h].shape[0] > self._capacity(h)]
+            if not over:
+                return
+
+            h = over[0]
+            if h + 1 == len(self.levels):
+                self.levels.append(np.zeros(0))
+
+            items = np.sort(self.levels[h])
+            #an odd value out stays on its level
+            keep = items.shape[0] % 2
+            self.levels[h] = items[:keep]
+            promoted = items[keep + self._rng.integers(2)::2]
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+
+    def merge(self, other):
+        """Adds the values summarized by another sketch and returns self"""
+
+        self._addMoments(other.n, other.mean, other.m2)
+
+        self.count += other.count
+        self.missing += other.missing
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+
+        for h, items in enumerate(other.levels):
+            if h == len(self.levels):
+                self.levels.append(np.zeros(0))
+            self.levels[h] = np.concatenate([self.levels[h], items])
+
+        self._compress()
+
+        return self
+
+    def quantile(self, q):
+        """Returns the percentiles q (0 to 100) with the linear interpolation of
+        np.percentile. The minimum and the maximum are exact"""
+
+        q = np.asarray(q, dtype=np.float64)
+        if self.n == 0:
+            return np.full(q.shape, np.nan)
+
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(level.shape[0], 2 ** h, dtype=np.int64)
+                                  for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, weights = items[order], weights[order]
+
+        #the last rank that every sorted value stands for
+        ranks = np.cumsum(weights) - 1
+        position = q / 100.0 * (ranks[-1])
+        lower = items[np.searchsorted(ranks, np.floor(position))]
+        upper = items[np.searchsorted(ranks, np.ceil(position))]
+        result = lower + (upper - lower) * (position - np.floor(position))
+
+        result = np.where(q <= 0, self.min, result)
+
+        return np.where(q >= 100, self.max, result)
+
+    def toDict(self):
+
+        return {'k':self.k, 'levels':[level.tolist() for level in self.levels],
+                'count':int(self.count), 'missing':int(self.missing), 'mean':float(self.mean),
+                'm2':float(self.m2), 'min':float(self.min), 'max':float(self.max)}
+
+    @classmethod
+    def fromDict(cls, d, seed=None):
+
+        sketch = cls(d['k'], seed)
+        sketch.levels = [np.asarray(level, dtype=np.float64) for level in d['levels']]
+        for name in ['count', 'missing', 'mean', 'm2', 'min', 'max']:
+            setattr(sketch, name, d[name])
+
+        return sketch
+
+    def toJSON(self):
+
+        return json.dumps(self.toDict())
+
+    @classmethod
+    def fromJSON(cls, text, seed=None):
+
+        return cls.fromDict(json.loads(text), seed)
@@ -0,0 +1,371 @@
+import os                       # operating system io commands
+import multiprocessing
+from io import BytesIO
+
+import numpy as np              # numerical computing with arrays
+import pandas as pd             # dataframe as in R
+
+from trajectoryCache import columnDigest, frameDigest
+
+PAGE_SIZE = (1000, 792.0)
+
+#the dataset shared with the worker processes. It is set before the pool
+#is created so the forked workers inherit it without re-reading the data
+_VT = None
+
+
+def figureToBytes(figure, fmt='png', dpi=100):
+    """Renders a matplotlib figure into an in-memory buffer and returns its bytes"""
+
+    buf = BytesIO()
+    figure.savefig(buf, format=fmt, dpi=dpi)
+
+    return buf.getvalue()
+
+
+def _figureTitle(figure):
+
+    if figure._suptitle is not None and figure._suptitle.get_text():
+        return figure._suptitle.get_text()
+
+    for ax in figure.axes:
+        if ax.get_title():
+            return ax.get_title()
+
+    return ''
+
+
+class PdfReport(object):
+    """A pdf file with one chart per page and an outline entry per chart.
+
+    Charts are embedded from in-memory buffers, either as bitmaps or, with
+    vector=True, as vector drawings (requires svglib)"""
+
+    def __init__(self, outFileName, pagesize, dpi=100):
+
+        from reportlab.pdfgen import canvas
+
+        self._outFileName = outFileName
+        self._canvas = canvas.Canvas(outFileName, pagesize=pagesize)
+        self._counter = 0
+        self._dpi = dpi
+
+    def addChart(self, chart, title=None, vector=False):
+        """Adds a matplotlib figure. The title of the outline entry defaults
+        to the title of the figure"""
+
+        if title is None:
+            title = _figureTitle(chart)
+
+        if vector:
+            self.addDrawing(figureToBytes(chart, 'svg', self._dpi), title)
+        else:
+            self.addImage(figureToBytes(chart, 'png', self._dpi), title)
+
+    def addImage(self, image, title):
+        """Adds a bitmap given either as the bytes of an image or as a file name"""
+
+        from reportlab.lib.utils import ImageReader
+
+        if isinstance(image, bytes):
+            image = ImageReader(BytesIO(image))
+
+        self._canvas.drawImage(image, 0, 0)
+        self._endPage(title)
+
+    def addDrawing(self, svg, title):
+        """Adds the bytes of an svg image as a vector drawing"""
+
+        try:
+            from svglib.svglib import svg2rlg
+            from reportlab.graphics import renderPDF
+        except ImportError:
+            raise ImportError("Vector charts require svglib, install it with pip install svglib")
+
+        drawing = svg2rlg(BytesIO(svg))
+
+        #svg sizes are in points, scale the drawing to the size of the bitmap
+        scale = self._dpi / 72.0
+        drawing.width, drawing.height = drawing.width * scale, drawing.height * scale
+        drawing.scale(scale, scale)
+
+        renderPDF.draw(drawing, self._canvas, 0, 0)
+        self._endPage(title)
+
+    def addChart2(self, fileName, title):
+        
+        self.addImage(fileName, title)
+
+    def _endPage(self, title):
+
+        self._counter += 1 
+
+        self._canvas.bookmarkPage(str(self._counter))
+        self._canvas.addOutlineEntry(title, str(self._counter), 0, 0)
+        self._canvas.showPage()
+        
+    def write(self):
+        
+        self._canvas.save()
+
+
+#increase every time the charts change so that cached artifacts
+#rendered by older versions are not reused
+ARTIFACT_VERSION = 3
+
+#the columns the macro variables are computed from, and the attributes of the
+#dataset they depend on. The density depends on the time step, which comes
+#from the times of every vehicle, so it is part of the key
+MACRO_COLUMNS = ['_lane', '_locy', '_time', '_spd', '_leaveLane', '_enterLane']
+MACRO_ATTRIBUTES = ('space_bin', 'time_bin', 'time_step')
+
+
+class ChartJob(object):
+    """A chart of the report.
+
+    function(vt, fig, ax, **kwargs) draws the chart and returns its table or None.
+    The data the chart depends on is given by the columns it reads, the
+    attributes of the dataset that change its output and, for charts of a part
+    of the data, a window function called as window(vt, **kwargs) that returns
+    the rows the chart is drawn from. They make up the cache key of the chart.
+    """
+
+    def __init__(self, fileName, title, function, kwargs=None, sheet=None,
+                 columns=None, attributes=(), window=None):
+
+        self.fileName = fileName
+        self.title = title
+        self.function = function
+        self.kwargs = kwargs or {}
+        self.sheet = sheet
+        self.columns = columns
+        self.attributes = attributes
+        self.window = window
+
+    def params(self, vt):
+
+        params = dict(self.kwargs)
+        for name in self.attributes:
+            params[name] = getattr(vt, name)
+
+        return params
+
+    def render(self, vt, fig, ax):
+
+        return self.function(vt, fig, ax, **self.kwargs)
+
+
+def _plotSpeedVsDensity(vt, fig, ax, max_density):
+
+    vt.plotSpeedVsDensity(fig, ax, max_density=max_density)
+
+
+def _plotLCR(vt, fig, ax, laneChangeType):
+
+    vt.plotLCR(fig, laneChangeType=laneChangeType)
+
+
+def _plotSpeedVsDensityByLane(vt, fig, ax, plot_mean, dot_color, alpha):
+
+    vt.plotSpeedVsDensityByLane(fig, plot_mean=plot_mean, dot_color=dot_color, alpha=alpha)
+
+
+def _plotSpeedDistribution(vt, fig, ax):
+
+    return vt.plotSpeedDistribution(ax)
+
+
+def _plotAccelerationDistribution(vt, fig, ax):
+
+    return vt.plotAccelerationDistribution(ax)
+
+
+def _plotJerkDistribution(vt, fig, ax):
+
+    return vt.plotJerkDistribution(vt.getAccelerationJerk(), ax)
+
+
+def _plotARMS(vt, fig, ax):
+
+    armsDist = vt.getARMSDistribution()
+    vt.plotARMS(armsDist, ax)
+
+    return armsDist
+
+
+def _plotAllTrajectories(vt, fig, ax, lane, start_time, end_time, start_dist, end_dist):
+
+    vt.plotAllTrajectories(fig, ax, lane, start_time, end_time, start_dist, end_dist,
+                           point_size=0.5, title="All trajectories for lane %d" % lane)
+
+
+def _laneWindow(vt, lane, start_time, end_time, start_dist, end_dist):
+
+    return vt.window(lane, start_time, end_time, start_dist, end_dist)
+
+
+def reportJobs(trajectory_start=np.datetime64('2005-04-13 17:00:00'),
+               trajectory_end=np.datetime64('2005-04-13 17:10:00'), lanes=range(1, 8),
+               max_density=280):
+    """Returns the chart jobs of the standard report"""
+
+    macro = {'columns':MACRO_COLUMNS, 'attributes':MACRO_ATTRIBUTES}
+
+    jobs = [ChartJob("SpeedVsDensity.png", "SpeedVsDensity", _plotSpeedVsDensity,
+                     {'max_density':max_density}, **macro),
+            ChartJob("LCR.png", "LaneChangeRate", _plotLCR, {'laneChangeType':'enter'}, **macro),
+            ChartJob("SpeedVsDensityByLane.png", "SpeedVsDensityByLane", _plotSpeedVsDensityByLane,
+                     {'plot_mean':True, 'dot_color':'blue', 'alpha':0.4}, **macro),
+            ChartJob("SpeedDistribution.png", "SpeedDistribution", _plotSpeedDistribution,
+                     sheet='SpeedDistribution', columns=['_spd']),
+            ChartJob("AccelerationDistribution.png", "AccelerationDistribution",
+                     _plotAccelerationDistribution, sheet='AcclerationDistribution', columns=['_acc']),
+            ChartJob("AccelerationJerkDistribution.png", "AccelerationJerkDistribution",
+                     _plotJerkDistribution, sheet='JerkDistribution', columns=['_vid', '_time', '_acc']),
+            ChartJob("AccelerationRootMeanSquareError.png", "AccelerationRootMeanSquareError",
+                     _plotARMS, sheet='ARMS', columns=['_spd', '_acc'])]
+
+    for lane in lanes:
+        jobs.append(ChartJob("All_trajectories_lane_%d.png" % lane, "All trajectories for lane %d" % lane,
+                             _plotAllTrajectories,
+                             {'lane':lane, 'start_time':trajectory_start, 'end_time':trajectory_end,
+                              'start_dist':0, 'end_dist':1000},
+                             columns=['_time', '_locy', '_spd'], window=_laneWindow))
+
+    return jobs
+
+
+def artifactKey(vt, job, cache, fmt, digests=None):
+    """Returns the cache key of the chart. digests is an optional dictionary
+    of column digests that is shared by the charts of a report"""
+
+    if job.window is not None:
+        digest = frameDigest(job.window(vt, **job.kwargs), job.columns)
+    else:
+        if digests is None:
+            digests = {}
+
+        columns = job.columns if job.columns is not None else list(vt.df.columns)
+        for name in columns:
+            if name not in digests:
+                digests[name] = columnDigest(vt.df[name].values)
+
+        digest = "%d:%s" % (vt.df.shape[0], ",".join(digests[name] for name in columns))
+
+    method = "%s.%s" % (job.function.__module__, job.function.__name__)
+
+    return cache.key(digest, method, ARTIFACT_VERSION, fmt=fmt, **job.params(vt))
+
+
+def _initWorker():
+
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+
+
+def _renderJob(args):
+    """Renders one chart of the shared dataset into memory and returns the
+    title, the bytes of the image and the table of the chart"""
+
+    fmt, job = args
+
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 8), dpi=100)
+    table = job.render(_VT, fig, ax)
+
+    image = figureToBytes(fig, fmt, dpi=100)
+    plt.close(fig)
+
+    return job.title, image, table
+
+
+def renderCharts(vt, jobs, processes=None, fmt='png'):
+    """Renders the charts as png or svg images in a pool of worker processes
+    that use the Agg backend and returns the results in the order of the jobs.
+    The workers are forked so they share the loaded dataset. Where fork is not
+    available, or with processes=1, the charts are rendered one after the other
+    in this process."""
+
+    global _VT
+    _VT = vt
+
+    args = [(fmt, job) for job in jobs]
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(jobs))
+
+    try:
+        if processes <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            return [_renderJob(a) for a in args]
+
+        pool = multiprocessing.get_context('fork').Pool(processes, initializer=_initWorker)
+        try:
+            return pool.map(_renderJob, args, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        _VT = None
+
+
+def buildReport(vt, outputDir, processes=None, jobs=None, vector=False, keep_images=False,
+                cache=None):
+    """Renders the standard charts of the dataset in parallel and writes them
+    into report.pdf and their tables into tables.xlsx in the output directory.
+    The charts are embedded straight from memory, as vector drawings if vector
+    is True. With keep_images the images are also written to the output directory.
+
+    If an ArtifactCache is given, only the charts whose data or parameters
+    changed since they were cached are rendered again"""
+
+    if jobs is None:
+        jobs = reportJobs()
+
+    fmt = 'svg' if vector else 'png'
+
+    results = [None] * len(jobs)
+    keys = [None] * len(jobs)
+
+    if cache is not None:
+        digests = {}
+        for i, job in enumerate(jobs):
+            keys[i] = artifactKey(vt, job, cache, fmt, digests)
+            cached = cache.get(keys[i])
+            if cached is not None:
+                results[i] = (job.title,) + cached
+
+    missing = [i for i in range(len(jobs)) if results[i] is None]
+    rendered = renderCharts(vt, [jobs[i] for i in missing], processes, fmt)
+
+    for i, result in zip(missing, rendered):
+        results[i] = result
+        if cache is not None:
+            cache.put(keys[i], result[1], result[2], fmt)
+
+    pdfReport = PdfReport(os.path.join(outputDir, 'report.pdf'), PAGE_SIZE)
+    writer = pd.ExcelWriter(os.path.join(outputDir, 'tables.xlsx'))
+
+    for (title, image, table), job in zip(results, jobs):
+
+        if vector:
+            pdfReport.addDrawing(image, title)
+        else:
+            pdfReport.addImage(image, title)
+
+        if keep_images:
+            fileName = os.path.splitext(job.fileName)[0] + '.' + fmt
+            with open(os.path.join(outputDir, fileName), 'wb') as f:
+                f.write(image)
+
+        if job.sheet is not None:
+            table.to_excel(writer, sheet_name=job.sheet)
+
+    writer.close()
+    pdfReport.write()
+
+    return results
@@ -0,0 +1,222 @@
+"""Deterministic synthetic vehicle trajectories.
+
+The trajectories are written either in the layout of the raw NGSIM text files,
+read by VTAnalytics.readNGISIMData, or in the layout of the 'trajectories' table
+of the model HDF files, read by VTAnalytics.readModelData. The same seed and
+parameters always produce the same trajectories.
+
+>>> writeNGSIM('./data/synthetic.txt', rows=10**6)
+>>> writeModelHDF('./data/synthetic.hdf', rows=10**6)
+>>> vt = VTAnalytics.readNGISIMData('./data/synthetic.txt')
+"""
+
+import os                       # operating system io commands
+
+import numpy as np              # numerical computing with arrays
+import pandas as pd             # dataframe as in R
+
+from vehicleTrajectoryAnalytics import NGSIM_COLUMNS
+
+#the start of the synthetic data, the start of the NGSIM I-80 17:00 dataset
+START_TIME = np.datetime64('2005-04-13T17:00:00')
+
+#vehicles are generated in batches of this size so that the memory used to
+#write a file does not depend on the size of the file
+BATCH_VEHICLES = 20000
+
+MODEL_COLUMNS = ['oid', 'time', 'dist_along', 'laneIndex', 'speed', 'acceleration']
+
+VEHICLE_CLASSES = [(1, 7.0, 5.0), (2, 15.0, 6.0), (3, 40.0, 8.5)]
+
+
+class TrajectoryGenerator(object):
+    """Generates vehicles that enter a corridor of the given length at a constant
+    average flow per lane and drive to its end with a random, smoothed acceleration
+    and occasional lane changes.
+
+    rows is the approximate number of trajectory samples. The duration of the
+    data follows from the flow, so larger datasets cover longer periods.
+    """
+
+    def __init__(self, rows, seed=0, lanes=7, length=1650.0, time_step=0.1,
+                 flow=1500, mean_speed=40.0, lane_change_rate=0.3):
+
+        self.rows = int(rows)
+        self.seed = seed
+        self.lanes = lanes
+        self.length = length
+        self.time_step = time_step
+        self.flow = flow
+        self.mean_speed = mean_speed
+        self.lane_change_rate = lane_change_rate
+
+        #samples of a vehicle driving the corridor at the mean speed
+        samplesPerVehicle = length / (mean_speed * 5280 / 3600.0 * time_step)
+        self.vehicles = max(int(np.ceil(self.rows / samplesPerVehicle)), 1)
+
+        #the vehicles enter uniformly over the time it takes to reach the flow
+        self.duration = self.vehicles / float(flow * lanes) * 3600
+
+    def batches(self):
+        """Yields dictionaries of arrays with the samples of BATCH_VEHICLES
+        vehicles, ordered by vehicle and time"""
+
+        for first in range(0, self.vehicles, BATCH_VEHICLES):
+            yield self._batch(first, min(first + BATCH_VEHICLES, self.vehicles))
+
+    def _batch(self, first, last):
+
+        #every batch has its own seed so the output does not depend on how
+        #many batches are read
+        rng = np.random.RandomState([self.seed, first])
+        n = last - first
+        dt = self.time_step
+
+        vid = np.arange(first, last) + 1
+        entry = np.sort(rng.uniform(0, self.duration, n)) if n else np.zeros(0)
+        entry = np.round(entry / dt) * dt
+        speed0 = np.clip(rng.normal(self.mean_speed, 8.0, n), 10, 75) * 5280 / 3600.0
+        lane0 = rng.randint(1, self.lanes + 1, n)
+        vclass = rng.choice(len(VEHICLE_CLASSES), n, p=[0.05, 0.9, 0.05])
+
+        #the number of samples needed to drive the corridor at the initial speed
+        samples = np.ceil(self.length / (speed0 * dt)).astype(np.int64) + 1
+        starts = np.concatenate(([0], np.cumsum(samples)[:-1]))
+        total = int(samples.sum())
+
+        owner = np.repeat(np.arange(n), samples)
+        step = np.arange(total) - starts[owner]
+
+        #smoothed random acceleration in feet per second squared
+        noise = rng.normal(0, 1.5, total)
+        acc = noise.copy()
+        for k in range(1, 10):
+            shifted = np.roll(noise, k)
+            shifted[step < k] = 0
+            acc += shifted
+        acc /= np.sqrt(10)
+        acc[step == 0] = 0
+
+        #the speed is the initial speed plus the integrated acceleration
+        cum = np.cumsum(acc * dt)
+        speed = np.clip(speed0[owner] + cum - (cum[starts] - acc[starts] * dt)[owner], 0, None)
+        acc = np.diff(np.concatenate(([0], speed))) / dt
+        acc[step == 0] = 0
+
+        cum = np.cumsum(speed * dt)
+        locy = cum - (cum[starts] - speed[starts] * dt)[owner]
+
+        #lane changes at random samples, at most one lane at a time
+        changes = rng.poisson(self.lane_change_rate, n)
+        lane = lane0[owner]
+        for i in np.flatnonzero(changes):
+            at = np.sort(rng.randint(1, samples[i], changes[i]))
+            direction = rng.choice([-1, 1], changes[i])
+            offset = np.zeros(samples[i], dtype=np.int64)
+            np.add.at(offset, at, direction)
+            span = slice(starts[i], starts[i] + samples[i])
+            lane[span] = np.clip(lane[span] + np.cumsum(offset), 1, self.lanes)
+
+        classes = np.array(VEHICLE_CLASSES)[vclass]
+
+        return {'vid':vid[owner],
+                'frame':np.round(entry[owner] / dt).astype(np.int64) + step,
+                'samples':samples[owner],
+                'locy':np.round(locy, 3),
+                'lane':lane,
+                'speed':speed,
+                'acc':acc,
+                'vclass':classes[owner, 0].astype(np.int64),
+                'vlen':classes[owner, 1],
+                'vwidth':classes[owner, 2]}
+
+    def ngsimFrame(self, batch):
+        """Returns a batch in the layout of the raw NGSIM files"""
+
+        n = batch['vid'].shape[0]
+        startMs = (START_TIME - np.datetime64('1970-01-01T00:00:00')) // np.timedelta64(1, 'ms')
+        zeros = np.zeros(n)
+
+        return pd.DataFrame({'VehID':batch['vid'],
+                             'FrameID':batch['frame'],
+                             'TotalFrames':batch['samples'],
+                             'GlobalTime':startMs + np.round(batch['frame'] * self.time_step * 1000).astype(np.int64),
+                             'locX':(batch['lane'] - 0.5) * 12.0,
+                             'locY':batch['locy'],
+                             'globX':zeros,
+                             'globY':zeros,
+                             'vehLength':batch['vlen'],
+                             'vehWidth':batch['vwidth'],
+                             'vehClass':batch['vclass'],
+                             'vehSpeed':np.round(batch['speed'], 2),
+                             'vehAcceleration':np.round(batch['acc'], 2),
+                             'lane':batch['lane'],
+                             'precedingVeh':np.zeros(n, dtype=np.int64),
+                             'followingVeh':np.zeros(n, dtype=np.int64),
+                             'spacing':zeros,
+                             'headway':zeros}, columns=NGSIM_COLUMNS)
+
+    def modelFrame(self, batch):
+        """Returns a batch in the layout of the 'trajectories' table of the model
+        files. The speed is in miles per hour"""
+
+        ticks = np.round(batch['frame'] * self.time_step * 1000).astype(np.int64)
+
+        return pd.DataFrame({'oid':batch['vid'],
+                             'time':START_TIME + ticks.astype('timedelta64[ms]'),
+                             'dist_along':batch['locy'],
+                             'laneIndex':self.lanes + 1 - batch['lane'],
+                             'speed':batch['speed'] * 3600 / 5280.0,
+                             'acceleration':batch['acc']}, columns=MODEL_COLUMNS)
+
+
+def syntheticNGSIMFrame(rows, seed=0, **kwargs):
+    """Returns the synthetic trajectories in the NGSIM layout"""
+
+    gen = TrajectoryGenerator(rows, seed, **kwargs)
+
+    return pd.concat([gen.ngsimFrame(b) for b in gen.batches()], ignore_index=True)
+
+
+def syntheticModelFrame(rows, seed=0, **kwargs):
+    """Returns the synthetic trajectories in the model layout"""
+
+    gen = TrajectoryGenerator(rows, seed, **kwargs)
+
+    return pd.concat([gen.modelFrame(b) for b in gen.batches()], ignore_index=True)
+
+
+def writeNGSIM(fileName, rows, seed=0, **kwargs):
+    """Writes the synthetic trajectories as a whitespace separated NGSIM file
+    and returns the number of rows written"""
+
+    gen = TrajectoryGenerator(rows, seed, **kwargs)
+
+    written = 0
+    with open(fileName, 'w') as f:
+        for batch in gen.batches():
+            df = gen.ngsimFrame(batch)
+            df.to_csv(f, sep=' ', header=False, index=False, float_format='%.3f')
+            written += df.shape[0]
+
+    return written
+
+
+def writeModelHDF(fileName, rows, seed=0, **kwargs):
+    """Writes the synthetic trajectories as the 'trajectories' table of an HDF
+    file (requires pytables) and returns the number of rows written"""
+
+    gen = TrajectoryGenerator(rows, seed, **kwargs)
+
+    if os.path.exists(fileName):
+        os.remove(fileName)
+
+    written = 0
+    with pd.HDFStore(fileName, mode='w') as store:
+        for batch in gen.batches():
+            df = gen.modelFrame(batch)
+            df.index = np.arange(written, written + df.shape[0])
+            store.append('trajectories', df, format='table')
+            written += df.shape[0]
+
+    return written
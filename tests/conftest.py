@@ -0,0 +1,81 @@
+"""Small synthetic datasets shared by the tests.
+
+The modules of the package live at the top of the repository, which is added
+to the import path. The model data is read from the synthetic model frame
+instead of an HDF file, so the tests do not need pytables.
+"""
+
+import os
+import sys
+from unittest import mock
+
+import numpy as np              # numerical computing with arrays
+import pandas as pd             # dataframe as in R
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import syntheticTrajectories
+from vehicleTrajectoryAnalytics import VTAnalytics
+
+#the size of the synthetic datasets, enough vehicles for every lane and a few
+#minutes of data
+ROWS = 20000
+SEED = 3
+
+
+@pytest.fixture(scope='session')
+def ngsimFile(tmp_path_factory):
+
+    fileName = str(tmp_path_factory.mktemp('ngsim') / 'synthetic.txt')
+    syntheticTrajectories.writeNGSIM(fileName, ROWS, SEED)
+
+    return fileName
+
+
+@pytest.fixture(scope='session')
+def ngsim(ngsimFile):
+
+    return VTAnalytics.readNGISIMData(ngsimFile)
+
+
+@pytest.fixture(scope='session')
+def modelFrame():
+
+    return syntheticTrajectories.syntheticModelFrame(ROWS, SEED)
+
+
+def readModelFrame(frame, **kwargs):
+    """Reads a model frame with VTAnalytics.readModelData"""
+
+    with mock.patch.object(pd, 'read_hdf', lambda *args, **kw: frame.copy()):
+        return VTAnalytics.readModelData('synthetic.hdf', **kwargs)
+
+
+@pytest.fixture(scope='session')
+def model(modelFrame):
+
+    return readModelFrame(modelFrame)
+
+
+@pytest.fixture(params=['ngsim', 'model'])
+def dataset(request):
+    """Every test that uses this fixture runs on the NGSIM and the model data"""
+
+    return request.getfixturevalue(request.param)
+
+
+def seconds(times):
+    """Returns times in seconds, for datetimes from the epoch"""
+
+    times = np.asarray(times)
+    if times.dtype.kind == 'M':
+        return (times - np.datetime64(0, 's')) / np.timedelta64(1, 's')
+
+    return times.astype(np.float64)
+
+
+def byVehicle(df):
+    """Returns the rows sorted by vehicle and time with a new index"""
+
+    return df.sort_values(['_vid', '_time']).reset_index(drop=True)
@@ -0,0 +1,176 @@
+"""The mergeable accumulators against numpy and pandas on the same values"""
+
+import numpy as np              # numerical computing with arrays
+import pandas as pd             # dataframe as in R
+import pytest
+
+from histograms import HistogramAccumulator
+from quantileSketch import QuantileSketch
+from binnedStatistics import BinnedStatistic
+from vehicleTrajectoryAnalytics import VTAnalytics
+
+
+@pytest.fixture
+def values():
+
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.normal(35, 12, 50000), rng.uniform(-5, 90, 1000)])
+    values[::97] = np.nan
+
+    return values
+
+
+@pytest.mark.parametrize('edges', [np.arange(0, 80, 1.0), np.arange(-3, 70, 2.5),
+                                   np.array([0, 5, 12.5, 30, 31, 55, 80])])
+def test_histogram_chunks_and_merges(values, edges):
+
+    valid = values[~np.isnan(values)]
+    expected = np.histogram(valid, edges)[0]
+
+    chunked = HistogramAccumulator(edges)
+    for chunk in np.array_split(values, 7):
+        chunked.fill(chunk)
+
+    parts = [HistogramAccumulator.fromValues(chunk, edges) for chunk in np.array_split(values, 3)]
+    merged = parts[0] + parts[1] + parts[2]
+
+    for h in (chunked, merged):
+        np.testing.assert_array_equal(h.counts, expected)
+        assert h.total == values.shape[0]
+        assert h.missing == np.isnan(values).sum()
+        assert h.under == (valid < edges[0]).sum()
+        assert h.over == (valid > edges[-1]).sum()
+
+    back = HistogramAccumulator.fromJSON(merged.toJSON())
+    np.testing.assert_array_equal(back.counts, expected)
+    assert back.toDict() == merged.toDict()
+
+
+def test_histogram_edges_values():
+
+    #values on the edges fall into the bin to their right, the last edge into the last bin
+    edges = np.arange(0, 5, 1.0)
+    values = np.array([0, 1, 1, 2.0, 3.9999999, 4, 4.0000001, -1e-12])
+
+    h = HistogramAccumulator.fromValues(values, edges)
+
+    np.testing.assert_array_equal(h.counts, np.histogram(values, edges)[0])
+    assert (h.under, h.over) == (1, 1)
+
+
+def test_histogram_merge_different_edges():
+
+    with pytest.raises(ValueError):
+        HistogramAccumulator(np.arange(5)).merge(HistogramAccumulator(np.arange(6)))
+
+
+def test_sketch_is_exact_below_capacity(values):
+
+    small = values[:150]
+    sketch = QuantileSketch(k=200).fill(small)
+
+    q = [0, 1, 5, 25, 50, 75, 95, 99, 100]
+    np.testing.assert_allclose(sketch.quantile(q), np.nanpercentile(small, q))
+
+
+def test_sketch_chunks_and_merges(values):
+
+    valid = values[~np.isnan(values)]
+    parts = np.array_split(values, 10)
+
+    chunked = QuantileSketch.fromChunks(parts, seed=1)
+    merged = QuantileSketch(seed=2)
+    for part in parts:
+        merged.merge(QuantileSketch(seed=3).fill(part))
+
+    q = np.array([1, 5, 25, 50, 75, 95, 99])
+    for sketch in (chunked, merged):
+
+        #the moments are exact
+        assert sketch.count == values.shape[0]
+        assert sketch.missing == np.isnan(values).sum()
+        assert sketch.mean == pytest.approx(valid.mean(), rel=1e-12)
+        assert sketch.std == pytest.approx(valid.std(), rel=1e-9)
+        assert (sketch.min, sketch.max) == (valid.min(), valid.max())
+
+        #the percentiles are within the rank error of the sketch
+        ranks = np.searchsorted(np.sort(valid), sketch.quantile(q)) / float(valid.shape[0])
+        np.testing.assert_allclose(ranks, q / 100.0, atol=0.02)
+
+    back = QuantileSketch.fromJSON(merged.toJSON())
+    np.testing.assert_array_equal(back.quantile(q), merged.quantile(q))
+
+
+def test_describe_arrays_exactly(values):
+
+    exact = VTAnalytics.describe(pd.Series(values))
+
+    #arrays and lists are described exactly, like a series
+    for var in (values, list(values), pd.Index(values)):
+        pd.testing.assert_frame_equal(VTAnalytics.describe(var), exact)
+
+    #an iterator of chunks is summarized by a sketch with the same moments
+    chunked = VTAnalytics.describe(iter(np.array_split(values, 5)))
+    pd.testing.assert_frame_equal(chunked.loc[['count', 'NA', 'mean', 'std', 'min', 'max']],
+                                  exact.loc[['count', 'NA', 'mean', 'std', 'min', 'max']])
+
+
+def referenceSums(keys, values, weights):
+
+    df = pd.DataFrame(dict(('key%d' % i, k) for i, k in enumerate(keys)))
+    known = ~np.isnan(values)
+    x = np.where(known, values, 0)
+    df['count'], df['n'], df['sum'], df['sumsq'] = weights, weights * known, weights * x, weights * x * x
+
+    return df.groupby(list(df.columns[:len(keys)])).sum()
+
+
+@pytest.mark.parametrize('kind', ['dense', 'sparse', 'float'])
+def test_binned_statistic(kind):
+
+    rng = np.random.default_rng(1)
+    n = 20000
+    lane = rng.integers(1, 8, n)
+    second = {'dense':rng.integers(-3, 40, n),
+              'sparse':rng.integers(0, 50, n) * 10**7,
+              'float':rng.integers(0, 40, n) * 0.5}[kind]
+    keys = [lane, second]
+
+    values = rng.normal(size=n)
+    values[::13] = np.nan
+    weights = rng.random(n)
+
+    stat = BinnedStatistic()
+    for part in np.array_split(np.arange(n), 4):
+        stat.fill([k[part] for k in keys], values[part], weights[part])
+
+    merged = (BinnedStatistic().fill([k[:n // 2] for k in keys], values[:n // 2], weights[:n // 2])
+              .merge(BinnedStatistic().fill([k[n // 2:] for k in keys], values[n // 2:], weights[n // 2:])))
+
+    reference = referenceSums(keys, values, weights)
+    for s in (stat, merged):
+        np.testing.assert_array_equal(s.bins[0], reference.index.get_level_values(0))
+        np.testing.assert_array_equal(s.bins[1], reference.index.get_level_values(1))
+        for name in ['count', 'n', 'sum', 'sumsq']:
+            np.testing.assert_allclose(getattr(s, name), reference[name].values, rtol=1e-9)
+
+    #the statistics of the values that are not missing
+    df = pd.DataFrame({'lane':lane, 'second':second, 'x':values, 'w':weights}).dropna()
+    groups = df.assign(wx=df.w * df.x).groupby(['lane', 'second'])
+    np.testing.assert_allclose(stat.mean, (groups.wx.sum() / groups.w.sum()).values, rtol=1e-9)
+
+
+def test_binned_statistic_regroup():
+
+    rng = np.random.default_rng(2)
+    speed = rng.integers(0, 70, 5000)
+    acc = rng.normal(size=5000)
+
+    stat = BinnedStatistic().fill(speed, acc)
+    coarse = stat.regroup(stat.bins[0] // 5 * 5)
+    direct = BinnedStatistic().fill(speed // 5 * 5, acc)
+
+    np.testing.assert_array_equal(coarse.bins[0], direct.bins[0])
+    np.testing.assert_allclose(coarse.rms, direct.rms, rtol=1e-12)
+    np.testing.assert_allclose(coarse.var, pd.Series(acc).groupby(speed // 5 * 5).var(ddof=0).values,
+                               rtol=1e-9)
@@ -0,0 +1,81 @@
+"""The compact mode of the readers against the full dtypes"""
+
+import numpy as np              # numerical computing with arrays
+import pandas as pd             # dataframe as in R
+import pytest
+
+from conftest import readModelFrame
+from vehicleTrajectoryAnalytics import VTAnalytics, COMPACT_ALIASES
+
+#the memory of the full frame divided by the one of the compact frame. The
+#time and global coordinates stay float64 and the vehicle ids int32
+RATIOS = {'ngsim':2.3, 'model':2.9}
+
+
+@pytest.fixture(scope='module')
+def compactNgsim(ngsimFile):
+
+    return VTAnalytics.readNGISIMData(ngsimFile, compact=True)
+
+
+@pytest.fixture(scope='module')
+def compactModel(modelFrame):
+
+    return readModelFrame(modelFrame, compact=True)
+
+
+@pytest.fixture(params=['ngsim', 'model'])
+def pair(request, ngsim, model, compactNgsim, compactModel):
+
+    full, compact = {'ngsim':(ngsim, compactNgsim), 'model':(model, compactModel)}[request.param]
+
+    return request.param, full, compact
+
+
+def test_memory_ratio(pair):
+
+    name, full, compact = pair
+    total = compact.compactReport.loc['total']
+
+    assert total.bytes_before == full.df.memory_usage(index=False, deep=True).sum()
+    assert total.bytes_after == compact.df.memory_usage(index=False, deep=True).sum()
+    assert total.bytes_before / float(total.bytes_after) >= RATIOS[name]
+
+
+def test_vehicle_ids_stay_int32(pair):
+
+    name, full, compact = pair
+
+    for col in ['_vid', 'VehID', 'precedingVeh', 'followingVeh']:
+        if col in compact.df.columns:
+            assert compact.df[col].dtype == np.int32
+    for col in ['_prV', '_flV']:
+        assert compact.df[col].dtype == 'Int32'
+
+
+def test_raw_columns(pair):
+
+    name, full, compact = pair
+    raw = [col for col, alias in COMPACT_ALIASES.items()
+           if col in full.df.columns and alias in full.df.columns]
+
+    assert raw
+    for col in raw:
+        assert col not in compact.df.columns
+        values = compact.df.raw[col]
+        assert values.name == col
+        if values.dtype.kind == 'f':
+            #float32 kinematics
+            np.testing.assert_allclose(values.values.astype(np.float64),
+                                       full.df[col].values.astype(np.float64), rtol=1e-6)
+        else:
+            np.testing.assert_array_equal(values.values, full.df[col].values)
+
+        #an alias is the app specific column, not a copy of it
+        if col != 'GlobalTime':
+            assert np.shares_memory(values.values, compact.df[COMPACT_ALIASES[col]].values)
+
+    #the columns of the frame and unknown names
+    pd.testing.assert_series_equal(compact.df.raw._spd, compact.df._spd)
+    with pytest.raises(AttributeError):
+        compact.df.raw.noSuchColumn
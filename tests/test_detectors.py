@@ -0,0 +1,103 @@
+"""The virtual detectors against crossings found vehicle by vehicle"""
+
+import numpy as np              # numerical computing with arrays
+import pandas as pd             # dataframe as in R
+import pytest
+
+from conftest import seconds
+from virtualDetectors import VirtualDetectors, findCrossings
+
+STATIONS = [100, 600, 1100, 1600]
+INTERVAL = 30
+
+
+def referenceCrossings(df, stations):
+    """Returns the crossings of the stations between consecutive samples of
+    every vehicle, with the time in seconds"""
+
+    rows = []
+    for vid, group in df.sort_values(['_vid', '_time']).groupby('_vid'):
+
+        t = seconds(group._time.values)
+        y = group._locy.values.astype(np.float64)
+        lane = group._lane.values
+        spd = group._spd.values.astype(np.float64)
+
+        for i in range(t.shape[0] - 1):
+            for station in stations:
+                if y[i] < station <= y[i + 1]:
+                    frac = (station - y[i]) / (y[i + 1] - y[i])
+                    rows.append((vid, station, lane[i] if frac < 0.5 else lane[i + 1],
+                                 t[i] + frac * (t[i + 1] - t[i]),
+                                 spd[i] + frac * (spd[i + 1] - spd[i])))
+
+    return pd.DataFrame(rows, columns=['_vid', 'station', '_lane', 'seconds', '_spd'])
+
+
+@pytest.fixture(scope='module')
+def crossings(ngsim):
+
+    return referenceCrossings(ngsim.df, STATIONS)
+
+
+def test_findCrossings(ngsim, crossings):
+
+    found = findCrossings(ngsim.df, STATIONS).sort_values(['_vid', 'station']).reset_index(drop=True)
+    reference = crossings.sort_values(['_vid', 'station']).reset_index(drop=True)
+
+    assert found.shape[0] == reference.shape[0] > 0
+    for name in ['_vid', 'station', '_lane']:
+        np.testing.assert_array_equal(found[name].values, reference[name].values)
+    np.testing.assert_allclose(seconds(found._time.values), reference.seconds.values, rtol=0, atol=1e-5)
+    np.testing.assert_allclose(found._spd.values, reference._spd.values, rtol=1e-9)
+
+
+def test_detector_data(ngsim, crossings):
+
+    data = ngsim.getDetectorData(STATIONS, INTERVAL)
+
+    reference = crossings.assign(interval=np.floor(crossings.seconds / INTERVAL + 1e-9) * INTERVAL)
+    groups = reference.groupby(['station', '_lane', 'interval'])
+    expected = pd.DataFrame({'count':groups.size(),
+                             'speed':groups._spd.mean(),
+                             'space_mean_speed':groups._spd.agg(lambda s: 1 / np.mean(1 / s[s > 0]))})
+
+    assert data.shape[0] == expected.shape[0]
+    np.testing.assert_array_equal(data.index.get_level_values('station'),
+                                  expected.index.get_level_values('station'))
+    np.testing.assert_array_equal(data.index.get_level_values('_lane'),
+                                  expected.index.get_level_values('_lane'))
+    np.testing.assert_allclose(data.index.get_level_values('_interval').values.astype(np.float64),
+                               expected.index.get_level_values('interval'))
+
+    np.testing.assert_array_equal(data['count'].values, expected['count'].values)
+    np.testing.assert_allclose(data.flow.values, expected['count'].values * 3600.0 / INTERVAL)
+    np.testing.assert_allclose(data.speed.values, expected.speed.values, rtol=1e-9)
+    np.testing.assert_allclose(data.space_mean_speed.values, expected.space_mean_speed.values, rtol=1e-9)
+
+
+def test_occupancy(ngsim, crossings):
+
+    data = ngsim.getDetectorData(STATIONS, INTERVAL, loop_length=6)
+
+    #every crossing occupies the loop while the vehicle and the loop pass
+    vlen = ngsim.df.groupby('_vid')._vlen.first()
+    reference = crossings.assign(interval=np.floor(crossings.seconds / INTERVAL + 1e-9) * INTERVAL,
+                                 occupied=(crossings._vid.map(vlen) + 6) /
+                                          (crossings._spd * 5280 / 3600))
+    occupancy = reference.groupby(['station', '_lane', 'interval']).occupied.sum() / INTERVAL * 100
+
+    np.testing.assert_allclose(data.occupancy.values, occupancy.values, rtol=1e-9)
+
+
+def test_frames_in_time_order(ngsim):
+
+    #crossings between the last sample of a frame and the first of the next are found
+    df = ngsim.df
+    elapsed = seconds(df._time.values) - seconds(df._time.values).min()
+
+    detectors = VirtualDetectors(STATIONS, INTERVAL)
+    for key, frame in df.groupby(np.floor(elapsed / 7), sort=True):
+        detectors.fill(frame)
+
+    pd.testing.assert_frame_equal(detectors.toFrame(), ngsim.getDetectorData(STATIONS, INTERVAL))
@@ -0,0 +1,114 @@
+"""VTAnalytics.resample and getAccelerationJerk against a loop over the vehicles"""
+
+import numpy as np              # numerical computing with arrays
+import pandas as pd             # dataframe as in R
+import pytest
+
+from conftest import seconds, byVehicle
+
+COLUMNS = ['_acc', '_spd', '_locy']
+
+
+def referenceBins(df, timeStep, how='mean'):
+    """Returns the mean or last sample of every vehicle and time bin, vehicle by vehicle"""
+
+    result = []
+    for vid, group in df.sort_values(['_vid', '_time']).groupby('_vid'):
+
+        bins = np.floor(seconds(group._time.values) / timeStep + 1e-9).astype(np.int64)
+        grouped = group[COLUMNS].groupby(bins)
+        values = grouped.mean() if how == 'mean' else grouped.last()
+
+        values['_vid'] = vid
+        values['_bin'] = values.index
+        result.append(values.reset_index(drop=True))
+
+    return pd.concat(result, ignore_index=True)
+
+
+def referenceLinear(df, timeStep):
+    """Interpolates every vehicle at the multiples of the time step"""
+
+    result = []
+    for vid, group in df.sort_values(['_vid', '_time']).groupby('_vid'):
+
+        t = seconds(group._time.values)
+        grid = np.arange(np.ceil(t[0] / timeStep - 1e-9), np.floor(t[-1] / timeStep + 1e-9) + 1)
+
+        values = pd.DataFrame(dict((c, np.interp(grid * timeStep, t, group[c].values)) for c in COLUMNS))
+        values['_vid'] = vid
+        values['_bin'] = grid.astype(np.int64)
+        result.append(values)
+
+    return pd.concat(result, ignore_index=True)
+
+
+def assertResampled(resampled, reference, timeStep):
+
+    reference = reference.dropna().sort_values(['_vid', '_bin']).reset_index(drop=True)
+    resampled = byVehicle(resampled)
+
+    assert resampled.shape[0] == reference.shape[0]
+    np.testing.assert_array_equal(resampled._vid.values, reference._vid.values)
+    np.testing.assert_allclose(seconds(resampled._time.values), reference._bin.values * timeStep,
+                               rtol=0, atol=1e-6)
+
+    for c in COLUMNS:
+        np.testing.assert_allclose(resampled[c].values, reference[c].values, rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize('how', ['mean', 'last'])
+def test_resample(dataset, how):
+
+    resampled = dataset.resample(1, how)
+
+    assertResampled(resampled, referenceBins(dataset.df, 1, how), 1)
+
+
+def test_resample_linear(dataset):
+
+    resampled = dataset.resample(0.5, 'linear')
+
+    assertResampled(resampled, referenceLinear(dataset.df, 0.5), 0.5)
+
+
+def test_resample_time_step_forms(model):
+
+    one = model.resample(1)
+
+    pd.testing.assert_frame_equal(model.resample('1s'), one)
+    pd.testing.assert_frame_equal(model.resample(pd.Timedelta('1s')), one)
+
+
+def test_jerk(dataset):
+
+    jerk = byVehicle(dataset.getAccelerationJerk())
+
+    #the jerk is the change of the mean acceleration between adjacent time bins
+    reference = referenceBins(dataset.df, 1)
+    reference = reference.sort_values(['_vid', '_bin']).reset_index(drop=True)
+    adjacent = ((reference._vid.shift(-1) == reference._vid) &
+                (reference._bin.shift(-1) == reference._bin + 1))
+    reference['_jerk'] = np.where(adjacent, reference._acc.shift(-1) - reference._acc, np.nan)
+    reference = reference.dropna().reset_index(drop=True)
+
+    assert jerk.shape[0] == reference.shape[0]
+    np.testing.assert_array_equal(jerk._vid.values, reference._vid.values)
+    np.testing.assert_allclose(seconds(jerk._time.values), reference._bin.values, rtol=0, atol=1e-6)
+    np.testing.assert_allclose(jerk._jerk.values, reference._jerk.values, rtol=1e-9, atol=1e-9)
+
+
+def test_jerk_native_resolution(dataset):
+
+    jerk = byVehicle(dataset.getAccelerationJerk(None))
+
+    df = byVehicle(dataset.df)
+    same = df._vid.shift(-1) == df._vid
+    dt = seconds(df._time.shift(-1).values) - seconds(df._time.values)
+    df['_jerk'] = np.where(same, (df._acc.shift(-1) - df._acc) / dt, np.nan)
+    reference = df[COLUMNS + ['_vid', '_jerk']].dropna().reset_index(drop=True)
+
+    np.testing.assert_array_equal(jerk._vid.values, reference._vid.values)
+    #the reference time steps come from times in seconds since the epoch, whose
+    #float64 differences are only accurate to about 1e-7 s
+    np.testing.assert_allclose(jerk._jerk.values, reference._jerk.values, rtol=1e-5)
@@ -0,0 +1,87 @@
+"""The macroscopic variables of df_macro against a groupby of the trajectories"""
+
+import numpy as np              # numerical computing with arrays
+import pandas as pd             # dataframe as in R
+import pytest
+
+from conftest import seconds
+from vehicleTrajectoryAnalytics import VTAnalytics
+from liveMacroStats import LiveMacroStats
+
+VARIABLES = ['speed', 'density', 'numVehiclesLeavingLane', 'numVehiclesEnteringLane']
+
+
+def timeStepInSeconds(timeStep):
+
+    if isinstance(timeStep, (pd.Timedelta, np.timedelta64)):
+        return pd.Timedelta(timeStep).total_seconds()
+
+    return float(timeStep)
+
+
+def referenceMacro(df, space_bin, time_bin, time_step):
+    """Returns the variables of every (lane, space bin, time bin) with samples"""
+
+    keys = [df._lane.values,
+            np.floor(df._locy.values.astype(np.float64) / space_bin).astype(np.int64),
+            np.floor(seconds(df._time.values) / time_bin + 1e-9).astype(np.int64)]
+    groups = df.groupby(keys)
+
+    rate = (3600 / time_bin) * (5280 / space_bin)
+
+    return pd.DataFrame({'speed':groups._spd.mean(),
+                         'density':groups.size() * (5280 / space_bin) / (time_bin / time_step),
+                         'numVehiclesLeavingLane':groups._leaveLane.sum() * rate,
+                         'numVehiclesEnteringLane':groups._enterLane.sum() * rate})
+
+
+def assertMacro(df_macro, reference, time_bin):
+
+    #the cube covers every cell between the first and last bins, the cells
+    #without samples are missing
+    filled = df_macro[df_macro.density.notnull()]
+    assert filled.shape[0] == reference.shape[0]
+    assert df_macro.density.isnull().sum() == df_macro.shape[0] - reference.shape[0]
+
+    index = filled.index
+    keys = pd.MultiIndex.from_arrays([index.get_level_values(0), index.get_level_values(1),
+                                      np.round(seconds(index.get_level_values(2).values) /
+                                               time_bin).astype(np.int64)])
+    filled = filled.set_axis(keys).sort_index()
+
+    np.testing.assert_array_equal(filled.index.to_frame().values, reference.index.to_frame().values)
+    for name in VARIABLES:
+        np.testing.assert_allclose(filled[name].values, reference[name].values, rtol=1e-9)
+
+
+def test_df_macro(dataset):
+
+    reference = referenceMacro(dataset.df, 50, 10, timeStepInSeconds(dataset.time_step))
+
+    assertMacro(dataset.df_macro, reference, 10)
+
+
+@pytest.mark.parametrize('space_bin, time_bin', [(100, 30), (25, 5)])
+def test_recalculateMacroVars(dataset, space_bin, time_bin):
+
+    #(100, 30) is coarsened from the cube, (25, 5) needs a new one
+    vt = VTAnalytics(dataset.df)
+    vt.recalculateMacroVars(space_bin, time_bin)
+
+    reference = referenceMacro(dataset.df, space_bin, time_bin, timeStepInSeconds(vt.time_step))
+
+    assertMacro(vt.df_macro, reference, time_bin)
+    assert vt.macroVars['speed'].shape == (vt.macro.lanes.shape[0], vt.macro.spaceIds.shape[0],
+                                           vt.macro.timeIds.shape[0])
+
+
+def test_live_macro_stats(model):
+
+    df = model.df
+    elapsed = seconds(df._time.values) - seconds(df._time.values).min()
+
+    live = LiveMacroStats(50, 10, horizon=10**6)
+    for key, frame in df.groupby(np.floor(elapsed / 5), sort=True):
+        live.update(frame)
+
+    pd.testing.assert_frame_equal(live.cube().trim().toFrame(live.time_step), model.df_macro)
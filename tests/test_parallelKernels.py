@@ -0,0 +1,36 @@
+"""The parts of applyByGroups against the kernel run on all the rows"""
+
+import numpy as np              # numerical computing with arrays
+
+from groupedArrays import _groupStarts
+from parallelKernels import kernelPool, applyByGroups, _groupCuts
+from vehicleTrajectoryAnalytics import _vehicleKinematics
+
+
+def test_cuts_fall_on_groups():
+
+    rng = np.random.default_rng(4)
+    vid = np.sort(rng.integers(0, 300, 10000))
+
+    for parts in [1, 2, 3, 8]:
+        cuts = _groupCuts([vid], parts)
+
+        assert cuts[0] == 0 and cuts[-1] == vid.shape[0]
+        assert np.isin(cuts[:-1], _groupStarts(vid)).all()
+        assert cuts.shape[0] <= parts + 1
+
+
+def test_parts_equal_all_rows():
+
+    rng = np.random.default_rng(5)
+    vid = np.sort(rng.integers(0, 300, 10000))
+    time = np.arange(vid.shape[0]) * 0.1
+    locy = np.cumsum(rng.random(vid.shape[0]) * 5)
+
+    expected = _vehicleKinematics(vid, time, locy)
+
+    with kernelPool(3) as pool:
+        results = applyByGroups(_vehicleKinematics, [vid, time, locy], [vid], pool, 3)
+
+    for a, b in zip(results, expected):
+        np.testing.assert_array_equal(a, b)
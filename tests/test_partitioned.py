@@ -0,0 +1,94 @@
+"""The partitioned mode against the in-memory results"""
+
+import numpy as np              # numerical computing with arrays
+import pandas as pd             # dataframe as in R
+import pytest
+
+from conftest import byVehicle
+from vehicleTrajectoryAnalytics import VTAnalytics
+from partitionedAnalytics import PartitionedVTAnalytics
+
+STATIONS = [100, 600, 1100, 1600]
+
+
+@pytest.fixture(scope='module')
+def partitioned(ngsimFile, tmp_path_factory):
+
+    #small slabs and chunks, so vehicles cross many slab and chunk boundaries
+    return PartitionedVTAnalytics.readNGISIMData(ngsimFile, str(tmp_path_factory.mktemp('slabs')),
+                                                 slab_seconds=20, chunksize=5000)
+
+
+def test_slabs_equal_the_in_memory_rows(ngsim, partitioned):
+
+    assert len(partitioned.slabs) > 2
+    assert partitioned.rows == ngsim.df.shape[0]
+
+    slabs = byVehicle(pd.concat(list(partitioned.slabFrames()), ignore_index=True))
+    rows = byVehicle(ngsim.df)
+
+    pd.testing.assert_frame_equal(slabs[rows.columns], rows, check_dtype=False)
+
+
+def test_reopened_slabs(ngsim, partitioned):
+
+    reopened = PartitionedVTAnalytics.open(partitioned.directory)
+
+    pd.testing.assert_frame_equal(reopened.getTTCDistribution(), ngsim.getTTCDistribution())
+    pd.testing.assert_frame_equal(reopened.df_macro, ngsim.df_macro)
+
+
+@pytest.mark.parametrize('method', ['getTTCDistribution', 'calculateCorridorTravelTimes',
+                                    'getARMSDistribution', 'getNumOfLaneChangesPerLane'])
+def test_tables(ngsim, partitioned, method):
+
+    pd.testing.assert_frame_equal(getattr(partitioned, method)(), getattr(ngsim, method)(),
+                                  check_dtype=False)
+
+
+def test_df_macro(ngsim, partitioned):
+
+    pd.testing.assert_frame_equal(partitioned.df_macro, ngsim.df_macro)
+
+    #coarser bins come from the cube, other bins from another pass over the slabs
+    for space_bin, time_bin in [(100, 30), (75, 7)]:
+        vt = VTAnalytics(ngsim.df, space_bin=space_bin, time_bin=time_bin)
+        partitioned.recalculateMacroVars(space_bin, time_bin)
+        pd.testing.assert_frame_equal(partitioned.df_macro, vt.df_macro)
+
+    partitioned.recalculateMacroVars(50, 10)
+
+
+def test_histograms(ngsim, partitioned):
+
+    for name in ['speedHistogram', 'accelerationHistogram', 'ttcHistogram']:
+        a, b = getattr(partitioned, name)(), getattr(ngsim, name)()
+        np.testing.assert_array_equal(a.edges, b.edges)
+        np.testing.assert_array_equal(a.counts, b.counts)
+        assert (a.total, a.missing, a.under, a.over) == (b.total, b.missing, b.under, b.over)
+
+
+def test_describe(ngsim, partitioned):
+
+    a = partitioned.describe('_spd')
+    b = VTAnalytics.describe(ngsim.df._spd)
+
+    #the moments are exact, the percentiles of the sketches agree within the
+    #rank error of the sketch
+    pd.testing.assert_frame_equal(a.loc[['count', 'mean', 'std', 'min', 'max']],
+                                  b.loc[['count', 'mean', 'std', 'min', 'max']])
+    np.testing.assert_allclose(a.values.astype(np.float64), b.values.astype(np.float64), rtol=0.05)
+
+
+def test_detectors(ngsim, partitioned):
+
+    pd.testing.assert_frame_equal(partitioned.getDetectorData(STATIONS, 30),
+                                  ngsim.getDetectorData(STATIONS, 30))
+
+
+@pytest.mark.parametrize('method', ['plotAllTrajectories', 'plotSelectedTrajectories',
+                                    'plotSpeedVsDensityByLane', 'plotLCR'])
+def test_charts_of_the_rows(partitioned, method):
+
+    with pytest.raises(NotImplementedError, match=method):
+        getattr(partitioned, method)(None)
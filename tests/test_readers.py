@@ -0,0 +1,50 @@
+"""The chunked, multi-core and cached readers against the in-memory reader"""
+
+import numpy as np              # numerical computing with arrays
+import pandas as pd             # dataframe as in R
+import pytest
+
+from conftest import readModelFrame
+from vehicleTrajectoryAnalytics import VTAnalytics
+from trajectoryCache import DatasetCache
+
+
+def test_chunked_ngsim(ngsimFile, ngsim):
+
+    vt = VTAnalytics.readNGISIMData(ngsimFile, chunksize=3000)
+
+    pd.testing.assert_frame_equal(vt.df, ngsim.df, check_exact=True)
+
+
+def test_multi_core_ngsim(ngsimFile, ngsim):
+
+    vt = VTAnalytics.readNGISIMData(ngsimFile, processes=2)
+
+    pd.testing.assert_frame_equal(vt.df, ngsim.df, check_exact=True)
+    pd.testing.assert_frame_equal(vt.df_macro, ngsim.df_macro)
+
+
+def test_multi_core_model(modelFrame, model):
+
+    vt = readModelFrame(modelFrame, processes=2)
+
+    pd.testing.assert_frame_equal(vt.df, model.df, check_exact=True)
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_cached_ngsim(ngsimFile, tmp_path, compact):
+
+    cache = DatasetCache(str(tmp_path))
+    fresh = VTAnalytics.readNGISIMData(ngsimFile, cache=cache, compact=compact)
+    cached = VTAnalytics.readNGISIMData(ngsimFile, cache=cache, compact=compact)
+
+    assert cache.entries().shape[0] == 1
+    pd.testing.assert_frame_equal(cached.df, fresh.df, check_exact=True)
+
+    #the sort orders of the reader and the compact report come with the entry
+    assert list(cached._orders) == ['vehicle']
+    np.testing.assert_array_equal(cached._orders['vehicle'], fresh._orders['vehicle'])
+    if compact:
+        pd.testing.assert_frame_equal(cached.compactReport, fresh.compactReport)
+    else:
+        assert cached.compactReport is None
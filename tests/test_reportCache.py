@@ -0,0 +1,50 @@
+"""The keys and the entries of the artifact cache of the report"""
+
+import numpy as np              # numerical computing with arrays
+import pandas as pd             # dataframe as in R
+
+from vehicleTrajectoryAnalytics import VTAnalytics
+from trajectoryCache import ArtifactCache
+from reportPipeline import reportJobs, artifactKey
+
+
+def macroJob():
+
+    return [job for job in reportJobs(lanes=[]) if job.title == "SpeedVsDensity"][0]
+
+
+def test_macro_key_depends_on_time_step(ngsim, tmp_path):
+
+    cache = ArtifactCache(str(tmp_path))
+    vt = VTAnalytics(ngsim.df)
+
+    key = artifactKey(vt, macroJob(), cache, 'png')
+    assert artifactKey(VTAnalytics(ngsim.df), macroJob(), cache, 'png') == key
+
+    #the density of every cell is proportional to the time step
+    vt.time_step = vt.time_step * 2
+    assert artifactKey(vt, macroJob(), cache, 'png') != key
+
+
+def test_tables_round_trip(ngsim, tmp_path):
+
+    cache = ArtifactCache(str(tmp_path))
+
+    #a table with an unnamed index and one like the distributions, with the
+    #bins as a named string index and floats that need all their digits
+    rng = np.random.default_rng(0)
+    percentage = rng.random(50) * 100
+    percentage[3] = np.nan
+    tables = [ngsim.getARMSDistribution(),
+              pd.DataFrame({'freq':np.arange(50), 'Percentage':percentage},
+                           index=pd.Index(['%.1f' % b for b in np.arange(50) / 10.0], name='bin center'))]
+
+    for i, table in enumerate(tables):
+        cache.put(str(i), b'image', table)
+        image, cached = cache.get(str(i))
+
+        assert image == b'image'
+        pd.testing.assert_frame_equal(cached, table, check_exact=True)
+
+    cache.put('none', b'image')
+    assert cache.get('none') == (b'image', None)
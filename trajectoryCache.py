@@ -0,0 +1,294 @@
+import os                       # operating system io commands
+import io
+import json
+import shutil
+import hashlib
+
+import numpy as np              # numerical computing with arrays
+import pandas as pd             # dataframe as in R
+from pandas.io.json import build_table_schema
+
+from columnStore import ColumnStore, readColumns
+
+
+def fileDigest(fileName, block_size=2**20):
+    """Returns the sha1 digest of the contents of a file"""
+
+    digest = hashlib.sha1()
+    with open(fileName, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def columnDigest(values):
+    """Returns the sha1 digest of the dtype and the values of a column"""
+
+    digest = hashlib.sha1(str(values.dtype).encode())
+
+    if isinstance(values, np.ndarray) and values.dtype.kind != 'O':
+        digest.update(np.ascontiguousarray(values).view(np.uint8))
+    else:
+        #object and nullable columns are hashed element by element
+        digest.update(pd.util.hash_array(np.asarray(values, dtype=object)))
+
+    return digest.hexdigest()
+
+
+def frameDigest(df, columns=None):
+    """Returns the sha1 digest of the selected columns of a dataframe"""
+
+    if columns is None:
+        columns = df.columns
+
+    digest = hashlib.sha1(str(df.shape[0]).encode())
+    for name in columns:
+        digest.update(name.encode())
+        digest.update(columnDigest(df[name].values).encode())
+
+    return digest.hexdigest()
+
+
+class _DirectoryCache(object):
+    """A directory of cache entries, one sub directory per key, with least
+    recently used eviction. Entries are complete when they hold the marker file"""
+
+    _marker = None
+
+    def __init__(self, directory, max_bytes):
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def _entry(self, key):
+
+        return os.path.join(self.directory, key)
+
+    def _lookup(self, key):
+        """Returns the directory of a complete entry or None"""
+
+        entry = self._entry(key)
+        if not os.path.exists(os.path.join(entry, self._marker)):
+            return None
+
+        #the modification time of the entry is used as its last access time
+        os.utime(entry, None)
+
+        return entry
+
+    def _store(self, key, write):
+        """Calls write with a temporary directory and moves it into place"""
+
+        entry = self._entry(key)
+        tmpEntry = "%s.tmp%d" % (entry, os.getpid())
+
+        if os.path.exists(tmpEntry):
+            shutil.rmtree(tmpEntry)
+        os.makedirs(tmpEntry)
+
+        write(tmpEntry)
+
+        if os.path.exists(entry):
+            shutil.rmtree(entry)
+        os.rename(tmpEntry, entry)
+
+        self.evict()
+
+    def entries(self):
+        """Returns a dataframe with the size and last access time of every entry"""
+
+        result = []
+        for name in os.listdir(self.directory):
+
+            entry = os.path.join(self.directory, name)
+            if not os.path.exists(os.path.join(entry, self._marker)):
+                continue
+
+            size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+            result.append((name, size, os.path.getmtime(entry)))
+
+        return pd.DataFrame(result, columns=['key', 'bytes', 'lastUsed'])
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits in max_bytes"""
+
+        entries = self.entries().sort_values('lastUsed', ascending=False)
+        total = entries.bytes.cumsum()
+
+        for key in entries.key[total.values > self.max_bytes]:
+            shutil.rmtree(self._entry(key))
+
+    def clear(self):
+
+        for key in self.entries().key:
+            shutil.rmtree(self._entry(key))
+
+
+#the compact report of a cached dataset, in the JSON table schema of pandas
+REPORT_FILE = "report.json"
+
+
+class DatasetCache(_DirectoryCache):
+    """On disk cache of preprocessed trajectory datasets.
+
+    Every entry is a column store with one .npy file per column together with
+    the sort orders computed by the reader and, for compact datasets, the
+    compact report, so a dataset read from the cache is the same as a freshly
+    read one. Entries are keyed
+    by the contents and modification time of the source file, the reader, its
+    parameters and the reader version. When the total size of the cache grows
+    beyond max_bytes the least recently used entries are removed.
+
+    >>> cache = DatasetCache('./data/.vtacache')
+    >>> vt = VTAnalytics.readModelData('./data/ai21.hdf', cache=cache)
+    """
+
+    _marker = "manifest.json"
+
+    def __init__(self, directory, max_bytes=20 * 2**30, hash_contents=True):
+
+        _DirectoryCache.__init__(self, directory, max_bytes)
+        self.hash_contents = hash_contents
+
+    def key(self, fileName, reader, version, **params):
+        """Returns the cache key of a source file read with the given
+        reader, reader version and parameters"""
+
+        stat = os.stat(fileName)
+        parts = {'file':os.path.abspath(fileName),
+                 'size':stat.st_size,
+                 'mtime':stat.st_mtime,
+                 'reader':reader,
+                 'version':version,
+                 'params':sorted((k, str(v)) for k, v in params.items())}
+
+        if self.hash_contents:
+            parts['sha1'] = fileDigest(fileName)
+
+        return hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key):
+        """Returns the cached (dataframe, orders, report) or None if the key is
+        not cached. orders is a dictionary of permutation arrays keyed by the
+        order name and report the compact report or None"""
+
+        entry = self._lookup(key)
+        if entry is None:
+            return None
+
+        store = ColumnStore(entry, mmap_mode=None)
+        orders = dict((name, store.order(name)) for name in store.orders)
+
+        report = None
+        if os.path.exists(os.path.join(entry, REPORT_FILE)):
+            report = _readTable(os.path.join(entry, REPORT_FILE))
+
+        return readColumns(entry), orders, report
+
+    def put(self, key, df, orders=None, report=None):
+        """Stores the dataframe, its sort orders and its compact report under
+        the given key and evicts old entries"""
+
+        def write(entry):
+
+            ColumnStore.create(df, entry, orders)
+            if report is not None:
+                _writeTable(report, os.path.join(entry, REPORT_FILE))
+
+        self._store(key, write)
+
+
+#the table of an artifact, in the JSON table schema of pandas
+TABLE_FILE = "table.json"
+
+
+def _writeTable(table, fileName):
+    """Writes a table in the JSON table schema of pandas. The rows are written
+    by the json module, which keeps every digit of a float, while to_json
+    rounds them to at most 15 significant digits"""
+
+    document = {'schema':build_table_schema(table),
+                'data':table.reset_index().to_dict(orient='records')}
+
+    with open(fileName, 'w') as f:
+        json.dump(document, f)
+
+
+def _readTable(fileName):
+    """Reads a table written by _writeTable"""
+
+    with open(fileName) as f:
+        return pd.read_json(io.StringIO(f.read()), orient='table', precise_float=True)
+
+
+class ArtifactCache(_DirectoryCache):
+    """On disk cache of the charts and tables of a report.
+
+    Every artifact is keyed by the digest of the data it is computed from, the
+    method that computes it and the parameters of the method, so a chart is only
+    rendered again when one of them changes. The tables are stored as JSON, so
+    reading an entry never runs code from the cache directory.
+
+    >>> cache = ArtifactCache('./results/.artifacts')
+    >>> buildReport(vt, './results', cache=cache)
+    """
+
+    _marker = "artifact.json"
+
+    def __init__(self, directory, max_bytes=2 * 2**30):
+
+        _DirectoryCache.__init__(self, directory, max_bytes)
+
+    def key(self, digest, method, version, **params):
+        """Returns the cache key of the artifact computed by method from the
+        data with the given digest"""
+
+        parts = {'data':digest,
+                 'method':method,
+                 'version':version,
+                 'params':sorted((k, str(v)) for k, v in params.items())}
+
+        return hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key):
+        """Returns the cached (image, table) pair or None if the key is not
+        cached. The table is None for charts without a table"""
+
+        entry = self._lookup(key)
+        if entry is None:
+            return None
+
+        with open(os.path.join(entry, self._marker)) as f:
+            artifact = json.load(f)
+
+        with open(os.path.join(entry, artifact['image']), 'rb') as f:
+            image = f.read()
+
+        table = None
+        if artifact['table'] is not None:
+            table = _readTable(os.path.join(entry, TABLE_FILE))
+
+        return image, table
+
+    def put(self, key, image, table=None, fmt='png'):
+        """Stores the bytes of a chart image and its table under the given key"""
+
+        def write(entry):
+
+            artifact = {'image':'image.' + fmt, 'table':None}
+
+            with open(os.path.join(entry, artifact['image']), 'wb') as f:
+                f.write(image)
+
+            if table is not None:
+                artifact['table'] = TABLE_FILE
+                _writeTable(table, os.path.join(entry, TABLE_FILE))
+
+            with open(os.path.join(entry, self._marker), 'w') as f:
+                json.dump(artifact, f)
+
+        self._store(key, write)
@@ -0,0 +1,575 @@
+import numpy as np              # numerical computing with arrays
+import pandas as pd             # dataframe as in R
+
+from instrumentation import staged
+from histograms import HistogramAccumulator
+from binnedStatistics import BinnedStatistic
+from groupedArrays import _groupStarts
+
+#matplotlib and seaborn are imported the first time a chart is drawn, so that
+#the numeric core of the package can be used without loading them
+
+
+def _plotting():
+    """Imports the plotting libraries on first use and returns matplotlib
+    and pyplot"""
+
+    import matplotlib as mpl
+    import matplotlib.pyplot as plt
+    import matplotlib.ticker, matplotlib.colors, matplotlib.gridspec, matplotlib.colorbar
+    import seaborn              # sets the style of the charts
+
+    return mpl, plt
+
+
+def _binFrequencies(histogram):
+    """Returns the table of the counts of a histogram with the bins as index"""
+
+    bins = histogram.edges
+    freq = pd.DataFrame(index=['%d-%d' % (i, j) for (i,j) 
+                               in zip(bins, bins[1:])],
+                        data=histogram.counts, columns=['Freq'])
+    freq.index.name='bin'
+
+    return freq
+
+
+def _secondsSince(times, start_time):
+    """Returns the seconds from start_time for datetimes or times in seconds"""
+
+    elapsed = np.asarray(times) - start_time
+    if elapsed.dtype.kind == 'm':
+        return elapsed / np.timedelta64(1, 's')
+
+    return np.asarray(elapsed, dtype=np.float64)
+
+
+def _rasterize(x, y, values, shape, extent, how='mean'):
+    """Bins points into a (height x width) pixel grid and returns the mean, min or 
+    last value of the points of every pixel. Pixels without points are missing. 
+    shape is (width, height) and extent is [xmin, xmax, ymin, ymax]."""
+
+    width, height = shape
+    xmin, xmax, ymin, ymax = extent
+
+    def pixel(v, low, high, size):
+        scale = size / float(high - low) if high > low else 0.0
+        return np.clip(((v - low) * scale).astype(np.int64), 0, size - 1)
+
+    pixels = pixel(y, ymin, ymax, height) * width + pixel(x, xmin, xmax, width)
+    values = np.asarray(values, dtype=np.float64)
+
+    grid = np.full(width * height, np.nan)
+
+    if how == 'mean':
+        counts = np.bincount(pixels, minlength=grid.shape[0])
+        sums = np.bincount(pixels, weights=values, minlength=grid.shape[0])
+        filled = counts > 0
+        grid[filled] = sums[filled] / counts[filled]
+
+    elif how in ('min', 'last'):
+        #a stable sort keeps the points of every pixel in their original order 
+        order = np.argsort(pixels, kind='stable')
+        starts = _groupStarts(pixels[order])
+
+        if how == 'min':
+            grid[pixels[order[starts]]] = np.minimum.reduceat(values[order], starts)
+        else:
+            last = order[np.append(starts[1:], order.shape[0]) - 1]
+            grid[pixels[last]] = values[last]
+
+    else:
+        raise ValueError("unknown raster aggregation %s" % how)
+
+    return grid.reshape(height, width)
+
+
+def _speedColors(speeds, numColors):
+    """Returns the color of every speed, one color per 10 mph from 0 mph and 
+    the last color for the speeds above that range and for negative and 
+    missing speeds. The scatter and the raster charts use the same colors"""
+
+    speeds = np.asarray(speeds, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        inRange = (speeds >= 0) & (speeds < 10 * (numColors - 1))
+
+    return np.where(inRange, np.floor(np.where(inRange, speeds, 0) / 10), numColors - 1).astype(np.int64)
+
+
+def _meanSpeedByDensity(density, speed, step):
+    """Returns the mean speed and the number of cells of every density bin"""
+
+    valid = ~np.isnan(density)
+    stat = BinnedStatistic().fill((density[valid] // step).astype(np.int64), speed[valid])
+
+    return pd.DataFrame({'density':stat.bins[0].astype(np.float64) * step, 'mean':stat.mean, 
+                         'size':stat.count.astype(np.int64)})
+
+
+class TrajectoryPlots(object):
+    """The charts of VTAnalytics. The plotting libraries are only imported
+    when one of the methods is called"""
+
+    @staged()
+    def plotSpeedDistribution(self, ax, lower=None, upper=None, histogram=None):
+        """Draws the distribution of the speed in 1 mph bins and returns the table 
+        of the frequencies. histogram is a HistogramAccumulator to draw instead of 
+        the one of speedHistogram, e.g. the merged histogram of several runs"""
+
+        mpl, plt = _plotting()
+
+        if histogram is None:
+            histogram = self.speedHistogram(lower, upper)
+        
+        histogram.plot(ax, color='blue', linewidth=2) 
+        
+        minor_locator = mpl.ticker.AutoMinorLocator(10)
+        ax.xaxis.set_minor_locator(minor_locator)
+        
+        ax.set_title("Distribution of Speed", fontsize=18)
+        ax.set_xlabel("Speed(mph)", fontsize=18)
+        ax.set_ylabel("Frequency", fontsize=18)
+        
+        ax.grid(visible=True, which='major', color='white', lw=2)
+        ax.grid(visible=True, which='minor', color='white', lw=0.5, alpha=1.0)
+        
+        return _binFrequencies(histogram)
+
+    @staged()
+    def plotAccelerationDistribution(self, ax, lower=None, upper=None, histogram=None):
+        """Draws the distribution of the acceleration in 1 fpss bins and returns the 
+        table of the frequencies. histogram is a HistogramAccumulator to draw instead 
+        of the one of accelerationHistogram"""
+
+        mpl, plt = _plotting()
+        
+        if histogram is None:
+            histogram = self.accelerationHistogram(lower, upper)
+        
+        histogram.plot(ax, color='blue', linewidth=2) 
+        
+        ax.set_title("Distribution of Acceleration", fontsize=18)
+        ax.set_xlabel("Acceleration(fpss)", fontsize=18)
+        ax.set_ylabel("Frequency", fontsize=18)
+        
+        minor_locator = mpl.ticker.AutoMinorLocator(5)
+        ax.xaxis.set_minor_locator(minor_locator)
+        
+        ax.grid(visible=True, which='major', color='white', lw=2)
+        ax.grid(visible=True, which='minor', color='white', lw=0.5, alpha=1.0)
+
+        return _binFrequencies(histogram)
+
+    @staged()
+    def plotJerkDistribution(self, df, ax, lower=None, upper=None, histogram=None):
+        """Draws the distribution of the jerk of the result of getAccelerationJerk, 
+        or of a HistogramAccumulator of the jerk, and returns the table of the 
+        frequencies"""
+
+        mpl, plt = _plotting()
+                
+        if histogram is None:
+            if not lower:
+                lower = np.floor(df._jerk.min()) 
+            if not upper:
+                upper = np.ceil(df._jerk.max()) 
+
+            histogram = HistogramAccumulator.fromValues(df._jerk.values, np.arange(lower, upper, 1))
+        
+        histogram.plot(ax, color='blue', linewidth=2) 
+        
+        minor_locator = mpl.ticker.AutoMinorLocator(10)
+        ax.xaxis.set_minor_locator(minor_locator)
+        
+        ax.set_title("Distribution of Jerk", fontsize=18)
+        ax.set_xlabel("Jerk", fontsize=18)
+        ax.set_ylabel("Frequency", fontsize=18)
+        
+        ax.grid(visible=True, which='major', color='white', lw=2)
+        ax.grid(visible=True, which='minor', color='white', lw=0.5, alpha=1.0)
+        
+        bins = histogram.edges
+        jerk_freq = pd.DataFrame(index=bins[:-1], data=histogram.counts, columns=['freq'])
+        labels = ["%.1f" % ((i+j)/2) for i,j in zip(bins[:], bins[1:])]
+        jerk_freq.index = labels
+
+        jerk_freq['Percentage'] = jerk_freq['freq'] / histogram.total * 100
+        jerk_freq.index.name = 'bin center'
+
+        return jerk_freq
+
+    @staged()
+    def plotARMS(self, df, ax):
+    
+        ax.plot(df._spd, df._arms, color='blue', lw=2)
+            
+        ax.set_ylabel('Acceleration Root Mean Squared', fontsize=18)
+        ax.set_xlabel("Speed (mph)", fontsize=18)
+        ax.set_title("ARMS", fontsize=18)
+
+    @staged()
+    def plotAllTrajectories(self, fig, ax, lane, start_time, end_time, start_dist, end_dist, point_size=0.5, title="", 
+                            raster=False, raster_agg='mean', raster_shape=None):
+
+        """This function plots all the vehicle trajectories for a given lane, start, and end time and for 
+        a particular section along the corridor identified by the start and end distance. 
+
+        For each vehicle that is present in the provided temporal and spatial window the 
+        function uses color-coded points to visualize successive vehicle positions. The 
+        points are color coded by the vehicle speed using a single color for a 10 mph 
+        interval.  
+
+        Args:
+           fig (matplotlib fibure):  The figure to draw the plot on
+           ax  (matplotlib ax):      The axes to draw the plot
+           lane (integer) : The lane number 
+           start_time (datetime): the begining of the selected time window 
+           end_time (datetime): the end of the selected time window
+           start_dist (feet): the start distance along the corridor. 
+           Vehicle positions before this threshold are not plotted. 
+           end_dist (feet): the maximum linear poisition along the corridor to visualize. 
+           Vehicle positions after this value will not be ploted.   
+
+        Kwargs:
+           point_size (float): The size of each point in pixels. The user can vary the size depending on canvas size and the number of points to visualized
+           raster (bool): Instead of drawing every point, bin the points into a pixel grid 
+           and draw the grid with a single imshow. Use it for windows with millions of points. 
+           raster_agg (str): The speed of a pixel with several points, 'mean', 'min' or 'last'
+           raster_shape (tuple): The (width, height) of the pixel grid. Defaults to the size 
+           of the axes in pixels 
+
+        Returns:
+           None
+
+        Raises:
+           AttributeError, KeyError
+
+        In the example code below the variables t1 and t2 hold the time thresholds. 
+        The dates correspond to valid times in the NGISM I-80 dataset.  
+        A figure, and axes canvas are obtaind in the third library by calling 
+        the appropate matplotlib function and by providing the selected figure size in inches.
+        The fourth line applies the function that produces the image shown below. 
+        All the trajectories in lane one  between t1, t2 and and between 0 and 
+        1800 from the corridor start will be visualized.  
+        
+        >>> t1 = np.datetime64('2005-04-13 17:00:00')
+        >>> t2 = np.datetime64('2005-04-13 17:30:00')
+        >>> fig, ax = plt.subplots(figsize=(15,10), dpi=150)
+        >>> plotTrajectories(fig, ax, lane=1, 
+                             start_time=t1, end_time=t2, 
+                             start_dist=0, end_dist=1800)
+        
+
+        .. figure::  _static/ngRe_traj_lane_2.png
+           :align:   center
+
+        The generated image can be saved by calling the savefig function. The image is 
+        saved in the png format using 150 dots per inch (dpi) 
+        
+        >>> output_file = "trajectories.png"
+        >>> fig.savefig(output_file, dpi=150)
+
+        """
+
+        mpl, plt = _plotting()
+        
+        #select the trajectories to plot based on inputs 
+        tmp = self.window(lane, start_time, end_time, start_dist, end_dist)
+      
+        if tmp.shape[0] == 0:
+            raise ValueError("Nothing to plot")
+        
+        rect = 0.06,0.06,0.90,0.9
+        ax = fig.add_axes(rect)
+        fig.add_axes(ax)
+
+        #define the coloring scheme for the points 
+        bounds = [0, 10, 20, 30, 40, 50, 60, 70, 80]
+        colors2 = ['#e31a1c','#fd8d3c', '#fecc5c','#ffffcc','#a1dab4','#41b6c4','#225ea8', '#000000']
+        cmap = mpl.colors.ListedColormap(colors2) 
+        norm = mpl.colors.BoundaryNorm(bounds, cmap.N)
+
+        #x axis is the seconds from start time 
+        times = _secondsSince(tmp._time.values, start_time)
+
+        #y axis is the location along the corridor
+        locations = tmp._locy.values 
+        speeds = tmp._spd.values 
+
+        if raster:
+
+            if raster_shape is None:
+                bbox = ax.get_window_extent()
+                raster_shape = (max(int(bbox.width), 1), max(int(bbox.height), 1))
+
+            extent = [times.min(), times.max(), locations.min(), locations.max()]
+            grid = _rasterize(times, locations, speeds, raster_shape, extent, raster_agg)
+
+            #the pixels with points are colored like the points, including those 
+            #whose speed is missing, and the empty pixels stay blank 
+            empty = np.isnan(_rasterize(times, locations, np.zeros(times.shape[0]), 
+                                        raster_shape, extent))
+            colorIndex = np.ma.masked_array(_speedColors(grid, len(colors2)), mask=empty)
+
+            ax.imshow(colorIndex, cmap=cmap, vmin=-0.5, vmax=len(colors2) - 0.5, origin='lower', 
+                      extent=extent, aspect='auto', interpolation='nearest')
+
+        else:
+
+            #define the color of the points 
+            point_colors = np.array(colors2)[_speedColors(speeds, len(colors2))]
+        
+            ax.scatter(times, locations, c=point_colors, s=point_size)
+            ax.scatter(times[0],   locations[0], c=point_colors[0], s=point_size*8)
+            ax.scatter(times[-1], locations[-1], c=point_colors[-1], s=point_size*8)
+        
+        
+        ax.set_facecolor('white')
+        ax.set_xlabel("Time in seconds from %s" % str(start_time), fontsize=18)
+        ax.set_ylabel("Distance from Starting point %.1f (feet)" % start_dist,
+                      fontsize=18)
+        
+        ax.set_xlim([times.min(), times.max()])
+        ax.set_ylim([locations.min(), locations.max()])
+        
+        if title:
+            ax.set_title(title)
+        
+        cmax = fig.add_axes([0.96, 0.1, 0.02, 0.8])
+        mpl.colorbar.ColorbarBase(ax=cmax, cmap=cmap, norm=norm, boundaries=bounds) 
+
+        ax.set_axisbelow(True)
+        ax.grid(color='grey', lw=1, linestyle='dashed', alpha=0.2)
+
+    @staged()
+    def plotMeanCorridorSpeedDistribution(self,df, ax, histogram=None):
+        """
+        '_vid', 'start', 'startDist', 'end', 'endDist', 'dur', 'dist', 'speed'], dtype='object'
+        """
+
+        mpl, plt = _plotting()
+        
+        if histogram is None:
+            bins = np.arange(np.floor(df._spd.min()),
+                             np.ceil(df._spd.max()), 1)
+            histogram = HistogramAccumulator.fromValues(df._spd.values, bins)
+        
+        histogram.plot(ax, color='blue', linewidth=2) 
+        
+        minor_locator = mpl.ticker.AutoMinorLocator(10)
+        ax.xaxis.set_minor_locator(minor_locator)
+        
+        ax.set_title("Distribution of Average Vehicle Speed", fontsize=18)
+        ax.set_xlabel("Speed(mph)", fontsize=18)
+        ax.set_ylabel("Frequency", fontsize=18)
+        
+        ax.grid(visible=True, which='major', color='white', lw=2)
+        ax.grid(visible=True, which='minor', color='white', lw=0.5, alpha=1.0)
+        
+        return histogram.counts, histogram.edges
+
+    @staged()
+    def plotSelectedTrajectories(self, fig, ax, veh_ids):
+        """This function plots selected vehicle trajectories defined by 
+        a list of vehicle ids. Points in the plot are color-colded by speed. 
+        """
+
+        mpl, plt = _plotting()
+    
+        #define the coloring scheme for the points 
+        bounds = [0, 10, 20, 30, 40, 50, 60, 70, 80]
+        colors2 = ['#e31a1c','#fd8d3c', '#fecc5c','#ffffcc','#a1dab4','#41b6c4','#225ea8', '#000000']
+        cmap = mpl.colors.ListedColormap(colors2) 
+        norm = mpl.colors.BoundaryNorm(bounds, cmap.N)
+        
+        #x axis is the seconds from the start of the dataset 
+        df = self.df
+        start_time = df._time.values.min()
+
+        for veh_id in veh_ids:
+            
+            tmp = df[df._vid.values == veh_id]
+            
+            locations = tmp._locy.values 
+            times = _secondsSince(tmp._time.values, start_time)
+            
+            #define the color of the points 
+            point_colors = np.array(colors2)[_speedColors(tmp._spd.values, len(colors2))]
+            
+            #y axis is the location along the corridor
+            locations = tmp._locy.values 
+            
+            ax.scatter(times, locations, c=point_colors, s=1)
+
+    @staged()
+    def plotSpeedVsDensity(self, fig, ax, speed_step=5, color='blue', max_density=250, max_speed=70, show_bin_info=True, plot_mean=True):
+
+        density = self.macroVars['density'].ravel()
+        speed = self.macroVars['speed'].ravel()
+
+        points = ax.scatter(density, speed, 
+             s=1, color=color, label=None)
+
+        #set the limits of max density 
+        ax.set_xlim([0, max_density])
+        ax.set_ylim([0, max_speed])
+
+        #plot the mean line 
+        assert speed_step > 0 
+        hm_mean = _meanSpeedByDensity(density, speed, speed_step).rename(columns={'mean':'mean_speed'})
+
+        #the mean line is plotted only where there are more than 100 points
+        if plot_mean:  
+            tmp = hm_mean[hm_mean['size'] > 100]
+            #tmp = hm_mean 
+            mean_line = ax.plot(tmp.density, tmp.mean_speed, c=color, label="mean speed")
+
+        ax.legend(fontsize=16)
+
+        ax.set_ylabel("Speed (mph)", fontsize=18)
+        ax.set_xlabel('Density (vpm)', fontsize=18)
+
+        if show_bin_info:
+            fig.text(0.85, 0.65, "SpaceBin:%dft\nTimeBin:%dsec" % (self.space_bin, self.time_bin), fontsize=18)
+
+        ax.set_title("SpeedVsDensity")
+
+        fig.tight_layout()
+
+    @staged()
+    def plotSpeedVsDensityByLane(self, fig, dot_color='blue', mean_color='white', plot_mean=True, max_density=250, max_speed=70, pad=1.0, w_pad=0.5, h_pad=1.0, alpha=0.5):
+
+        mpl, plt = _plotting()
+
+        numLanes = self.df._lane.max() 
+
+        numRows = numLanes // 2 + 1
+        gs = mpl.gridspec.GridSpec(numRows, 2)
+
+        axes = [] 
+
+        for laneNum in range(1, numLanes + 1):
+            
+            i = (laneNum - 1) // 2
+            j = (laneNum - 1) % 2 
+            
+            ax = plt.subplot(gs[i,j])
+
+            axes.append(ax)
+            
+            laneIdx = self.macro.laneIndex(laneNum)
+            density = self.macroVars['density'][laneIdx].ravel()
+            speed = self.macroVars['speed'][laneIdx].ravel()
+            
+            ax.scatter(density, speed, s=1.5, color=dot_color, label=None, alpha=alpha)
+            ax.set_xlim([0, max_density])
+            ax.set_ylim([0, max_speed])
+            ax.set_title("Lane %d" % laneNum, fontsize=16)
+            
+            tmp_mean = _meanSpeedByDensity(density, speed, 5).rename(columns={'mean':'mean_spd'})
+            
+            #if you wish to plot the mean when you have 50 or more points
+            #tmp_mean = tmp_mean[tmp_mean['size'] > 50]
+            
+            if plot_mean: 
+                ax.plot(tmp_mean.density, tmp_mean.mean_spd, c=mean_color, label='mean speed')
+            
+            if j == 1:
+                ax.set_yticklabels([])
+                
+            if j == 0:
+                ax.set_ylabel("Speed (mph)", fontsize=18)
+                
+            ax.legend(fontsize=18)
+
+        axes[-2].set_xlabel("Density (vpm)", fontsize=18)
+        axes[-1].set_xlabel("Density (vpm)", fontsize=18)
+
+
+        fig.suptitle("SpeedVsDensityByLane", fontsize=18)
+
+        fig.tight_layout(pad=1.0, w_pad=0.5, h_pad=1.0)
+
+        fig.text(0.72, 0.13, "SpaceBin:%dft\nTimeBin:%dsec" % (self.space_bin, self.time_bin), fontsize=18)
+
+    @staged()
+    def plotLCR(self, fig, laneChangeType='leave', max_lcr=72000):
+        """lane changes can be either enter or exit 
+        """
+
+        mpl, plt = _plotting()
+        gs = mpl.gridspec.GridSpec(2, 5, width_ratios=[0.2, 1, 1, 1, 1])
+
+        #set up teh colorscale 
+        numColors = 10
+        bounds = list(np.linspace(0, max_lcr, numColors))
+        bounds.insert(0, -10)
+        bounds[1] = 0.1
+
+        colors = ['grey', '#ffffcc','#ffeda0','#fed976','#feb24c',
+                 '#fd8d3c','#fc4e2a','#e31a1c','#bd0026','#800026']
+        cmap = mpl.colors.ListedColormap(colors) 
+        norm = mpl.colors.BoundaryNorm(bounds, cmap.N)
+
+        cb = None 
+        ax = None
+
+        for i in range(1, self.numLanes + 1):
+            
+            j = (i-1) % 4
+            k = (i-1) // 4
+
+            ax = plt.subplot(gs[k,j+1])
+            
+            if laneChangeType == 'leave':
+                data = self.macroVars['numVehiclesLeavingLane'][self.macro.laneIndex(i)]
+            elif laneChangeType == 'enter': 
+                data = self.macroVars['numVehiclesEnteringLane'][self.macro.laneIndex(i)]
+            else:
+                raise ValueError("unknown lane change type")
+
+            nan_mask = np.isnan(data)
+            tmp = data.copy()
+            tmp[nan_mask] = -1
+          
+            cb = ax.imshow(tmp, cmap=cmap, norm=norm, origin='lower', aspect='auto')
+       
+            ax.set_xticklabels(['', '17:00', '05', '10', '15', ''])
+
+            ax.set_yticklabels([])
+            
+            ax.grid(True, color='black', ls='dashed', lw=0.3)
+            
+            ax.set_title("Lane %d" % i, fontsize=16)
+            
+        cmax = fig.add_axes([0.85, 0.15, 0.05, 0.3])
+
+        fig.colorbar(cb, cax=cmax, norm=norm, boundaries=bounds, ticks=bounds)
+        cmax.set_title("LCR colormap\n(lcvm)", fontsize=16)
+
+        cm_labels = ["%d" % i for i in list(map(int, bounds))]
+        cm_labels[0] = "" 
+        cmax.set_yticklabels(cm_labels, fontsize=16)
+
+        ax1 = plt.subplot(gs[0,0]) 
+        ax2 = plt.subplot(gs[1,0])
+
+        ytick_labels = [i for i in range(0,2000,200)]
+        ax1.set_yticks(ytick_labels)
+        ax1.set_yticklabels(ytick_labels, fontsize=16)
+        ax1.set_xticklabels([])
+        ax1.grid(False)
+        ax1.set_ylabel("Length in feet along I80 corridor", fontsize=16)
+        ax1.set_facecolor('white')
+
+        ax2.set_yticks(ytick_labels)
+        ax2.set_yticklabels(ytick_labels, fontsize=14)
+        ax2.set_xticklabels([])
+        ax2.grid(False)
+        ax2.set_ylabel("Length in feet along I80 corridor", fontsize=16)
+        ax2.set_facecolor('white')
+
+        fig.text(0.85, 0.05, "SpaceBin:%dft\nTimeBin:%dsec" % 
+                  (self.space_bin, self.time_bin), fontsize=16)
+
+        fig.text(0.908, 0.15, "No data", fontsize=16)
@@ -1,1094 +1,1559 @@
-import sys                      # system tools 
-
-import numpy as np              # numerical computing with arrays 
-import pandas as pd             # dataframe as in R
-
-import matplotlib 
-import matplotlib.pyplot as plt # ploting 
-import matplotlib as mpl        # ploting 
-import seaborn as sns           # ploting 
-
-from matplotlib.ticker import MultipleLocator, FormatStrFormatter
-
-import os                       # operating system io commands 
-import itertools                # functonal programming tools 
-
-import pdb 
-
-#FIG_SIZE_X,FIG_SIZE_Y = 15, 10
-
-from reportlab.pdfgen import canvas 
-
-from reportlab.lib.pagesizes import letter, A4
-
-
-class PdfReport(object):
-
-    def __init__(self, outFileName, pagesize):
-        
-        self._outFileName = outFileName
-        self._canvas = canvas.Canvas(outFileName, pagesize=pagesize)
-        self._counter = 0
-
-    def addChart(self, chart):
-        
-        self._counter += 1 
-
-        figure = chart 
-        figure.savefig("tmpFigure%d.png" % self._counter)
-        #image = open("tmpFigure%d.png" %d, "rb").read()
-
-        #im = Image.fromstring(image)
-        #im = Image.open("tmpFigure%d.png" % self._counter)
-        
-        self._canvas.drawImage("tmpFigure%d.png" % self._counter, 0, 0)        
-
-        os.remove("tmpFigure%d.png" % self._counter) 
-
-        self._canvas.bookmarkPage(str(self._counter))
-        self._canvas.addOutlineEntry(chart.getTitle(), str(self._counter), 0, 0)
-        self._canvas.showPage()
-
-    def addChart2(self, fileName, title):
-        
-        self._counter += 1 
-        
-        self._canvas.drawImage(fileName, 0, 0)        
-
-        self._canvas.bookmarkPage(str(self._counter))
-        self._canvas.addOutlineEntry(title, str(self._counter), 0, 0)
-        self._canvas.showPage()
-        
-        
-    def write(self):
-        
-        self._canvas.save()
-
-#    def __del__(self):
-#
-#        for i in range(self._counter):
-#            os.remove("tmpFigure%d.png" % (i + 1)) 
-
-
-class VTAnalytics:
-
-
-    @classmethod
-    def describe(cls, var, numerical=True, decimals=1):
-        
-        count = int(var.shape[0])
-        na    = int(var.isnull().sum())
-        
-        if numerical: 
-            
-            var2 = var.dropna().values 
-            mean = np.mean(var2)
-            std  = np.std(var2)
-            
-            min_ =  np.min(var2)   
-            pct5 =  np.percentile(var2, 5) 
-            pct25 = np.percentile(var2, 25)
-            pct50 = np.percentile(var2, 50)
-            pct75 = np.percentile(var2, 75) 
-            pct95 = np.percentile(var2, 95)
-
-            max_ = np.max(var2)
-
-            values = [count,   na,    mean,   std,   min_,  pct5,   pct25,  pct50,   pct75,    pct95, max_]
-            values = [np.round(v, decimals) for v in values]
-            #values.insert(na, 0)
-            #values.insert(count, 0)
-            index = ['count', 'NA', 'mean', 'std', 'min', 'ptc5', 'pct25', 'pct50', 'ptc75', 'pct95', 'max']
-            
-            df = pd.DataFrame({'stats':values}, index=index)
-            
-            return df
-        else:
-            raise Exception("Not implemented yet")
-
-    @classmethod 
-    def readNGISIMData(cls, fName1, start_time=None, end_time=None): 
-        
-        """This function takes raw NGSIM data and prepares them for analysis
-        """
-        
-
-        colNames = ['VehID', 'FrameID', 'TotalFrames', 'GlobalTime', 'locX', 'locY', 'globX', 
-                    'globY', 'vehLength', 'vehWidth', 'vehClass', 'vehSpeed', 'vehAcceleration', 'lane', 
-                   'precedingVeh', 'followingVeh', 'spacing', 'headway']
-        
-        ng = pd.read_csv(fName1, 
-                         header=None, names=colNames, delim_whitespace=True)
-
-        # define app specific variables 
-        #ng['_spd']  = ng.vehSpeed * 3600 / 5280  # _spd in miles per hour 
-        #ng['_acc']  = ng.vehAcceleration         # _acc is in feet per second squared 
-        ng['_locy'] = ng.locY  #location along the Y axis in feet 
-        ng['_vlen'] = ng.vehLength # vehicle length in feet  
-        ng['_lane'] = ng.lane 
-
-        #create a datetime variable 
-        #result = [] 
-        #for t in ng.GlobalTime.values: 
-        #    t = np.datetime64(int(t),'ms') - np.timedelta64(7,'h')
-        #    result.append(t)
-        ng['_time'] = ng.GlobalTime / 1000 #convert the time into seconds 
-
-        #create a new vehicle id because the one defined in the
-        #raw data is wrong 
-        newVehID = (ng.groupby(['VehID', 'TotalFrames', 'vehLength'])['locY'].mean()
-                            .to_frame()
-                            .reset_index()
-                            .reset_index())
-        newVehID.rename(columns={'index':'_vid'}, inplace=True)
-        newVehID.drop(['locY'], axis=1, inplace=True)
-        newVehID['_vid']  = newVehID['_vid'] + 1
-
-        ng = ng.merge(newVehID, on=['VehID', 'TotalFrames', 'vehLength'])
-        
-        #limit the dataset based on the input times 
-        if start_time: 
-            ng  = ng[(ng._time.values >= start_time)]
-        if end_time:
-            ng = ng[(ng._time.values <= end_time)]
-        
-        #calculate dt and remove records with time step greater than 
-        # 0.1 seconds 
-
-        ng = ng.sort_values(['_vid', '_time']) 
-        ng.index = np.arange(ng.shape[0])
-
-        ng['_dt'] = ng._time.shift(-1) - ng._time
-        ng.loc[ng._vid != ng._vid.shift(-1), '_dt'] = np.nan
-
-        #there are some records with dt greater than the 0.1 don't know why 
-        if ng._dt.unique().shape[0] > 2:
-            print ("Error: the dataset has more than one timestep")
-            #raise ValueError("The dataset has more than one timestep") 
-
-        time_step = ng._dt.dropna().unique()[0]
-
-        #calculate speed and acceleration 
-        ng['_spd'] = (ng['_locy'].shift(-1) - ng['_locy']) / ng['_dt'] 
-        ng['_acc'] = (ng['_spd'].shift(-1) - ng['_spd']) / ng['_dt']  #fpss 
-        ng['_spd'] = ng['_spd'] * (3600 / 5280) # mph 
-
-        ng = ng.dropna() 
-
-        #define lane changes 
-
-        ng['_leaveLane'] = 0
-        ng.loc[ng._lane != ng._lane.shift(-1), '_leaveLane'] = 1
-        ng.loc[ng._vid  != ng._vid.shift(-1), '_leaveLane'] = 0
-
-        ng['_enterLane'] = 0
-        ng.loc[ng._lane != ng._lane.shift(1), '_enterLane'] = 1
-        ng.loc[ng._vid  != ng._vid.shift(1), '_enterLane'] = 0
-
-
-        ng = ng.sort_values(['_lane', '_time', 'locY'], ascending=[True, True, True])
-        ng.index = np.arange(ng.shape[0])
-
-        #calculate Time to collision 
-        ng['_gap'] = np.nan 
-        ng['_gap'] = ng._locy.shift(-1) - ng._locy - ng._vlen.shift(-1) 
-        ng.loc[ng._lane != ng._lane.shift(-1), '_gap']   =  np.nan 
-        ng.loc[ng._time != ng._time.shift(-1), '_gap'] =  np.nan 
-
-        ng['_ttc'] = 0 
-        ng['_ttc'] = ng._gap / (ng._spd.shift(-1) - ng._spd) * (5280 / 3600)
-        ng.loc[ng._time != ng._time.shift(-1), '_ttc'] = np.nan 
-        ng.loc[ng._ttc < 0, '_ttc'] = np.nan
-        ng.loc[ng._ttc == np.inf, '_ttc'] = np.nan
-
-
-        #recalculate the preceding and following vehicle ids 
-        ng['_prV'] = ng._vid.shift(-1)
-
-        ng.loc[ng.lane != ng.lane.shift(-1), '_prV']   =  np.nan 
-        ng.loc[ng._time != ng._time.shift(-1), '_prV'] =  np.nan 
-
-        ng['_flV'] = ng._vid.shift(1)
-        ng.loc[ng.lane != ng.lane.shift(1), '_flV'] =  np.nan 
-        ng.loc[ng._time != ng._time.shift(1), '_flV'] =  np.nan 
-        
-        return VTAnalytics(ng)
-
-    @classmethod
-    def readModelData(cls, fName1, start_time=None, end_time=None):
-
-        ai = pd.read_hdf(fName1, 'trajectories')
-
-        ai['_vid']  = np.array(ai.oid, np.int)
-        ai['_time'] = ai.time
-        ai['_locy'] = ai.dist_along
-        ai['_lane'] = 8 - ai['laneIndex']
-
-        if start_time:
-            ai = ai[ai._time.values >= start_time]
-
-        if end_time:
-            ai = ai[ai._time.values <= end_time]
-
-        #calculate the time step 
-        ai = ai.sort_values(['_vid', '_time']) 
-        ai['_dt'] = ai._time.shift(-1) - ai._time
-        ai.loc[ai._vid != ai._vid.shift(-1), '_dt'] = np.nan
-
-        #calculate the lane change variables 
-        ai['_leaveLane'] = 0
-        ai.loc[ai._lane  != ai._lane.shift(-1), '_leaveLane'] = 1
-        ai.loc[ai._vid   != ai._vid.shift(-1), '_leaveLane'] = 0
-
-        ai['_enterLane'] = 0
-        ai.loc[ai._lane  != ai._lane.shift(1), '_enterLane'] = 1
-        ai.loc[ai._vid   != ai._vid.shift(1), '_enterLane'] = 0
-
-
-        ai = ai.sort_values(['_lane', '_time', '_locy'], ascending=[True, True, True])
-        ai.index = np.arange(ai.shape[0])
-
-        ai['_prV']        = ai._vid.shift(-1)
-        ai.loc[ai._lane  != ai._lane.shift(-1), '_prV'] =  np.nan 
-        ai.loc[ai._time  != ai._time.shift(-1), '_prV'] =  np.nan 
-
-        ai['_flV'] = ai._vid.shift(1)
-        ai.loc[ai._lane != ai._lane.shift(1), '_flV'] =  np.nan 
-        ai.loc[ai._time != ai._time.shift(1), '_flV'] =  np.nan 
-
-        ai['_spd'] = ai.speed
-        ai['_acc'] = ai.acceleration
-
-        return VTAnalytics(ai)
-
-    def __init__(self, df, space_bin=50, time_bin=10):
-
-        assert '_spd' in df.columns
-        assert '_acc' in df.columns 
-
-        self.df = df
-        self._calculateTimeStep() 
-
-        self.space_bin = space_bin
-        self.time_bin  = time_bin 
-        self.numLanes = self.df._lane.max() 
-        
-        self.recalculateMacroVars(space_bin, time_bin) 
-
-    def __add__(self, other):
-
-        return VTAnalytics(pd.concat([self.df, other.df]))
-
-    def _calculateTimeStep(self):
-
-        self.df = self.df.sort_values(['_vid', '_time']) 
-        self.df['_dt'] = self.df._time.shift(-1) - self.df._time
-        #there are some records with dt greater than the 0.1 don't know why 
-        self.df.loc[self.df._vid != self.df._vid.shift(-1), '_dt'] = np.nan
-
-        if self.df._dt.unique().shape[0] > 2:
-            print("ERROR: The dataset has more than one time step")
-            #raise ValueError("The dataset has more than one timestep") 
-
-        self.time_step = self.df._dt.dropna().unique()[0]
-
-    def resample(self, timeStep):
-        """returns a new dataset with resampled speed, acceleration, and location along 
-        the corridor based on the given time step"""
-        
-        df = self.df.sort_values(['_vid', '_time'])
-
-        result = [] 
-        for VehId, group in df.groupby('_vid'):
-
-            tmp2 = (group[['_time', '_acc', '_spd',  '_locy']]
-                   .set_index('_time')
-                   .resample('1s')
-                   .mean()
-                   .reset_index()
-                   )
-
-            tmp2['_vid'] = VehId
-            result.append(tmp2)
-
-        df1s = pd.concat(result)
-        df1s = df1s.dropna()
-        
-        return df1s 
-
-    def getTTCDistribution(self):
-
-        hist, bins = np.histogram(self.df['_ttc'].dropna(), bins=np.arange(0, 16, 1))
-        TTC_freq = pd.DataFrame(index=bins[:-1], data=hist, columns=['freq'])
-        labels = ["%d <= TTC < %d" % (i, i+1) for i in bins[:-1]]
-        TTC_freq.index = labels
-        TTC_freq['ngRe_Percentage'] = TTC_freq['freq'] / self.df.shape[0] * 100
-
-        return TTC_freq
-
-    def calculateCorridorTravelTimes(self):
-        
-        self.df = self.df.sort_values(['_vid', '_time'])
-        tmp1 = (self.df.groupby('_vid')[['_time', '_locy']]
-                .first().reset_index()
-                .rename(columns={'_time':'start', '_locy':'startDist'}))
-        
-        tmp2 = (self.df.groupby('_vid')[['_time', '_locy']]
-                .last().reset_index()
-                .rename(columns={'_time':'end', '_locy':'endDist'}))
-        
-        cor_times = pd.merge(tmp1, tmp2, on=['_vid'])
-        
-        cor_times['dur'] = (cor_times.end - cor_times.start)
-        cor_times['dist'] = cor_times.endDist - cor_times.startDist 
-        cor_times['_spd'] = (cor_times.dist / 5280.0) / (cor_times.dur / 3600.0)
-        
-        return cor_times 
-
-    def plotSpeedDistribution(self, ax, lower=None, upper=None):
-
-        if not lower:
-            lower = np.floor(self.df._spd.min()) 
-        if not upper:
-            upper = np.ceil(self.df._spd.max()) 
-        
-        bins = np.arange(lower, upper)
-        
-        ax.hist(self.df._spd, bins=bins, color='blue', histtype='step', linewidth=2) 
-        
-        minor_locator = matplotlib.ticker.AutoMinorLocator(10)
-        ax.xaxis.set_minor_locator(minor_locator)
-        
-        ax.set_title("Distribution of Speed", fontsize=18)
-        ax.set_xlabel("Speed(mph)", fontsize=18)
-        ax.set_ylabel("Frequency", fontsize=18)
-        
-        ax.grid(b=True, which='major', color='white', lw=2)
-        ax.grid(b=True, which='minor', color='white', lw=0.5, alpha=1.0)
-        
-        freq, bins2 = np.histogram(self.df._spd, bins=bins)
-
-        spdFreq = pd.DataFrame(index=['%d-%d' % (i, j) for (i,j) 
-                              in zip(bins, bins2[1:])],
-                       data=freq, columns=['Freq'])
-        spdFreq.index.name='bin'
-        return spdFreq
-
-    def plotAccelerationDistribution(self, ax, lower=None, upper=None):
-        
-        if not lower:
-            lower = np.floor(self.df._acc.min()) - 0.5
-        if not upper:
-            upper = np.ceil(self.df._acc.max()) + 0.5
-
-        bins = np.arange(lower, upper, 1)
-        
-        ax.hist(self.df._acc, bins=bins, color='blue', histtype='step', linewidth=2) 
-        
-        ax.set_title("Distribution of Acceleration", fontsize=18)
-        ax.set_xlabel("Acceleration(fpss)", fontsize=18)
-        ax.set_ylabel("Frequency", fontsize=18)
-        
-        minor_locator = matplotlib.ticker.AutoMinorLocator(5)
-        ax.xaxis.set_minor_locator(minor_locator)
-        
-        ax.grid(b=True, which='major', color='white', lw=2)
-        ax.grid(b=True, which='minor', color='white', lw=0.5, alpha=1.0)
-
-        freq, bins2 = np.histogram(self.df._acc, bins=bins)
-
-        accFreq = pd.DataFrame(index=['%d-%d' % (i, j) for (i,j) 
-                              in zip(bins, bins2[1:])],
-                       data=freq, columns=['Freq'])
-        accFreq.index.name='bin'
-        return accFreq
-
-    def getAccelerationJerk(self):
-        """returns a new dataset with jerk values for a time step of 1 second"""
-        
-        self.df = self.df.sort_values(['_vid', '_time'])
-
-        result = [] 
-        for VehId, group in self.df.groupby('_vid'):
-
-            group2 = group[['_acc', '_spd',  '_locy']].copy() 
-
-            #create a datetime variable 
-            new_time = [] 
-            for t in group._time.values: 
-                t = np.datetime64(int(t *1000) ,'ms')
-                new_time.append(t)
-
-            group2['_time'] = new_time 
-
-            tmp2 = (group2.set_index('_time')
-                   .resample('1s')
-                   .mean()
-                   .reset_index()
-                   )
-
-            tmp2['_vid'] = VehId
-
-            tmp2['_jerk'] = tmp2._acc.shift(-1) - tmp2._acc
-            result.append(tmp2)
-
-        df1s = pd.concat(result)
-        self.df1s = df1s.dropna()
-        
-        return self.df1s 
-
-    def plotJerkDistribution(self, df, ax, lower=None, upper=None):
-                
-        if not lower:
-            lower = np.floor(df._jerk.min()) 
-        if not upper:
-            upper = np.ceil(df._jerk.max()) 
-
-        bins = np.arange(lower,
-                         upper, 1)
-        
-        ax.hist(df._jerk, bins=bins, color='blue', 
-                histtype='step', linewidth=2) 
-        
-        minor_locator = matplotlib.ticker.AutoMinorLocator(10)
-        ax.xaxis.set_minor_locator(minor_locator)
-        
-        ax.set_title("Distribution of Jerk", fontsize=18)
-        ax.set_xlabel("Jerk", fontsize=18)
-        ax.set_ylabel("Frequency", fontsize=18)
-        
-        ax.grid(b=True, which='major', color='white', lw=2)
-        ax.grid(b=True, which='minor', color='white', lw=0.5, alpha=1.0)
-        
-        hist, bins = np.histogram(df._jerk, 
-                        bins=bins)
-        jerk_freq = pd.DataFrame(index=bins[:-1], data=hist, columns=['freq'])
-        labels = ["%.1f" % ((i+j)/2) for i,j in zip(bins[:], bins[1:])]
-        jerk_freq.index = labels
-
-        jerk_freq['Percentage'] = jerk_freq['freq'] / df.shape[0] * 100
-        jerk_freq.index.name = 'bin center'
-
-        return jerk_freq 
-
-    def getARMSDistribution(self, speedbin=5):
-        """Calculates ARMS for each speed bin"""
-        result = [] 
-
-        speedBins = np.array(self.df._spd, np.int) // speedbin * speedbin 
-        for sbin, group in self.df.groupby(speedBins):
-
-            arms = np.sqrt(np.sum(group._acc.dropna().values ** 2) / group.shape[0]) * 0.303
-
-            result.append((sbin, arms, group.shape[0]))
-
-        arms = pd.DataFrame(result, columns=['_spd', '_arms', 'n'])
-        
-        return arms 
-
-    def plotARMS(self, df, ax):
-    
-        ax.plot(df._spd, df._arms, color='blue', lw=2)
-            
-        ax.set_ylabel('Acceleration Root Mean Squared', fontsize=18)
-        ax.set_xlabel("Speed (mph)", fontsize=18)
-        ax.set_title("ARMS", fontsize=18)
-
-    def plotAllTrajectories(self, fig, ax, lane, start_time, end_time, start_dist, end_dist, point_size=0.5, title=""):
-
-        """This function plots all the vehicle trajectories for a given lane, start, and end time and for 
-        a particular section along the corridor identified by the start and end distance. 
-
-        For each vehicle that is present in the provided temporal and spatial window the 
-        function uses color-coded points to visualize successive vehicle positions. The 
-        points are color coded by the vehicle speed using a single color for a 10 mph 
-        interval.  
-
-        Args:
-           fig (matplotlib fibure):  The figure to draw the plot on
-           ax  (matplotlib ax):      The axes to draw the plot
-           lane (integer) : The lane number 
-           start_time (datetime): the begining of the selected time window 
-           end_time (datetime): the end of the selected time window
-           start_dist (feet): the start distance along the corridor. 
-           Vehicle positions before this threshold are not plotted. 
-           end_dist (feet): the maximum linear poisition along the corridor to visualize. 
-           Vehicle positions after this value will not be ploted.   
-
-        Kwargs:
-           point_size (float): The size of each point in pixels. The user can vary the size depending on canvas size and the number of points to visualized
-
-        Returns:
-           None
-
-        Raises:
-           AttributeError, KeyError
-
-        In the example code below the variables t1 and t2 hold the time thresholds. 
-        The dates correspond to valid times in the NGISM I-80 dataset.  
-        A figure, and axes canvas are obtaind in the third library by calling 
-        the appropate matplotlib function and by providing the selected figure size in inches.
-        The fourth line applies the function that produces the image shown below. 
-        All the trajectories in lane one  between t1, t2 and and between 0 and 
-        1800 from the corridor start will be visualized.  
-        
-        >>> t1 = np.datetime64('2005-04-13 17:00:00')
-        >>> t2 = np.datetime64('2005-04-13 17:30:00')
-        >>> fig, ax = plt.subplots(figsize=(15,10), dpi=150)
-        >>> plotTrajectories(fig, ax, lane=1, 
-                             start_time=t1, end_time=t2, 
-                             start_dist=0, end_dist=1800)
-        
-
-        .. figure::  _static/ngRe_traj_lane_2.png
-           :align:   center
-
-        The generated image can be saved by calling the savefig function. The image is 
-        saved in the png format using 150 dots per inch (dpi) 
-        
-        >>> output_file = "trajectories.png"
-        >>> fig.savefig(output_file, dpi=150)
-
-        """
-        
-        #select the trajectories to plot based on inputs 
-        tmp = self.df[self.df._lane == lane]
-        tmp = tmp[tmp._time.values >= start_time]
-        tmp = tmp[tmp._time.values <= end_time]
-        tmp = tmp[tmp._locy >= start_dist]
-        tmp = tmp[tmp._locy <= end_dist]
-      
-        if tmp.shape[0] == 0:
-            raise ValueError("Nothing to plot")
-        
-        rect = 0.06,0.06,0.90,0.9
-        ax = fig.add_axes(rect)
-        fig.add_axes(ax)
-
-        #define the coloring scheme for the points 
-        bounds = [0, 10, 20, 30, 40, 50, 60, 70, 80]
-        colors2 = ['#e31a1c','#fd8d3c', '#fecc5c','#ffffcc','#a1dab4','#41b6c4','#225ea8', '#000000']
-        cmap = mpl.colors.ListedColormap(colors2) 
-        norm = mpl.colors.BoundaryNorm(bounds, cmap.N)
-
-        #define the color of the points 
-
-        point_colors = [] 
-        for spd in tmp._spd.values:
-
-            if spd < 80:
-                p_color = colors2[int(spd // 10)]
-            else:
-                p_color = colors2[-1]
-        point_colors.append(p_color)
-
-        #point_colors = tmp._spd.apply(lambda spd:colors2[int(spd // 10)]).values
-        
-        #x axis is the seconds from start time 
-        #times = (tmp._time - start_time).dt.total_seconds().values
-        times = tmp._time - start_time
-
-        #y axis is the location along the corridor
-        locations = tmp._locy.values 
-        
-        ax.scatter(times, locations, c=point_colors, s=point_size)
-        ax.scatter(times[0],   locations[0], c=point_colors[0], s=point_size*8)
-        ax.scatter(times[-1], locations[-1], c=point_colors[-1], s=point_size*8)
-        
-        
-        ax.set_facecolor('white')
-        ax.set_xlabel("Time in seconds from %s" % str(start_time), fontsize=18)
-        ax.set_ylabel("Distance from Starting point %.1f (feet)" % start_dist,
-                      fontsize=18)
-        
-        ax.set_xlim([times.min(), times.max()])
-        ax.set_ylim([locations.min(), locations.max()])
-        
-        if title:
-            ax.set_title(title)
-        
-        cmax = fig.add_axes([0.96, 0.1, 0.02, 0.8])
-        mpl.colorbar.ColorbarBase(ax=cmax, cmap=cmap, norm=norm, boundaries=bounds) 
-
-        ax.set_axisbelow(True)
-        ax.grid(color='grey', lw=1, linestyle='dashed', alpha=0.2)
-    
-    def calculateSpaceMeanSpeedAndDensity(self, time_bin, space_bin):
-        
-        raise Exeption() 
-        """time_bin in seconds 
-        space_bin in feet """
-
-        df['_spacebin'] = np.array(df._locy // space_bin, np.int)
-        df['_timebin'] = pd.to_datetime(((ng._time.astype(np.int64) // 
-                                         (time_bin * 1e9) ) * (time_bin * 1e9) ))
-        
-        df_hm = (df.groupby(['_lane', '_spacebin', '_timebin'])['_spd']
-                          .aggregate([np.mean, np.size]))
-
-        df_hm = (df_hm.reset_index()
-                      .rename(columns={'size':'density', 'mean':'speed', '_lane':'_lane'}) ) 
-
-        mi = pd.MultiIndex.from_product([sorted(df._lane.unique()), 
-                                         sorted(df._spacebin.unique()), 
-                                         df._timebin.unique()], 
-                                         names=['_lane', '_spacebin', '_timebin'])
-        mi = pd.DataFrame(index=mi)
-        mi.reset_index(inplace=True)
-
-        df_hm = df_hm.merge(mi, on=['_lane', '_spacebin', '_timebin'], how='right')
-        df_hm = df_hm.set_index(['_lane', '_spacebin', '_timebin'])
-
-
-        ### the simulation time step is 0.1 seconds this is why I am multiplying by 10 below 
-        ##TODO change the 10 
-        df_hm['density'] = df_hm['density'] * (5280 / space_bin) / (time_bin * 10)
-        
-        return df_hm 
-
-    def plotMeanCorridorSpeedDistribution(self,df, ax):
-        """
-        '_vid', 'start', 'startDist', 'end', 'endDist', 'dur', 'dist', 'speed'], dtype='object'
-        """
-        
-        bins = np.arange(np.floor(df._spd.min()),
-                         np.ceil(df._spd.max()), 1)
-        
-        ax.hist(df._spd, bins=bins, color='blue', histtype='step', linewidth=2) 
-        
-        minor_locator = matplotlib.ticker.AutoMinorLocator(10)
-        ax.xaxis.set_minor_locator(minor_locator)
-        
-        ax.set_title("Distribution of Average Vehicle Speed", fontsize=18)
-        ax.set_xlabel("Speed(mph)", fontsize=18)
-        ax.set_ylabel("Frequency", fontsize=18)
-        
-        ax.grid(b=True, which='major', color='white', lw=2)
-        ax.grid(b=True, which='minor', color='white', lw=0.5, alpha=1.0)
-        
-        return np.histogram(df._spd, bins=bins)
-    
-    def recalculateMacroVars(self, space_bin, time_bin):
-
-        """Recalculates the macroscopic fundamental variables
-        time_bin in seconds 
-        space_bin in feet 
-        """
-
-        self.df['_spacebin'] = np.array(self.df._locy // space_bin, np.int)
-        self.df['_timebin'] = pd.to_datetime(((self.df._time.astype(np.int64) // 
-                                         (time_bin * 1e9) ) * (time_bin * 1e9) ))
-
-        self.space_bin = space_bin
-        self.time_bin  = time_bin 
-        
-        df_hm = (self.df.groupby(['_lane', '_spacebin', '_timebin'])['_spd']
-                          .aggregate([np.mean, np.size]))
-
-        df_hm = (df_hm.reset_index()
-                      .rename(columns={'size':'density', 'mean':'speed', '_lane':'_lane'}) ) 
-
-        mi = pd.MultiIndex.from_product([sorted(self.df._lane.unique()), 
-                                         sorted(self.df._spacebin.unique()), 
-                                         self.df._timebin.unique()], 
-                                         names=['_lane', '_spacebin', '_timebin'])
-        mi = pd.DataFrame(index=mi)
-        mi.reset_index(inplace=True)
-
-        df_hm = df_hm.merge(mi, on=['_lane', '_spacebin', '_timebin'], how='right')
-        df_hm = df_hm.set_index(['_lane', '_spacebin', '_timebin'])
-
-
-        ### the simulation time step is 0.1 seconds this is why I am multiplying by 10 below 
-        ##TODO change the 10 
-
-        time_step_in_sec = self.time_step.astype(np.int64) / 1e9
-
-        df_hm['density'] = df_hm['density'] * (5280 / space_bin) / (time_bin / time_step_in_sec)
-        
-        leaveLaneChangeRates = (self.df.groupby(['_lane', '_spacebin', '_timebin'])['_leaveLane']
-                               .sum())
-        enterLaneChangeRates = (self.df.groupby(['_lane', '_spacebin', '_timebin'])['_enterLane']
-                               .sum())
-
-        leaveLaneChangeRates  = leaveLaneChangeRates * (3600 / time_bin) * (5280 / self.space_bin) 
-        enterLaneChangeRates  = enterLaneChangeRates * (3600 / time_bin) * (5280 / self.space_bin) 
-
-        leaveLaneChangeRates = leaveLaneChangeRates.to_frame().rename(columns={"_leaveLane":'numVehiclesLeavingLane'})
-        enterLaneChangeRates = enterLaneChangeRates.to_frame().rename(columns={"_enterLane":'numVehiclesEnteringLane'})       
-
-        df_hm['numVehiclesLeavingLane']  = leaveLaneChangeRates['numVehiclesLeavingLane']
-        df_hm['numVehiclesEnteringLane'] = enterLaneChangeRates['numVehiclesEnteringLane']
-
-        self.df_macro = df_hm 
-
-    def recalculateLaneChangeRates(self, space_bin, time_bin):
-
-        """Recalculates the lane change rates 
-        """
-        self.df['_spacebin'] = np.array(self.df._locy // space_bin, np.int)
-        self.df['_timebin'] = pd.to_datetime(((self.df._time.astype(np.int64) // 
-                                         (time_bin * 1e9) ) * (time_bin * 1e9) ))
-
-        self.space_bin = space_bin
-        self.time_bin  = time_bin 
-
-        time_step_in_sec = self.time_step.astype(np.int64) / 1e9
-
-        laneChangeRates = (self.df.groupby(['_lane', '_spacebin', '_timebin'])['_leaveLane']
-                           .sum()
-                          )
-
-        laneChangeRates = laneChangeRates * (3600 / time_bin) * (5280 / self.space_bin) 
-
-
-        laneChangeRates = laneChangeRates.to_frame().reset_index()
-
-        mi = pd.MultiIndex.from_product([sorted(self.df._lane.unique()), 
-                                         sorted(self.df._spacebin.unique()), 
-                                         sorted(self.df._timebin.unique())], 
-                                         names=['_lane', '_spacebin', '_timebin'])
-
-        mi = pd.DataFrame(index=mi)
-        mi.reset_index(inplace=True)
-
-        laneChangeRates = laneChangeRates.merge(mi, on=['_lane', '_spacebin', '_timebin'], how='right')
-
-        #laneChangeRates = laneChangeRates.set_index(['_lane', '_spacebin', '_timebin']).unstack()
-
-        self.df_lcr = laneChangeRates
-
-        #self.recalculateMacroVars(space_bin, time_bin)
-
-    def plotSelectedTrajectories(self, fig, ax, veh_ids):
-        """This function plots selected vehicle trajectories defined by 
-        a list of vehicle ids. Points in the plot are color-colded by speed. 
-        """
-    
-        #define the coloring scheme for the points 
-        bounds = [0, 10, 20, 30, 40, 50, 60, 70, 80]
-        colors2 = ['#e31a1c','#fd8d3c', '#fecc5c','#ffffcc','#a1dab4','#41b6c4','#225ea8', '#000000']
-        cmap = mpl.colors.ListedColormap(colors2) 
-        norm = mpl.colors.BoundaryNorm(bounds, cmap.N)
-        
-        for veh_id in veh_ids:
-            
-            tmp = df[df._vid == veh_id]
-            
-            locations = tmp._locy.values 
-            times = (tmp._time - start_time).dt.total_seconds().values
-            
-            #define the color of the points 
-            point_colors = tmp._spd.apply(lambda spd:colors2[int(spd // 10)]).values
-            
-            #y axis is the location along the corridor
-            locations = tmp._locy.values 
-            
-            ax.scatter(times, locations, c=point_colors, s=1)
-
-    def plotSpeedVsDensity(self, fig, ax, speed_step=5, color='blue', max_density=250, max_speed=70, show_bin_info=True, plot_mean=True):
-
-        points = ax.scatter(self.df_macro.density, self.df_macro.speed, 
-             s=1, color=color, label=None)
-
-        #set the limits of max density 
-        ax.set_xlim([0, max_density])
-        ax.set_ylim([0, max_speed])
-
-        #plot the mean line 
-        assert speed_step > 0 
-        speed_groups = self.df_macro.density.values // speed_step * speed_step
-
-        hm_mean = (self.df_macro.groupby(speed_groups)['speed'].aggregate([np.mean, np.size])
-                      .reset_index()
-                      .rename(columns={'index':'density', 'mean':'mean_speed'}))
-
-        #the mean line is plotted only where there are more than 100 points
-        if plot_mean:  
-            tmp = hm_mean[hm_mean['size'] > 100]
-            #tmp = hm_mean 
-            mean_line = ax.plot(tmp.density, tmp.mean_speed, c=color, label="mean speed")
-
-        ax.legend(fontsize=16)
-
-        ax.set_ylabel("Speed (mph)", fontsize=18)
-        ax.set_xlabel('Density (vpm)', fontsize=18)
-
-        if show_bin_info:
-            fig.text(0.85, 0.65, "SpaceBin:%dft\nTimeBin:%dsec" % (self.space_bin, self.time_bin), fontsize=18)
-
-        ax.set_title("SpeedVsDensity")
-
-        fig.tight_layout()
-
-    def plotSpeedVsDensityByLane(self, fig, dot_color='blue', mean_color='white', plot_mean=True, max_density=250, max_speed=70, pad=1.0, w_pad=0.5, h_pad=1.0, alpha=0.5):
-
-        numLanes = self.df._lane.max() 
-
-        numRows = numLanes // 2 + 1
-        gs = mpl.gridspec.GridSpec(numRows, 2)
-
-        axes = [] 
-
-        for laneNum in range(1, numLanes + 1):
-            
-            i = (laneNum - 1) // 2
-            j = (laneNum - 1) % 2 
-            
-            ax = plt.subplot(gs[i,j])
-
-            axes.append(ax)
-            
-            tmp = self.df_macro.loc[laneNum]
-            
-            ax.scatter(tmp.density, tmp.speed, s=1.5, color=dot_color, label=None, alpha=alpha)
-            ax.set_xlim([0, max_density])
-            ax.set_ylim([0, max_speed])
-            ax.set_title("Lane %d" % laneNum, fontsize=16)
-            
-            tmp_mean = (tmp.groupby(tmp.density.values // 5 * 5)['speed']
-                              .aggregate([np.mean, np.size])
-                              .reset_index()
-                              .rename(columns={'index':'density', 'mean':'mean_spd'}))
-            
-            #if you wish to plot the mean when you have 50 or more points
-            #tmp_mean = tmp_mean[tmp_mean['size'] > 50]
-            
-            if plot_mean: 
-                ax.plot(tmp_mean.density, tmp_mean.mean_spd, c=mean_color, label='mean speed')
-            
-            if j == 1:
-                ax.set_yticklabels([])
-                
-            if j == 0:
-                ax.set_ylabel("Speed (mph)", fontsize=18)
-                
-            ax.legend(fontsize=18)
-
-        axes[-2].set_xlabel("Density (vpm)", fontsize=18)
-        axes[-1].set_xlabel("Density (vpm)", fontsize=18)
-
-
-        fig.suptitle("SpeedVsDensityByLane", fontsize=18)
-
-        fig.tight_layout(pad=1.0, w_pad=0.5, h_pad=1.0)
-
-        fig.text(0.72, 0.13, "SpaceBin:%dft\nTimeBin:%dsec" % (self.space_bin, self.time_bin), fontsize=18)
-
-    def getNumOfLaneChangesPerLane(self):
-        """Returns a table with the number of lane changes
-        """ 
-
-        tmp = self.df.groupby('_lane')['_leaveLane'].sum().to_frame().reset_index()
-        tmp.rename(columns={'_leaveLane':"NumOfVehiclesLeavingLane"}, inplace=True)
-        tmp['NumOfVehiclesEnteringLane'] = self.df.groupby('_lane')['_enterLane'].sum().to_frame().reset_index()['_enterLane']
-        
-        return tmp 
- 
-    def plotLCR(self, fig, laneChangeType='leave', max_lcr=72000):
-        """lane changes can be either enter or exit 
-        """
-        gs = mpl.gridspec.GridSpec(2, 5, width_ratios=[0.2, 1, 1, 1, 1])
-
-        #set up teh colorscale 
-        numColors = 10
-        bounds = list(np.linspace(0, max_lcr, numColors))
-        bounds.insert(0, -10)
-        bounds[1] = 0.1
-
-        colors = ['grey', '#ffffcc','#ffeda0','#fed976','#feb24c',
-                 '#fd8d3c','#fc4e2a','#e31a1c','#bd0026','#800026']
-        cmap = mpl.colors.ListedColormap(colors) 
-        norm = mpl.colors.BoundaryNorm(bounds, cmap.N)
-
-        cb = None 
-        ax = None
-
-        for i in range(1, self.numLanes + 1):
-            
-            j = (i-1) % 4
-            k = (i-1) // 4
-
-            ax = plt.subplot(gs[k,j+1])
-            
-            if laneChangeType == 'leave':
-                data = self.df_macro.loc[i]['numVehiclesLeavingLane'].unstack().values
-            elif laneChangeType == 'enter': 
-                data = self.df_macro.loc[i]['numVehiclesEnteringLane'].unstack().values
-            else:
-                raise ValueError("unknown lane change type")
-
-            nan_mask = np.isnan(data)
-            tmp = data.copy()
-            tmp[nan_mask] = -1
-          
-            cb = ax.imshow(tmp, cmap=cmap, norm=norm, origin='lower', aspect='auto')
-       
-            ax.set_xticklabels(['', '17:00', '05', '10', '15', ''])
-
-            ax.set_yticklabels([])
-            
-            ax.grid(True, color='black', ls='dashed', lw=0.3)
-            
-            ax.set_title("Lane %d" % i, fontsize=16)
-            
-        cmax = fig.add_axes([0.85, 0.15, 0.05, 0.3])
-
-        fig.colorbar(cb, cax=cmax, norm=norm, boundaries=bounds, ticks=bounds)
-        cmax.set_title("LCR colormap\n(lcvm)", fontsize=16)
-
-        cm_labels = ["%d" % i for i in list(map(int, bounds))]
-        cm_labels[0] = "" 
-        cmax.set_yticklabels(cm_labels, fontsize=16)
-
-        ax1 = plt.subplot(gs[0,0]) 
-        ax2 = plt.subplot(gs[1,0])
-
-        ytick_labels = [i for i in range(0,2000,200)]
-        ax1.set_yticks(ytick_labels)
-        ax1.set_yticklabels(ytick_labels, fontsize=16)
-        ax1.set_xticklabels([])
-        ax1.grid(False)
-        ax1.set_ylabel("Length in feet along I80 corridor", fontsize=16)
-        ax1.set_facecolor('white')
-
-        ax2.set_yticks(ytick_labels)
-        ax2.set_yticklabels(ytick_labels, fontsize=14)
-        ax2.set_xticklabels([])
-        ax2.grid(False)
-        ax2.set_ylabel("Length in feet along I80 corridor", fontsize=16)
-        ax2.set_facecolor('white')
-
-        fig.text(0.85, 0.05, "SpaceBin:%dft\nTimeBin:%dsec" % 
-                  (self.space_bin, self.time_bin), fontsize=16)
-
-        fig.text(0.908, 0.15, "No data", fontsize=16)
-
-
-
-class Directory:
-
-    pass 
-
-    def __init__(self):
-
-        pass 
-
-
-class Results:
-
-    def __init__(self):
-
-        pass 
-
-    def execute(self):
-
-        start_time = np.datetime64('2005-04-13 17:00:00')
-        end_time   = np.datetime64('2005-04-13 17:30:00')
-
-        print('reading the data')
-        fileName = "./data/ngsimI80trajectories 0500-0530.txt"
-
-        self._outputDir = Directory()
-
-        self._outputDir.value = './results'
-
-        #self.vt = VTAnalytics.readNGISIMData(fileName, 
-        #    start_time=start_time, 
-        #    end_time=end_time)
-
-
-        self.vt = VTAnalytics.readModelData("./data/ai21.hdf",
-                              start_time=start_time, end_time=end_time)
-
-        self.data = self.vt.df 
-        
-        print('done reading the data')
-
-        writer = pd.ExcelWriter(os.path.join(self._outputDir.value, 'tables.xlsx'))
-
-        PAGE_SIZE = (1000, 792.0)
-        pdfReport = PdfReport(os.path.join(self._outputDir.value, 'report.pdf'), PAGE_SIZE)
-
-        fig, ax = plt.subplots(figsize=(10,8), dpi=100)
-        self.vt.plotSpeedVsDensity(fig, ax, max_density=280)        
-        fig.savefig(os.path.join(self._outputDir.value, "SpeedVsDensity.png"), dpi=100)
-        pdfReport.addChart2(os.path.join(self._outputDir.value, "SpeedVsDensity.png"), 'SpeedVsDensity')
-
-
-        fig, ax = plt.subplots(figsize=(10,8), dpi=100)
-        self.vt.plotLCR(fig, laneChangeType='enter')
-        fig.savefig(os.path.join(self._outputDir.value, "LCR.png"), dpi=100)
-        pdfReport.addChart2(os.path.join(self._outputDir.value, "LCR.png"), "LaneChangeRate")
-
-
-        fig, ax = plt.subplots(figsize=(10,8), dpi=100)
-        self.vt.plotSpeedVsDensityByLane(fig, plot_mean=True, dot_color='blue', alpha=0.4)
-        out_fileName = os.path.join(self._outputDir.value, "SpeedVsDensityByLane.png")
-        fig.savefig(out_fileName,dpi=100)
-        pdfReport.addChart2(out_fileName, "SpeedVsDensityByLane")
-
-
-        fig, ax = plt.subplots(figsize=(10,8))
-        spdDist = self.vt.plotSpeedDistribution(ax)
-        out_fileName = os.path.join(self._outputDir.value, "SpeedDistribution.png")
-        fig.savefig(out_fileName, dpi=100)
-        pdfReport.addChart2(out_fileName, "SpeedDistribution")
-        spdDist.to_excel(writer,'SpeedDistribution')
-
-        fig, ax = plt.subplots(figsize=(10,8))
-        accDist = self.vt.plotAccelerationDistribution(ax)
-        out_fileName = os.path.join(self._outputDir.value, "AccelerationDistribution.png")
-        fig.savefig(out_fileName, dpi=100)
-        pdfReport.addChart2(out_fileName, "AccelerationDistribution")
-        accDist.to_excel(writer,'AcclerationDistribution')
-
-        fig, ax = plt.subplots(figsize=(10,8))
-        jerk = self.vt.getAccelerationJerk()
-        jerkDist = self.vt.plotJerkDistribution(jerk, ax)
-        out_fileName = os.path.join(self._outputDir.value, "AccelerationJerkDistribution.png")
-        fig.savefig(out_fileName ,dpi=100)
-        pdfReport.addChart2(out_fileName, "AccelerationJerkDistribution")
-        jerkDist.to_excel(writer,'JerkDistribution')
-
-
-        armsDist = self.vt.getARMSDistribution()
-        fig, ax = plt.subplots(figsize=(10,8))
-        self.vt.plotARMS(armsDist, ax)
-        out_fileName = os.path.join(self._outputDir.value, "AccelerationRootMeanSquareError.png")
-        fig.savefig(out_fileName, dpi=100)
-        pdfReport.addChart2(out_fileName, "AccelerationRootMeanSquareError")
-        armsDist.to_excel(writer,'ARMS')
-
-        writer.save()
-
-        for i in range(1,8):
-            fig, ax = plt.subplots(figsize=(10,8),dpi=100)
-            self.vt.plotAllTrajectories(fig, ax, i, np.datetime64('2005-04-13 17:00:00'), 
-                             np.datetime64('2005-04-13 17:10:00'), 0, 1000, point_size=0.5, title="All trajectories for lane %d" % i)
-            out_fileName = os.path.join(self._outputDir.value, "All_trajectories_lane_%d.png" % i)
-            fig.savefig(out_fileName, dpi=100)
-            pdfReport.addChart2(out_fileName, "All trajectories for lane %d" % i)
-
-
-        pdfReport.write()
-
-        file_list = [os.path.join(self._outputDir.value, "graph%d.pdf" % i)
-                          for i in range(1,5)]
-
-
-        print('done')
-
-if __name__ == "__main__":
-
-
-    r = Results()
-
-    r.execute() 
-
-
-#http://matplotlib.org/sampledoc/index.html
-#https://pythonhosted.org/an_example_pypi_project/sphinx.html#full-code-example
-#https://pythonhosted.org/an_example_pypi_project/pkgcode.html
-#http://www.sphinx-doc.org/en/stable/ext/autodoc.html
-
+import sys                      # system tools 
+
+import numpy as np              # numerical computing with arrays 
+import pandas as pd             # dataframe as in R
+
+import os                       # operating system io commands 
+import itertools                # functonal programming tools 
+
+from trajectoryCache import DatasetCache
+from columnStore import ColumnStore
+from instrumentation import stage, staged
+from parallelKernels import kernelPool, applyByGroups
+from histograms import HistogramAccumulator
+from quantileSketch import QuantileSketch
+from binnedStatistics import BinnedStatistic
+from groupedArrays import _groupStarts
+
+#the charts live in their own module which imports matplotlib on first use, 
+#so the numeric core does not load any plotting library 
+from trajectoryPlots import TrajectoryPlots
+
+#FIG_SIZE_X,FIG_SIZE_Y = 15, 10
+
+NGSIM_COLUMNS = ['VehID', 'FrameID', 'TotalFrames', 'GlobalTime', 'locX', 'locY', 'globX', 
+                 'globY', 'vehLength', 'vehWidth', 'vehClass', 'vehSpeed', 'vehAcceleration', 'lane', 
+                 'precedingVeh', 'followingVeh', 'spacing', 'headway']
+
+#explicit schema used when the raw NGSIM file is streamed in chunks 
+NGSIM_DTYPES = {'VehID':np.int64, 'FrameID':np.int64, 'TotalFrames':np.int64, 
+                'GlobalTime':np.int64, 'locX':np.float64, 'locY':np.float64, 
+                'globX':np.float64, 'globY':np.float64, 'vehLength':np.float64, 
+                'vehWidth':np.float64, 'vehClass':np.int64, 'vehSpeed':np.float64, 
+                'vehAcceleration':np.float64, 'lane':np.int64, 'precedingVeh':np.int64, 
+                'followingVeh':np.int64, 'spacing':np.float64, 'headway':np.float64}
+
+#the columns that identify a vehicle in the raw NGSIM data 
+NGSIM_VEHICLE_KEYS = ['VehID', 'TotalFrames', 'vehLength']
+
+#dtypes used by the compact mode of the readers. Columns that are not listed 
+#keep their dtype, in particular the time and the global coordinates which 
+#need the precision of float64 
+COMPACT_DTYPES = {'lane':np.int8, '_lane':np.int8, 'laneIndex':np.int8, 'vehClass':np.int8, 
+                  '_leaveLane':np.int8, '_enterLane':np.int8, 
+                  '_vid':np.int32, 'VehID':np.int32, 'oid':np.int32, 'FrameID':np.int32, 
+                  'TotalFrames':np.int32, 'precedingVeh':np.int32, 'followingVeh':np.int32, 
+                  '_prV':'Int32', '_flV':'Int32', 
+                  '_locy':np.float32, '_vlen':np.float32, '_spd':np.float32, '_acc':np.float32, 
+                  '_gap':np.float32, '_ttc':np.float32, '_dt':np.float32, 
+                  'locX':np.float32, 'vehWidth':np.float32, 'vehSpeed':np.float32, 
+                  'vehAcceleration':np.float32, 'spacing':np.float32, 'headway':np.float32}
+
+#integer columns that the compact mode stores in the smallest integer dtype 
+#that holds their values, at most the one in COMPACT_DTYPES. The vehicle ids 
+#stay int32, so arithmetic on them and concatenating the ids of another file 
+#can not overflow 
+COMPACT_DOWNCAST = ['FrameID', 'TotalFrames']
+
+#raw columns that are duplicated or derived by an app specific column. In 
+#compact mode only the app specific column is kept. The NGSIM GlobalTime in 
+#milliseconds is _time * 1000 
+COMPACT_ALIASES = {'locY':'_locy', 'vehLength':'_vlen', 'lane':'_lane', 'GlobalTime':'_time', 
+                   'dist_along':'_locy', 'speed':'_spd', 'acceleration':'_acc', 
+                   'time':'_time', 'oid':'_vid'}
+
+#increase every time the output of the readers changes so that 
+#cached datasets prepared by older versions are not reused 
+READER_VERSION = 5
+
+#the bins of the time to collision distribution in seconds 
+TTC_BINS = np.arange(0, 16, 1)
+
+#the percentiles of describe, with the minimum and the maximum
+DESCRIBE_PERCENTILES = [0, 5, 25, 50, 75, 95, 100]
+
+
+def _forwardDifference(values, groups=None):
+    """Returns values[i+1] - values[i] for sorted values and a missing 
+    value at the last row of every group"""
+
+    diff = values[1:] - values[:-1]
+    if diff.dtype.kind in 'iub':
+        diff = diff.astype(np.float64)
+
+    missing = np.timedelta64('NaT') if diff.dtype.kind == 'm' else np.nan
+
+    result = np.empty(values.shape[0], dtype=diff.dtype)
+    result[:-1] = diff
+    result[-1:] = missing
+
+    if groups is not None: 
+        result[:-1][groups[1:] != groups[:-1]] = missing
+
+    return result
+
+
+def _timeTicks(values):
+    """Converts a time column into integer ticks. Datetimes are converted to 
+    nanoseconds and times in seconds to microseconds. Returns the ticks and 
+    the number of ticks per second"""
+
+    values = np.asarray(values)
+
+    if values.dtype.kind == 'M':
+        return values.astype('datetime64[ns]').astype(np.int64), 10**9
+
+    return np.round(values.astype(np.float64) * 10**6).astype(np.int64), 10**6
+
+
+def _ticksToTime(ticks, ticksPerSecond, like):
+    """Converts ticks back to the kind of time column given in like"""
+
+    if np.asarray(like).dtype.kind == 'M':
+        return np.asarray(ticks, dtype=np.int64).astype('datetime64[ns]')
+
+    return np.asarray(ticks) / float(ticksPerSecond)
+
+
+def _timeStepInTicks(timeStep, ticksPerSecond):
+    """Converts a time step given in seconds, as a timedelta or as a pandas 
+    frequency string such as '1s' or '100ms' into ticks"""
+
+    if isinstance(timeStep, str):
+        timeStep = pd.Timedelta(timeStep)
+
+    if isinstance(timeStep, (pd.Timedelta, np.timedelta64)):
+        seconds = pd.Timedelta(timeStep).total_seconds()
+    else:
+        seconds = float(timeStep)
+
+    step = int(round(seconds * ticksPerSecond))
+    if step <= 0:
+        raise ValueError("The time step must be positive")
+
+    return step 
+
+
+def _resampleSorted(vid, ticks, columns, stepTicks, how='mean'):
+    """Resamples columns of rows sorted by vehicle id and time in a single pass. 
+
+    'mean' and 'last' aggregate the rows of every (vehicle, time bin) with 
+    reduceat. 'linear' interpolates every vehicle at the multiples of the time 
+    step that fall between its first and last sample. Returns the vehicle ids, 
+    the ticks of the resampled rows and a dictionary with the resampled columns. 
+    """
+
+    n = vid.shape[0]
+    if n == 0:
+        return vid, ticks, dict((name, values) for name, values in columns.items())
+
+    if how in ('mean', 'last'):
+
+        bins = ticks // stepTicks 
+        starts = _groupStarts(vid, bins)
+
+        result = {}
+        for name, values in columns.items():
+
+            values = np.asarray(values, dtype=np.float64)
+            valid = ~np.isnan(values)
+
+            if how == 'mean':
+                sums = np.add.reduceat(np.where(valid, values, 0), starts)
+                counts = np.add.reduceat(valid.astype(np.int64), starts)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    result[name] = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+            else:
+                #index of the last valid row of every bin 
+                last = np.maximum.reduceat(np.where(valid, np.arange(n), -1), starts)
+                result[name] = np.where(last >= starts, values[np.maximum(last, 0)], np.nan)
+
+        return vid[starts], bins[starts] * stepTicks, result
+
+    if how == 'linear':
+
+        starts = _groupStarts(vid)
+        ends = np.append(starts[1:], n)
+
+        #the grid points of every vehicle 
+        first = -((-ticks[starts]) // stepTicks)
+        last  = ticks[ends - 1] // stepTicks
+        sizes = np.maximum(last - first + 1, 0)
+
+        gridVeh = np.repeat(np.arange(starts.shape[0]), sizes)
+        gridOffset = np.arange(gridVeh.shape[0]) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        gridTicks = (first[gridVeh] + gridOffset) * stepTicks
+        gridVid = vid[starts][gridVeh]
+
+        #merge the samples and the grid points and find the last 
+        #sample at or before every grid point 
+        allVid = np.concatenate([vid, gridVid])
+        allTicks = np.concatenate([ticks, gridTicks])
+        isGrid = np.concatenate([np.zeros(n, dtype=np.int8), np.ones(gridVid.shape[0], dtype=np.int8)])
+
+        order = np.lexsort((isGrid, allTicks, allVid))
+        prev = np.maximum.accumulate(np.where(order < n, order, -1))
+        prev = prev[order >= n]
+
+        nxt = np.minimum(prev + 1, n - 1)
+        sameVehicle = vid[nxt] == vid[prev]
+        nxt = np.where(sameVehicle, nxt, prev)
+
+        gridTicks = allTicks[order[order >= n]]
+        span = (ticks[nxt] - ticks[prev]).astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            frac = np.where(span > 0, (gridTicks - ticks[prev]) / span, 0.0)
+
+        result = {}
+        for name, values in columns.items():
+            values = np.asarray(values, dtype=np.float64)
+            result[name] = values[prev] + frac * (values[nxt] - values[prev])
+
+        return vid[prev], gridTicks, result
+
+    raise ValueError("unknown resampling method %s" % how)
+
+
+def _durationInSeconds(value):
+    """Returns a time step stored as a timedelta or as seconds in seconds"""
+
+    if isinstance(value, (np.timedelta64, pd.Timedelta)):
+        return pd.Timedelta(value).total_seconds()
+
+    return float(value)
+
+
+def _reduceAxis(values, ids, factor, axis):
+    """Sums consecutive cells of an axis whose absolute bin ids fall in 
+    the same coarse bin. Returns the summed values and the coarse ids"""
+
+    coarse = ids // factor 
+    starts = _groupStarts(coarse)
+
+    return np.add.reduceat(values, starts, axis=axis), coarse[starts]
+
+
+def _unsort(values, perm):
+    """Scatters values given in the order of perm back to the original rows"""
+
+    result = np.empty_like(values)
+    result[perm] = values 
+
+    return result 
+
+
+def _inversePermutation(perm):
+
+    inverse = np.empty_like(perm)
+    inverse[perm] = np.arange(perm.shape[0])
+
+    return inverse 
+
+
+def _filterOrder(perm, mask):
+    """Returns the order of the rows kept by mask, expressed in the 
+    positions of the filtered rows"""
+
+    newPosition = np.cumsum(mask) - 1
+
+    return newPosition[perm[mask[perm]]]
+
+
+def _vehicleKinematics(vid, time, locy):
+    """Calculates the time step, speed (mph) and acceleration (fpss) from the 
+    successive positions of rows sorted by vehicle id and time"""
+
+    dt = _forwardDifference(time, vid)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        spd = _forwardDifference(locy, vid) / dt 
+        acc = _forwardDifference(spd, vid) / dt   #fpss 
+
+    return dt, spd * (3600 / 5280), acc  # mph 
+
+
+def _laneChangeFlags(vid, lane):
+    """Returns the leave lane and enter lane flags of rows sorted by vehicle id 
+    and time. A vehicle leaves its lane at the last row before a lane change and 
+    enters the new lane at the first row after it"""
+
+    change = (lane[1:] != lane[:-1]) & (vid[1:] == vid[:-1])
+
+    leave = np.zeros(vid.shape[0], dtype=np.int64)
+    enter = np.zeros(vid.shape[0], dtype=np.int64)
+    leave[:-1] = change 
+    enter[1:] = change 
+
+    return leave, enter 
+
+
+def _neighbourVehicles(vid, lane, time):
+    """Returns the ids of the preceding and following vehicles of rows sorted by 
+    lane, time and location along the corridor"""
+
+    same = (lane[1:] == lane[:-1]) & (time[1:] == time[:-1])
+
+    prV = np.full(vid.shape[0], np.nan)
+    flV = np.full(vid.shape[0], np.nan)
+    prV[:-1] = np.where(same, vid[1:], np.nan)
+    flV[1:] = np.where(same, vid[:-1], np.nan)
+
+    return prV, flV 
+
+
+def _gapsAndTTC(lane, time, locy, vlen, spd):
+    """Returns the gap (feet) to the preceding vehicle and the time to collision 
+    (seconds) of rows sorted by lane, time and location along the corridor"""
+
+    same = (lane[1:] == lane[:-1]) & (time[1:] == time[:-1])
+
+    gap = np.full(lane.shape[0], np.nan)
+    gap[:-1] = np.where(same, locy[1:] - locy[:-1] - vlen[1:], np.nan)
+
+    ttc = np.full(lane.shape[0], np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ttc[:-1] = gap[:-1] / (spd[1:] - spd[:-1]) * (5280 / 3600)
+    ttc[:-1][time[1:] != time[:-1]] = np.nan 
+    ttc[(ttc < 0) | (ttc == np.inf)] = np.nan 
+
+    return gap, ttc 
+
+
+def _speedEdges(lowest, highest, lower=None, upper=None):
+    """Returns the 1 mph bin edges of the speed distribution, from the floor of 
+    the lowest speed unless lower or upper are given"""
+
+    if not lower:
+        lower = np.floor(lowest) 
+    if not upper:
+        upper = np.ceil(highest) 
+
+    return np.arange(lower, upper)
+
+
+def _accelerationEdges(lowest, highest, lower=None, upper=None):
+    """Returns the 1 fpss bin edges of the acceleration distribution, centered 
+    on whole numbers unless lower or upper are given"""
+
+    if not lower:
+        lower = np.floor(lowest) - 0.5
+    if not upper:
+        upper = np.ceil(highest) + 0.5
+
+    return np.arange(lower, upper, 1)
+
+
+def _ttcFrequencies(hist, bins, rows):
+    """Returns the table of the time to collision histogram of a dataset with 
+    the given number of rows"""
+
+    TTC_freq = pd.DataFrame(index=bins[:-1], data=hist, columns=['freq'])
+    labels = ["%d <= TTC < %d" % (i, i+1) for i in bins[:-1]]
+    TTC_freq.index = labels
+    TTC_freq['ngRe_Percentage'] = TTC_freq['freq'] / rows * 100
+
+    return TTC_freq
+
+
+def _armsTable(stat):
+    """Returns the table of the acceleration root mean squared of a 
+    BinnedStatistic of the acceleration by speed bin. Missing accelerations 
+    count as 0"""
+
+    arms = pd.DataFrame({'_spd':stat.bins[0],
+                         '_arms':np.sqrt(stat.sumsq / stat.count) * 0.303,
+                         'n':stat.count.astype(np.int64)})
+
+    return arms
+
+
+def _corridorSpeeds(cor_times):
+    """Adds the duration, distance and speed to a table with the start and 
+    end time and location of every vehicle"""
+
+    cor_times['dur'] = (cor_times.end - cor_times.start)
+    cor_times['dist'] = cor_times.endDist - cor_times.startDist 
+
+    duration = cor_times.dur
+    if duration.dtype.kind == 'm':
+        duration = duration.dt.total_seconds()
+    cor_times['_spd'] = (cor_times.dist / 5280.0) / (duration / 3600.0)
+
+    return cor_times 
+
+
+class MacroCube(object):
+    """Macroscopic accumulators per lane, space bin and time bin.
+
+    The cube holds dense (lane x space bin x time bin) arrays with the sum of the 
+    speeds, the number of samples and the number of vehicles leaving and entering 
+    a lane. Cubes for coarser bins that are integer multiples of the bins of the 
+    cube are calculated from the arrays without touching the trajectories. 
+
+    >>> base = MacroCube.fromFrame(vt.df, space_bin=10, time_bin=1)
+    >>> cube = base.coarsen(50, 10)
+    """
+
+    def __init__(self, lanes, spaceIds, timeIds, space_bin, time_bin, 
+                 speedSum, speedCount, count, leave, enter, datetimes=True):
+
+        self.lanes = lanes 
+        self.spaceIds = spaceIds 
+        self.timeIds = timeIds
+        self.space_bin = space_bin
+        self.time_bin = time_bin 
+
+        self.speedSum = speedSum 
+        self.speedCount = speedCount 
+        self.count = count 
+        self.leave = leave 
+        self.enter = enter 
+
+        self.datetimes = datetimes
+
+    @classmethod
+    def fromFrame(cls, df, space_bin, time_bin):
+        """Accumulates the trajectories of the dataframe"""
+
+        ticks, ticksPerSecond = _timeTicks(df._time.values)
+        timeIds = ticks // _timeStepInTicks(time_bin, ticksPerSecond)
+        spaceIds = np.floor(np.asarray(df._locy.values, dtype=np.float64) / space_bin).astype(np.int64)
+
+        lanes, laneIdx = np.unique(np.asarray(df._lane.values), return_inverse=True)
+
+        spaceStart, timeStart = spaceIds.min(), timeIds.min()
+        shape = (lanes.shape[0], spaceIds.max() - spaceStart + 1, timeIds.max() - timeStart + 1)
+        cells = np.ravel_multi_index((laneIdx.ravel(), spaceIds - spaceStart, timeIds - timeStart), shape)
+
+        def accumulate(weights=None):
+            return np.bincount(cells, weights=weights, minlength=np.prod(shape)).reshape(shape)
+
+        speed = np.asarray(df._spd.values, dtype=np.float64)
+        valid = ~np.isnan(speed)
+
+        return cls(lanes, 
+                   np.arange(spaceStart, spaceStart + shape[1]), 
+                   np.arange(timeStart, timeStart + shape[2]), 
+                   space_bin, time_bin, 
+                   speedSum=accumulate(np.where(valid, speed, 0)), 
+                   speedCount=accumulate(valid.astype(np.float64)), 
+                   count=accumulate(), 
+                   leave=accumulate(np.asarray(df._leaveLane.values, dtype=np.float64)), 
+                   enter=accumulate(np.asarray(df._enterLane.values, dtype=np.float64)), 
+                   datetimes=(df._time.values.dtype.kind == 'M'))
+
+    @classmethod
+    def merge(cls, cubes):
+        """Returns the sum of cubes with the same bins, e.g. the cubes of the 
+        consecutive time slabs of a dataset"""
+
+        cubes = list(cubes)
+        first = cubes[0]
+
+        lanes = np.unique(np.concatenate([c.lanes for c in cubes]))
+        spaceStart = min(c.spaceIds.min() for c in cubes)
+        timeStart = min(c.timeIds.min() for c in cubes)
+        shape = (lanes.shape[0], 
+                 max(c.spaceIds.max() for c in cubes) - spaceStart + 1, 
+                 max(c.timeIds.max() for c in cubes) - timeStart + 1)
+
+        arrays = [np.zeros(shape) for i in range(5)]
+        for c in cubes:
+            cells = np.ix_(np.searchsorted(lanes, c.lanes), c.spaceIds - spaceStart, 
+                           c.timeIds - timeStart)
+            for total, values in zip(arrays, [c.speedSum, c.speedCount, c.count, c.leave, c.enter]):
+                total[cells] += values 
+
+        return cls(lanes, 
+                   np.arange(spaceStart, spaceStart + shape[1]), 
+                   np.arange(timeStart, timeStart + shape[2]), 
+                   first.space_bin, first.time_bin, *arrays, datetimes=first.datetimes)
+
+    def _factor(self, value, base):
+
+        factor = value / float(base)
+        if factor < 1 or abs(factor - round(factor)) > 1e-9:
+            return None 
+
+        return int(round(factor))
+
+    def isMultiple(self, space_bin, time_bin):
+        """True if the bins are integer multiples of the bins of the cube"""
+
+        return (self._factor(space_bin, self.space_bin) is not None and 
+                self._factor(time_bin, self.time_bin) is not None)
+
+    def coarsen(self, space_bin, time_bin):
+        """Returns the cube for bins that are integer multiples of the bins of this cube"""
+
+        if not self.isMultiple(space_bin, time_bin):
+            raise ValueError("The bins %s ft, %s sec are not multiples of %s ft, %s sec" % 
+                             (space_bin, time_bin, self.space_bin, self.time_bin))
+
+        spaceFactor = self._factor(space_bin, self.space_bin)
+        timeFactor = self._factor(time_bin, self.time_bin)
+
+        arrays = [self.speedSum, self.speedCount, self.count, self.leave, self.enter]
+
+        spaceIds, timeIds = self.spaceIds, self.timeIds
+        if spaceFactor > 1:
+            reduced = [_reduceAxis(a, self.spaceIds, spaceFactor, 1) for a in arrays]
+            arrays, spaceIds = [r[0] for r in reduced], reduced[0][1]
+        if timeFactor > 1:
+            reduced = [_reduceAxis(a, self.timeIds, timeFactor, 2) for a in arrays]
+            arrays, timeIds = [r[0] for r in reduced], reduced[0][1]
+
+        return MacroCube(self.lanes, spaceIds, timeIds, space_bin, time_bin, *arrays, 
+                         datetimes=self.datetimes)
+
+    def trim(self):
+        """Returns the cube without the space and time bins that have no samples"""
+
+        spaceMask = self.count.sum(axis=(0, 2)) > 0
+        timeMask = self.count.sum(axis=(0, 1)) > 0
+
+        def select(values):
+            return values[:, spaceMask][:, :, timeMask]
+
+        return MacroCube(self.lanes, self.spaceIds[spaceMask], self.timeIds[timeMask], 
+                         self.space_bin, self.time_bin, 
+                         select(self.speedSum), select(self.speedCount), select(self.count), 
+                         select(self.leave), select(self.enter), datetimes=self.datetimes)
+
+    def laneIndex(self, lane):
+        """Returns the position of the lane in the first axis of the arrays"""
+
+        i = np.searchsorted(self.lanes, lane)
+        if i >= self.lanes.shape[0] or self.lanes[i] != lane:
+            raise KeyError(lane)
+
+        return i 
+
+    def timeBins(self):
+        """Returns the start of every time bin"""
+
+        seconds = self.timeIds * self.time_bin 
+        if self.datetimes:
+            return pd.to_datetime(np.round(seconds * 1e9).astype(np.int64))
+
+        return seconds 
+
+    def variables(self, time_step):
+        """Returns a dictionary with the (lane x space bin x time bin) arrays of the 
+        speed, density and lane change rates. The variables are missing in the 
+        cells without samples. time_step is the time step of the trajectories 
+        in seconds."""
+
+        empty = self.count == 0
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            speed = self.speedSum / self.speedCount
+
+        rate = (3600 / self.time_bin) * (5280 / self.space_bin) 
+
+        result = {'speed':speed, 
+                  'density':self.count * (5280 / self.space_bin) / (self.time_bin / time_step), 
+                  'numVehiclesLeavingLane':self.leave * rate, 
+                  'numVehiclesEnteringLane':self.enter * rate}
+
+        for values in result.values():
+            values[empty] = np.nan 
+
+        return result 
+
+    def index(self):
+
+        return pd.MultiIndex.from_product([self.lanes, self.spaceIds, self.timeBins()], 
+                                          names=['_lane', '_spacebin', '_timebin'])
+
+    def toFrame(self, time_step):
+        """Returns the macroscopic variables as a dataframe indexed by lane, space bin 
+        and time bin"""
+
+        df_hm = pd.DataFrame(index=self.index())
+        for name, values in self.variables(time_step).items():
+            df_hm[name] = values.ravel()
+
+        return df_hm 
+
+
+@pd.api.extensions.register_dataframe_accessor('raw')
+class RawColumns(object):
+    """The raw columns of a dataset by their original names, also in compact 
+    mode, which drops the raw columns duplicated by an app specific column. 
+    A dropped column is then the app specific column under the raw name, 
+    without copying it, except for the NGSIM GlobalTime which is calculated 
+    from _time. 
+
+    >>> vt = VTAnalytics.readNGISIMData('./data/i80.txt', compact=True)
+    >>> vt.df.raw.locY
+    >>> vt.df.raw['GlobalTime']
+    """
+
+    def __init__(self, df):
+
+        self._df = df
+
+    def __getitem__(self, name):
+
+        df = self._df
+        if name in df.columns:
+            return df[name]
+
+        alias = COMPACT_ALIASES.get(name)
+        if alias not in df.columns:
+            raise KeyError(name)
+
+        #GlobalTime is in milliseconds and _time in seconds 
+        if name == 'GlobalTime':
+            return pd.Series(np.round(df._time.values * 1000).astype(np.int64), 
+                             index=df.index, name=name)
+
+        return df[alias].rename(name)
+
+    def __getattr__(self, name):
+
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError("the dataset has no column %r" % name)
+
+
+class VTAnalytics(TrajectoryPlots):
+
+
+    @classmethod
+    @staged()
+    def describe(cls, var, numerical=True, decimals=1):
+        """Returns the count, missing values, mean, standard deviation, minimum, 
+        percentiles and maximum of a column. var is a series, array or list, which 
+        is described exactly, or a QuantileSketch or an iterator of chunks of the 
+        column (e.g. the chunks of a reader or the slabs of a 
+        PartitionedVTAnalytics), which are summarized in one pass with 
+        approximate percentiles"""
+        
+        if numerical: 
+
+            #only iterators are chunks, the values of an array are not 
+            if isinstance(var, (np.ndarray, list, tuple, pd.Index, pd.api.extensions.ExtensionArray)):
+                var = pd.Series(var)
+            
+            if isinstance(var, pd.Series):
+                count = int(var.shape[0])
+                na    = int(var.isnull().sum())
+
+                var2 = var.dropna().values 
+                mean = np.mean(var2)
+                std  = np.std(var2)
+
+                #the minimum, the percentiles and the maximum from one partition
+                min_, pct5, pct25, pct50, pct75, pct95, max_ = np.percentile(var2, DESCRIBE_PERCENTILES)
+            else:
+                sketch = var if isinstance(var, QuantileSketch) else QuantileSketch.fromChunks(var)
+
+                count = int(sketch.count)
+                na    = int(sketch.missing)
+                mean  = sketch.mean
+                std   = sketch.std
+
+                min_, pct5, pct25, pct50, pct75, pct95, max_ = sketch.quantile(DESCRIBE_PERCENTILES)
+
+            values = [count,   na,    mean,   std,   min_,  pct5,   pct25,  pct50,   pct75,    pct95, max_]
+            values = [np.round(v, decimals) for v in values]
+            #values.insert(na, 0)
+            #values.insert(count, 0)
+            index = ['count', 'NA', 'mean', 'std', 'min', 'ptc5', 'pct25', 'pct50', 'ptc75', 'pct95', 'max']
+            
+            df = pd.DataFrame({'stats':values}, index=index)
+            
+            return df
+        else:
+            raise Exception("Not implemented yet")
+
+    @classmethod
+    @staged()
+    def compactFrame(cls, df):
+        """Returns a copy of the dataset that uses the smallest dtypes that hold 
+        its values, int8 lanes and flags, int32 vehicle ids, the smallest integers 
+        for frames and float32 kinematics, and that drops the raw columns 
+        duplicated by an app specific column (e.g. locY is kept only as _locy and 
+        GlobalTime only as _time). The dropped columns are no longer columns of 
+        the frame, read them by their raw names with the raw accessor, e.g. 
+        df.raw.locY, which returns _locy without copying it. 
+
+        The second return value is a table with the bytes saved per column. 
+        """
+
+        before = df.memory_usage(index=False, deep=True)
+        dtypes = df.dtypes 
+
+        drop = [col for col, alias in COMPACT_ALIASES.items() 
+                if col in df.columns and alias in df.columns]
+        df = df.drop(drop, axis=1)
+
+        #time differences of model data are timedeltas and keep their dtype 
+        df = df.astype(dict((col, dtype) for col, dtype in COMPACT_DTYPES.items() 
+                            if col in df.columns and df[col].dtype.kind not in 'mM'))
+
+        for col in COMPACT_DOWNCAST:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], downcast='integer')
+
+        after = df.memory_usage(index=False, deep=True).reindex(before.index).fillna(0)
+
+        report = pd.DataFrame({'dtype_before':dtypes.astype(str), 
+                               'dtype_after':df.dtypes.reindex(before.index).astype(str), 
+                               'bytes_before':before, 
+                               'bytes_after':after.astype(np.int64)})
+        report.loc[drop, 'dtype_after'] = 'alias of ' + pd.Series(COMPACT_ALIASES)[drop]
+        report['bytes_saved'] = report.bytes_before - report.bytes_after
+        report.loc['total'] = ['', '', report.bytes_before.sum(), 
+                               report.bytes_after.sum(), report.bytes_saved.sum()]
+
+        return df, report 
+
+    @staticmethod
+    def _fromPrepared(df, orders, report):
+        """Returns the dataset of the rows prepared by a reader, freshly read or 
+        from the cache, with the sort orders and the compact report of the reader"""
+
+        vt = VTAnalytics(df, orders=orders)
+        vt.compactReport = report 
+
+        return vt 
+
+    @classmethod 
+    @staged()
+    def readNGISIMData(cls, fName1, start_time=None, end_time=None, chunksize=None, cache=None, 
+                       compact=False, processes=None): 
+        
+        """This function takes raw NGSIM data and prepares them for analysis
+
+        If chunksize is given the file is streamed chunksize rows at a time using 
+        an explicit dtype schema and rows outside the time window are dropped 
+        while parsing. The peak memory is then bounded by the chunk size plus the 
+        retained window instead of the size of the whole file. 
+
+        If cache is a trajectoryCache.DatasetCache the prepared dataset is stored 
+        in it and later calls with the same file and time window read it from there. 
+
+        If compact is True the dataset is converted with compactFrame and the 
+        bytes saved per column are available in the compactReport attribute. 
+
+        If processes is more than 1 the kinematics are calculated by that many 
+        processes split by vehicle, and the gaps, time to collision and neighbour 
+        vehicles split by (lane, time) frame. The result is the same as the one 
+        of the serial calculation. 
+        """
+
+        if cache is not None:
+            key = cache.key(fName1, 'readNGISIMData', READER_VERSION, 
+                            start_time=start_time, end_time=end_time, compact=compact)
+            with stage('cacheGet') as current:
+                cached = cache.get(key)
+                current.rows_out = None if cached is None else cached[0].shape[0]
+            if cached is not None:
+                return cls._fromPrepared(*cached)
+        
+        if chunksize:
+            ng = cls._streamNGSIMData(fName1, start_time, end_time, chunksize)
+        else:
+            with stage('parse') as current:
+                ng = pd.read_csv(fName1, 
+                                 header=None, names=NGSIM_COLUMNS, sep=r'\s+')
+                current.rows_out = ng.shape[0]
+
+            ng = cls._addNGSIMAliases(ng)
+
+            with stage('vehicleIds', ng.shape[0]) as current:
+                ng = ng.merge(cls._vehicleIdTable(ng[NGSIM_VEHICLE_KEYS]), on=NGSIM_VEHICLE_KEYS)
+                current.rows_out = ng.shape[0]
+        
+            #limit the dataset based on the input times 
+            with stage('timeWindow', ng.shape[0]) as current:
+                if start_time: 
+                    ng  = ng[(ng._time.values >= start_time)]
+                if end_time:
+                    ng = ng[(ng._time.values <= end_time)]
+                current.rows_out = ng.shape[0]
+
+        ng, vehicleOrder = cls._prepareNGSIMData(ng, processes)
+
+        report = None 
+        if compact:
+            ng, report = cls.compactFrame(ng)
+
+        orders = {'vehicle':vehicleOrder}
+
+        if cache is not None:
+            with stage('cachePut', ng.shape[0]):
+                cache.put(key, ng, orders, report)
+
+        return cls._fromPrepared(ng, orders, report)
+
+    @classmethod
+    @staged()
+    def _streamNGSIMData(cls, fName1, start_time, end_time, chunksize):
+        """Reads the raw NGSIM file in chunks and keeps only the rows 
+        inside the time window"""
+
+        retained = [] 
+        vehicleKeys = [] 
+
+        chunks = pd.read_csv(fName1, header=None, names=NGSIM_COLUMNS, 
+                             dtype=NGSIM_DTYPES, sep=r'\s+', 
+                             chunksize=chunksize)
+
+        with stage('parse') as current:
+            current.rows_out = 0 
+            for chunk in chunks:
+
+                #the new vehicle ids depend on all the vehicles in the file 
+                #and not only the ones inside the time window 
+                vehicleKeys.append(chunk[NGSIM_VEHICLE_KEYS].drop_duplicates())
+
+                times = chunk.GlobalTime.values / 1000 
+                mask = np.ones(chunk.shape[0], dtype=bool)
+                if start_time: 
+                    mask &= times >= start_time
+                if end_time:
+                    mask &= times <= end_time
+
+                retained.append(chunk[mask])
+                current.rows_out += chunk.shape[0]
+
+        ng = pd.concat(retained, ignore_index=True)
+        ng = cls._addNGSIMAliases(ng)
+
+        with stage('vehicleIds', ng.shape[0]) as current:
+            newVehID = cls._vehicleIdTable(pd.concat(vehicleKeys, ignore_index=True))
+            ng = ng.merge(newVehID, on=NGSIM_VEHICLE_KEYS)
+            current.rows_out = ng.shape[0]
+
+        return ng 
+
+    @staticmethod
+    def _addNGSIMAliases(ng):
+        """Adds the app specific location, length, lane and time variables"""
+
+        # define app specific variables 
+        #ng['_spd']  = ng.vehSpeed * 3600 / 5280  # _spd in miles per hour 
+        #ng['_acc']  = ng.vehAcceleration         # _acc is in feet per second squared 
+        ng['_locy'] = ng.locY  #location along the Y axis in feet 
+        ng['_vlen'] = ng.vehLength # vehicle length in feet  
+        ng['_lane'] = ng.lane 
+
+        ng['_time'] = ng.GlobalTime / 1000 #convert the time into seconds 
+
+        return ng 
+
+    @staticmethod
+    def _vehicleIdTable(keys):
+        """Returns a new vehicle id for every (VehID, TotalFrames, vehLength) 
+        combination because the one defined in the raw data is wrong"""
+
+        newVehID = (keys.drop_duplicates()
+                        .dropna()
+                        .sort_values(NGSIM_VEHICLE_KEYS)
+                        .reset_index(drop=True))
+        newVehID['_vid'] = np.arange(1, newVehID.shape[0] + 1)
+
+        return newVehID 
+
+    @classmethod
+    @staged()
+    def _prepareNGSIMData(cls, ng, processes=None):
+        """Calculates the derived NGSIM variables on the time limited dataset. 
+        Returns the prepared dataframe sorted by _lane, _time and _locy and the 
+        permutation that sorts it by _vid and _time. 
+
+        If processes is more than 1 the variables are calculated by a pool of 
+        processes, split by vehicle and by (lane, time) frame"""
+
+        ng = ng.reset_index(drop=True)
+
+        with kernelPool(processes) as pool:
+
+            #calculate dt, speed and acceleration in the (_vid, _time) order 
+            with stage('sort:vehicle', ng.shape[0]):
+                perm = np.lexsort((ng._time.values, ng._vid.values))
+
+            with stage('kinematics', ng.shape[0]):
+                vid = ng._vid.values[perm]
+                dt, spd, acc = applyByGroups(_vehicleKinematics, 
+                                             [vid, ng._time.values[perm], ng._locy.values[perm]], 
+                                             [vid], pool, processes)
+
+                #there are some records with dt greater than the 0.1 don't know why 
+                if pd.unique(dt).shape[0] > 2:
+                    print ("Error: the dataset has more than one timestep")
+                    #raise ValueError("The dataset has more than one timestep") 
+
+                ng['_dt']  = _unsort(dt, perm)
+                ng['_spd'] = _unsort(spd, perm)
+                ng['_acc'] = _unsort(acc, perm)
+
+            with stage('dropMissing', ng.shape[0]) as current:
+                keep = ng.notnull().all(axis=1).values
+                ng = ng[keep].reset_index(drop=True)
+                perm = _filterOrder(perm, keep)
+                current.rows_out = ng.shape[0]
+
+                #the time step of the kept rows, the last row of every vehicle
+                #has none because the rows after it were dropped
+                ng['_dt'] = _unsort(_forwardDifference(ng._time.values[perm], ng._vid.values[perm]), perm)
+
+            #define lane changes 
+            with stage('laneChanges', ng.shape[0]):
+                vid = ng._vid.values[perm]
+                leave, enter = applyByGroups(_laneChangeFlags, [vid, ng._lane.values[perm]], [vid], pool, processes)
+                ng['_leaveLane'] = _unsort(leave, perm)
+                ng['_enterLane'] = _unsort(enter, perm)
+
+            #calculate the gaps, time to collision and the preceding and 
+            #following vehicle ids in the (_lane, _time, _locy) order 
+            with stage('sort:lane', ng.shape[0]):
+                lanePerm = np.lexsort((ng.locY.values, ng._time.values, ng._lane.values))
+                ng = ng.take(lanePerm)
+                ng.index = np.arange(ng.shape[0])
+
+            frame = [ng._lane.values, ng._time.values]
+
+            with stage('gapsAndTTC', ng.shape[0]):
+                ng['_gap'], ng['_ttc'] = applyByGroups(_gapsAndTTC, 
+                                                       frame + [ng._locy.values, ng._vlen.values, 
+                                                                ng._spd.values], 
+                                                       frame, pool, processes)
+
+            with stage('neighbours', ng.shape[0]):
+                ng['_prV'], ng['_flV'] = applyByGroups(_neighbourVehicles, [ng._vid.values] + frame, 
+                                                       frame, pool, processes)
+
+        return ng, _inversePermutation(lanePerm)[perm]
+
+    @classmethod
+    @staged()
+    def readModelData(cls, fName1, start_time=None, end_time=None, cache=None, compact=False, 
+                      processes=None):
+
+        """This function takes the trajectories of a simulation model and prepares 
+        them for analysis. See readNGISIMData for the cache, compact and processes 
+        arguments. 
+        """
+
+        if cache is not None:
+            key = cache.key(fName1, 'readModelData', READER_VERSION, 
+                            start_time=start_time, end_time=end_time, compact=compact)
+            with stage('cacheGet') as current:
+                cached = cache.get(key)
+                current.rows_out = None if cached is None else cached[0].shape[0]
+            if cached is not None:
+                return cls._fromPrepared(*cached)
+
+        with stage('parse') as current:
+            ai = pd.read_hdf(fName1, 'trajectories')
+            current.rows_out = ai.shape[0]
+
+        ai = cls._addModelAliases(ai)
+
+        with stage('timeWindow', ai.shape[0]) as current:
+            if start_time:
+                ai = ai[ai._time.values >= start_time]
+
+            if end_time:
+                ai = ai[ai._time.values <= end_time]
+            current.rows_out = ai.shape[0]
+
+        ai, vehicleOrder = cls._prepareModelData(ai, processes)
+
+        report = None 
+        if compact:
+            ai, report = cls.compactFrame(ai)
+
+        orders = {'vehicle':vehicleOrder}
+
+        if cache is not None:
+            with stage('cachePut', ai.shape[0]):
+                cache.put(key, ai, orders, report)
+
+        return cls._fromPrepared(ai, orders, report)
+
+    @staticmethod
+    def _addModelAliases(ai):
+        """Adds the app specific vehicle id, time, location and lane variables"""
+
+        ai['_vid']  = np.array(ai.oid, np.int64)
+        ai['_time'] = ai.time
+        ai['_locy'] = ai.dist_along
+        ai['_lane'] = 8 - ai['laneIndex']
+
+        return ai 
+
+    @classmethod
+    @staged()
+    def _prepareModelData(cls, ai, processes=None):
+        """Calculates the derived model variables on the time limited dataset. 
+        Returns the prepared dataframe sorted by _lane, _time and _locy and the 
+        permutation that sorts it by _vid and _time. See _prepareNGSIMData for 
+        processes"""
+
+        with kernelPool(processes) as pool:
+
+            #calculate the time step and the lane change variables 
+            #in the (_vid, _time) order 
+            with stage('sort:vehicle', ai.shape[0]):
+                perm = np.lexsort((ai._time.values, ai._vid.values))
+                vid = ai._vid.values[perm]
+
+            with stage('laneChanges', ai.shape[0]):
+                ai['_dt'] = _unsort(_forwardDifference(ai._time.values[perm], vid), perm)
+
+                leave, enter = applyByGroups(_laneChangeFlags, [vid, ai._lane.values[perm]], [vid], pool, processes)
+                ai['_leaveLane'] = _unsort(leave, perm)
+                ai['_enterLane'] = _unsort(enter, perm)
+
+            with stage('sort:lane', ai.shape[0]):
+                lanePerm = np.lexsort((ai._locy.values, ai._time.values, ai._lane.values))
+                ai = ai.take(lanePerm)
+                ai.index = np.arange(ai.shape[0])
+                vehicleOrder = _inversePermutation(lanePerm)[perm]
+
+            frame = [ai._lane.values, ai._time.values]
+
+            with stage('neighbours', ai.shape[0]):
+                ai['_prV'], ai['_flV'] = applyByGroups(_neighbourVehicles, [ai._vid.values] + frame, 
+                                                       frame, pool, processes)
+
+        ai['_spd'] = ai.speed
+        ai['_acc'] = ai.acceleration
+
+        return ai, vehicleOrder 
+
+    @classmethod
+    @staged()
+    def openColumnStore(cls, directory, space_bin=50, time_bin=10):
+        """Opens a dataset saved with saveColumnStore. The columns are memory 
+        mapped so several processes can share the same dataset"""
+
+        store = ColumnStore(directory)
+        orders = dict((name, store.order(name)) for name in store.orders)
+
+        return VTAnalytics(store.frame(), space_bin=space_bin, time_bin=time_bin, 
+                           orders=orders)
+
+    #the sort orders shared by the methods. Every order is calculated once 
+    #as a permutation array and the dataframe itself is never re-sorted 
+    ORDERS = {'vehicle':['_vid', '_time'], 
+              'lane':['_lane', '_time', '_locy']}
+
+    @staged()
+    def __init__(self, df, space_bin=50, time_bin=10, orders=None, 
+                 base_space_bin=None, base_time_bin=None):
+
+        """orders is an optional dictionary with precalculated permutation arrays 
+        of the sort orders in ORDERS, e.g. {'vehicle':perm} where perm sorts df by 
+        _vid and _time. 
+
+        base_space_bin and base_time_bin are the bins of the MacroCube the 
+        macroscopic variables are calculated from. They default to space_bin 
+        and time_bin. 
+        """
+
+        assert '_spd' in df.columns
+        assert '_acc' in df.columns 
+
+        self.df = df
+        self.compactReport = None 
+
+        self._orders = dict(orders or {})
+        self._bounds = {}
+        self._ordersFrame = df 
+
+        with stage('timeStep', df.shape[0]):
+            self._calculateTimeStep() 
+
+        self.space_bin = space_bin
+        self.time_bin  = time_bin 
+        self.numLanes = self.df._lane.max() 
+
+        self.macroCube = None 
+        self._df_macro = None 
+        if base_space_bin or base_time_bin:
+            with stage('macroCube', df.shape[0]):
+                self.macroCube = MacroCube.fromFrame(self.df, base_space_bin or space_bin, 
+                                                     base_time_bin or time_bin)
+        
+        self.recalculateMacroVars(space_bin, time_bin) 
+
+    def __add__(self, other):
+
+        return VTAnalytics(pd.concat([self.df, other.df]))
+
+    @staged()
+    def saveColumnStore(self, directory):
+        """Saves the dataset as a column store of memory mapped arrays together 
+        with its vehicle (_vid, _time) and lane (_lane, _time, _locy) orders"""
+
+        df = self.df.drop(['_spacebin', '_timebin'], axis=1, errors='ignore')
+
+        return ColumnStore.create(df, directory, 
+                                  orders=dict((name, self._order(name)) for name in self.ORDERS))
+
+    def _order(self, name):
+        """Returns the permutation array that sorts self.df by ORDERS[name]. The 
+        permutation is calculated once and reused until self.df is replaced"""
+
+        if self._ordersFrame is not self.df:
+            self._orders, self._bounds = {}, {}
+            self._ordersFrame = self.df 
+
+        if name not in self._orders:
+            #lexsort uses the last key as the primary one
+            with stage('sort:' + name, self.df.shape[0]):
+                keys = [self.df[k].values for k in reversed(self.ORDERS[name])]
+                self._orders[name] = np.lexsort(keys)
+
+        return self._orders[name]
+
+    def _groupBounds(self, name):
+        """Returns the start and end offsets, in the positions of the order, of every 
+        vehicle for the 'vehicle' order and of every (lane, time) for the 'lane' order"""
+
+        perm = self._order(name)
+
+        if name not in self._bounds:
+            keys = [self.df[k].values[perm] for k in self.ORDERS[name][:-1]]
+            starts = _groupStarts(*keys)
+            self._bounds[name] = starts, np.append(starts[1:], perm.shape[0])
+
+        return self._bounds[name]
+
+    def _calculateTimeStep(self):
+        """Calculates the _dt column, unless the dataset already has one (the 
+        readers and the column store provide it, and a memory mapped store must 
+        not get a private copy of the column), and the time step"""
+
+        if '_dt' not in self.df.columns:
+            perm = self._order('vehicle')
+
+            sortedDt = _forwardDifference(self.df._time.values[perm], self.df._vid.values[perm])
+            dt = np.empty_like(sortedDt)
+            dt[perm] = sortedDt 
+
+            #a compact dataset keeps its time differences compact too 
+            if dt.dtype.kind == 'f' and self.df._spd.dtype == COMPACT_DTYPES['_spd']:
+                dt = dt.astype(COMPACT_DTYPES['_dt'])
+
+            self.df['_dt'] = dt 
+
+        #there are some records with dt greater than the 0.1 don't know why 
+
+        if self.df._dt.unique().shape[0] > 2:
+            print("ERROR: The dataset has more than one time step")
+            #raise ValueError("The dataset has more than one timestep") 
+
+        self.time_step = self.df._dt.dropna().unique()[0]
+
+    @staged()
+    def resample(self, timeStep, how='mean'):
+        """returns a new dataset with resampled speed, acceleration, and location along 
+        the corridor based on the given time step
+
+        The time step is given in seconds (sub-second steps are allowed), as a 
+        timedelta or as a pandas frequency string such as '1s'. how is one of 
+        'mean' (the mean of the samples in every time bin), 'last' (the last 
+        sample in every time bin) or 'linear' (linear interpolation at the 
+        multiples of the time step). All vehicles are resampled in a single 
+        vectorized pass."""
+        
+        perm = self._order('vehicle')
+        times = self.df._time.values[perm]
+        ticks, ticksPerSecond = _timeTicks(times)
+        stepTicks = _timeStepInTicks(timeStep, ticksPerSecond)
+
+        columns = ['_acc', '_spd', '_locy']
+        vid, ticks, values = _resampleSorted(self.df._vid.values[perm], ticks, 
+                                             dict((c, self.df[c].values[perm]) for c in columns), 
+                                             stepTicks, how)
+
+        df1s = pd.DataFrame({'_time':_ticksToTime(ticks, ticksPerSecond, times)})
+        for c in columns:
+            df1s[c] = values[c]
+        df1s['_vid'] = vid 
+
+        df1s = df1s.dropna()
+        
+        return df1s 
+
+    def _laneIndex(self):
+        """Returns the lane and time of every (lane, time) group of the lane order 
+        and a key that sorts the rows of the lane order by group and location"""
+
+        perm = self._order('lane')
+        starts, ends = self._groupBounds('lane')
+
+        if 'laneIndex' not in self._bounds:
+            groupLane = self.df._lane.values[perm[starts]]
+            groupTime = self.df._time.values[perm[starts]]
+            self._bounds['laneIndex'] = groupLane, groupTime 
+
+        return self._bounds['laneIndex']
+
+    def _locationKey(self):
+        """Returns the group number plus the scaled location of every row of the 
+        lane order. The key increases along the lane order so one binary search 
+        finds a location inside any (lane, time) group"""
+
+        if 'locationKey' not in self._bounds:
+            perm = self._order('lane')
+            starts, ends = self._groupBounds('lane')
+
+            locy = np.asarray(self.df._locy.values[perm], dtype=np.float64)
+            low, span = locy.min(), locy.max() - locy.min() + 1.0
+            group = np.repeat(np.arange(starts.shape[0]), ends - starts)
+
+            self._bounds['locationKey'] = group + (locy - low) / span, low, span 
+
+        return self._bounds['locationKey']
+
+    @staged()
+    def window(self, lane, start_time, end_time, start_dist=None, end_dist=None):
+        """Returns the rows of a lane between the start and end time (inclusive) and 
+        optionally between the start and end distance along the corridor (inclusive). 
+
+        The rows are found with binary searches on the lane order, so the cost 
+        depends on the size of the window and not on the size of the dataset. 
+        Without distance limits the rows of the window are contiguous in the lane 
+        order and when self.df is physically in that order, as it is for the data 
+        returned by the readers, the result is a view of self.df that does not 
+        copy any data. 
+        """
+
+        perm = self._order('lane')
+        starts, ends = self._groupBounds('lane')
+        groupLane, groupTime = self._laneIndex()
+
+        laneStart = np.searchsorted(groupLane, lane, side='left')
+        laneEnd = np.searchsorted(groupLane, lane, side='right')
+
+        g0 = laneStart + np.searchsorted(groupTime[laneStart:laneEnd], start_time, side='left')
+        g1 = laneStart + np.searchsorted(groupTime[laneStart:laneEnd], end_time, side='right')
+
+        if g0 >= g1:
+            return self.df.iloc[0:0]
+
+        if start_dist is None and end_dist is None:
+
+            first, last = starts[g0], ends[g1 - 1]
+
+            if 'physical' not in self._bounds:
+                self._bounds['physical'] = np.array_equal(perm, np.arange(perm.shape[0]))
+
+            if self._bounds['physical']:
+                return self.df.iloc[first:last]
+
+            return self.df.take(perm[first:last])
+
+        key, low, span = self._locationKey()
+        groups = np.arange(g0, g1)
+
+        lo = starts[groups]
+        hi = ends[groups]
+        if start_dist is not None:
+            lo = np.searchsorted(key, groups + max(start_dist - low, 0) / span, side='left')
+        if end_dist is not None:
+            hi = np.searchsorted(key, groups + min(end_dist - low, span - 0.5) / span, side='right')
+            hi = np.minimum(hi, ends[groups])
+
+        lo = np.maximum(lo, starts[groups])
+        sizes = np.maximum(hi - lo, 0)
+
+        #expand the row ranges of the groups into positions of the lane order
+        positions = (np.repeat(lo - np.cumsum(sizes) + sizes, sizes) + 
+                     np.arange(sizes.sum()))
+
+        return self.df.take(perm[positions])
+
+    def speedHistogram(self, lower=None, upper=None):
+        """Returns the HistogramAccumulator of the speed in 1 mph bins"""
+
+        edges = _speedEdges(self.df._spd.min(), self.df._spd.max(), lower, upper)
+
+        return HistogramAccumulator.fromValues(self.df._spd.values, edges)
+
+    def accelerationHistogram(self, lower=None, upper=None):
+        """Returns the HistogramAccumulator of the acceleration in 1 fpss bins"""
+
+        edges = _accelerationEdges(self.df._acc.min(), self.df._acc.max(), lower, upper)
+
+        return HistogramAccumulator.fromValues(self.df._acc.values, edges)
+
+    def ttcHistogram(self):
+        """Returns the HistogramAccumulator of the time to collision in TTC_BINS. 
+        Its total counts all the rows, also those without a time to collision"""
+
+        return HistogramAccumulator.fromValues(self.df._ttc.values, TTC_BINS)
+
+    @staged()
+    def getTTCDistribution(self):
+
+        histogram = self.ttcHistogram()
+
+        return _ttcFrequencies(histogram.counts, TTC_BINS, histogram.total)
+
+    @staged()
+    def calculateCorridorTravelTimes(self):
+        
+        perm = self._order('vehicle')
+        starts, ends = self._groupBounds('vehicle')
+        first, last = perm[starts], perm[ends - 1]
+
+        cor_times = pd.DataFrame({'_vid':self.df._vid.values[first], 
+                                  'start':self.df._time.values[first], 
+                                  'startDist':self.df._locy.values[first], 
+                                  'end':self.df._time.values[last], 
+                                  'endDist':self.df._locy.values[last]})
+        
+        return _corridorSpeeds(cor_times)
+
+    @staged()
+    def getAccelerationJerk(self, timeStep=1):
+        """returns a new dataset with jerk values for the given time step in seconds. 
+
+        The speed, acceleration and location are first resampled with the mean of 
+        every time bin and the jerk is the change of the acceleration between 
+        consecutive bins divided by the time step. If timeStep is None the jerk is 
+        calculated between consecutive samples at the native resolution. All the 
+        vehicles are processed in a single pass and self.df is not modified."""
+        
+        perm = self._order('vehicle')
+        times = self.df._time.values[perm]
+        ticks, ticksPerSecond = _timeTicks(times)
+        vid = self.df._vid.values[perm]
+
+        columns = ['_acc', '_spd', '_locy']
+        values = dict((c, np.asarray(self.df[c].values[perm], dtype=np.float64)) for c in columns)
+
+        if timeStep is not None:
+            stepTicks = _timeStepInTicks(timeStep, ticksPerSecond)
+            vid, ticks, values = _resampleSorted(vid, ticks, values, stepTicks, 'mean')
+
+        dt = _forwardDifference(ticks, vid) / ticksPerSecond 
+
+        #the jerk is only defined between adjacent time bins 
+        if timeStep is not None:
+            dt[dt * ticksPerSecond != stepTicks] = np.nan
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            jerk = _forwardDifference(values['_acc'], vid) / dt 
+
+        df1s = pd.DataFrame({'_time':_ticksToTime(ticks, ticksPerSecond, times)})
+        for c in columns:
+            df1s[c] = values[c]
+        df1s['_vid'] = vid 
+        df1s['_jerk'] = jerk 
+
+        self.df1s = df1s.dropna()
+        
+        return self.df1s 
+
+    @staged()
+    def getARMSDistribution(self, speedbin=5):
+        """Calculates ARMS for each speed bin"""
+
+        speedBins = np.array(self.df._spd, np.int64) // speedbin * speedbin 
+        stat = BinnedStatistic().fill(speedBins, self.df._acc.values)
+
+        return _armsTable(stat)
+
+    def calculateSpaceMeanSpeedAndDensity(self, time_bin, space_bin):
+        
+        raise Exeption() 
+        """time_bin in seconds 
+        space_bin in feet """
+
+        df['_spacebin'] = np.array(df._locy // space_bin, np.int64)
+        df['_timebin'] = pd.to_datetime(((ng._time.astype(np.int64) // 
+                                         (time_bin * 1e9) ) * (time_bin * 1e9) ))
+        
+        df_hm = (df.groupby(['_lane', '_spacebin', '_timebin'])['_spd']
+                          .aggregate([np.mean, np.size]))
+
+        df_hm = (df_hm.reset_index()
+                      .rename(columns={'size':'density', 'mean':'speed', '_lane':'_lane'}) ) 
+
+        mi = pd.MultiIndex.from_product([sorted(df._lane.unique()), 
+                                         sorted(df._spacebin.unique()), 
+                                         df._timebin.unique()], 
+                                         names=['_lane', '_spacebin', '_timebin'])
+        mi = pd.DataFrame(index=mi)
+        mi.reset_index(inplace=True)
+
+        df_hm = df_hm.merge(mi, on=['_lane', '_spacebin', '_timebin'], how='right')
+        df_hm = df_hm.set_index(['_lane', '_spacebin', '_timebin'])
+
+
+        ### the simulation time step is 0.1 seconds this is why I am multiplying by 10 below 
+        ##TODO change the 10 
+        df_hm['density'] = df_hm['density'] * (5280 / space_bin) / (time_bin * 10)
+        
+        return df_hm 
+
+    def _macroCubeFor(self, space_bin, time_bin):
+        """Returns the trimmed MacroCube for the given bins"""
+
+        if self.macroCube is None or not self.macroCube.isMultiple(space_bin, time_bin):
+            with stage('macroCube', self.df.shape[0]):
+                self.macroCube = MacroCube.fromFrame(self.df, space_bin, time_bin)
+
+        return self.macroCube.coarsen(space_bin, time_bin).trim()
+
+    @staged()
+    def recalculateMacroVars(self, space_bin, time_bin):
+
+        """Recalculates the macroscopic fundamental variables
+        time_bin in seconds 
+        space_bin in feet 
+
+        The variables are calculated from a MacroCube. When the bins are integer 
+        multiples of the bins of the current cube the raw trajectories are not 
+        touched, so sweeping over coarser bins is cheap. Use base_space_bin and 
+        base_time_bin in the constructor to start from a fine cube. 
+
+        The (lane x space bin x time bin) arrays of the variables are in 
+        self.macroVars and df_macro is the same data as a dataframe. 
+        """
+
+        self.space_bin = space_bin
+        self.time_bin  = time_bin 
+
+        self.macro = self._macroCubeFor(space_bin, time_bin)
+        self.macroVars = self.macro.variables(_durationInSeconds(self.time_step))
+        self._df_macro = None 
+
+    @property
+    def df_macro(self):
+        """The macroscopic variables as a dataframe indexed by lane, space bin and time bin"""
+
+        if self._df_macro is None:
+            self._df_macro = self.macro.toFrame(_durationInSeconds(self.time_step))
+
+        return self._df_macro 
+
+    @staged()
+    def recalculateLaneChangeRates(self, space_bin, time_bin):
+
+        """Recalculates the lane change rates 
+        """
+
+        self.space_bin = space_bin
+        self.time_bin  = time_bin 
+
+        cube = self._macroCubeFor(space_bin, time_bin)
+        leave = cube.variables(_durationInSeconds(self.time_step))['numVehiclesLeavingLane']
+
+        laneChangeRates = pd.DataFrame(index=cube.index())
+        laneChangeRates['_leaveLane'] = leave.ravel()
+
+        self.df_lcr = laneChangeRates.reset_index()
+
+    @staged()
+    def getNumOfLaneChangesPerLane(self):
+        """Returns a table with the number of lane changes
+        """ 
+
+        tmp = self.df.groupby('_lane')['_leaveLane'].sum().to_frame().reset_index()
+        tmp.rename(columns={'_leaveLane':"NumOfVehiclesLeavingLane"}, inplace=True)
+        tmp['NumOfVehiclesEnteringLane'] = self.df.groupby('_lane')['_enterLane'].sum().to_frame().reset_index()['_enterLane']
+        
+        return tmp 
+
+    @staged()
+    def getDetectorData(self, stations, interval=60, loop_length=0, vehicle_length=None):
+        """Returns the count, flow, time mean and space mean speed and occupancy 
+        of virtual loop detectors at the stations (feet along the corridor) by 
+        lane and interval of interval seconds, see virtualDetectors.VirtualDetectors"""
+
+        #virtualDetectors imports this module
+        from virtualDetectors import VirtualDetectors
+
+        detectors = VirtualDetectors(stations, interval, loop_length, vehicle_length)
+
+        return detectors.fill(self.df, self._order('vehicle')).toFrame()
+ 
+def __getattr__(name):
+
+    #the pdf report moved to the reporting layer, which imports reportlab 
+    if name in ('PdfReport', 'figureToBytes'):
+        import reportPipeline
+        return getattr(reportPipeline, name)
+
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+class Directory:
+
+    pass 
+
+    def __init__(self):
+
+        pass 
+
+
+class Results:
+
+    def __init__(self):
+
+        pass 
+
+    def execute(self):
+
+        start_time = np.datetime64('2005-04-13 17:00:00')
+        end_time   = np.datetime64('2005-04-13 17:30:00')
+
+        print('reading the data')
+        fileName = "./data/ngsimI80trajectories 0500-0530.txt"
+
+        self._outputDir = Directory()
+
+        self._outputDir.value = './results'
+
+        #self.vt = VTAnalytics.readNGISIMData(fileName, 
+        #    start_time=start_time, 
+        #    end_time=end_time)
+
+
+        self.vt = VTAnalytics.readModelData("./data/ai21.hdf",
+                              start_time=start_time, end_time=end_time, 
+                              cache=DatasetCache("./data/.vtacache"))
+
+        self.data = self.vt.df 
+        
+        print('done reading the data')
+
+        #the charts are rendered in parallel by the report pipeline and
+        #charts whose data and parameters did not change are reused
+        from reportPipeline import buildReport
+        from trajectoryCache import ArtifactCache
+        buildReport(self.vt, self._outputDir.value,
+                    cache=ArtifactCache(os.path.join(self._outputDir.value, ".artifacts")))
+
+        file_list = [os.path.join(self._outputDir.value, "graph%d.pdf" % i)
+                          for i in range(1,5)]
+
+
+        print('done')
+
+if __name__ == "__main__":
+
+
+    r = Results()
+
+    r.execute() 
+
+
+#http://matplotlib.org/sampledoc/index.html
+#https://pythonhosted.org/an_example_pypi_project/sphinx.html#full-code-example
+#https://pythonhosted.org/an_example_pypi_project/pkgcode.html
+#http://www.sphinx-doc.org/en/stable/ext/autodoc.html
+
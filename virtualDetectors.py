@@ -0,0 +1,236 @@
+"""Virtual loop detectors at arbitrary stations along the corridor.
+
+VirtualDetectors finds every crossing of a list of stations (positions in feet
+along the corridor) between consecutive samples of every vehicle, interpolates
+the time and the speed of the crossing and aggregates the crossings by
+station, lane and time interval into the outputs of a loop detector: count,
+flow, time mean and space mean speed and occupancy.
+
+All the crossings of a frame are found in one vectorized pass: the stations
+between two consecutive samples are located with searchsorted and expanded
+with np.repeat, so there is no loop over vehicles or stations. Frames can be
+filled one after another in time order, e.g. the slabs of a partitioned
+dataset or the steps of a simulation, because the last sample of every vehicle
+is kept to find the crossings between two frames.
+
+>>> detectors = VirtualDetectors([1000, 1500, 2000], interval=60)
+>>> detectors.fill(vt.df)
+>>> detectors.toFrame()
+"""
+
+import numpy as np              # numerical computing with arrays
+import pandas as pd             # dataframe as in R
+
+from binnedStatistics import BinnedStatistic
+from groupedArrays import _groupStarts
+from vehicleTrajectoryAnalytics import _timeTicks, _timeStepInTicks, _ticksToTime
+
+#the columns of the samples that are interpolated at a crossing
+SAMPLE_COLUMNS = ['vid', 'ticks', 'locy', 'lane', 'spd', 'vlen']
+
+
+def _stationCrossings(y0, y1, stations):
+    """Returns the pair and the station of every crossing and the fraction of
+    the way from y0 to y1 at which the station is crossed. A station s is
+    crossed by a pair of samples when y0 < s <= y1"""
+
+    lo = np.searchsorted(stations, y0, side='right')
+    hi = np.searchsorted(stations, y1, side='right')
+
+    #missing locations and vehicles that move backwards do not cross
+    n = np.where(np.isnan(y0) | np.isnan(y1), 0, np.maximum(hi - lo, 0))
+
+    pair = np.repeat(np.arange(n.shape[0]), n)
+    station = np.repeat(lo, n) + np.arange(pair.shape[0]) - np.repeat(np.cumsum(n) - n, n)
+
+    frac = (stations[station] - y0[pair]) / (y1[pair] - y0[pair])
+
+    return pair, station, frac
+
+
+class VirtualDetectors(object):
+    """Point detectors at the stations (feet along the corridor) that aggregate
+    the crossings in time intervals of interval seconds.
+
+    The occupancy is the share of the interval during which a vehicle is over a
+    detector of loop_length feet. It uses the _vlen column, or vehicle_length
+    for datasets without one, and is missing when neither is available.
+    """
+
+    def __init__(self, stations, interval=60, loop_length=0, vehicle_length=None):
+
+        self.stations = np.unique(np.asarray(stations, dtype=np.float64))
+        self.interval = interval
+        self.loop_length = loop_length
+        self.vehicle_length = vehicle_length
+
+        self.crossings = 0
+
+        #the speeds, the inverse speeds and the occupied seconds of the crossings
+        #of every (station, lane, interval)
+        self._speed = BinnedStatistic()
+        self._pace = BinnedStatistic()
+        self._occupied = BinnedStatistic()
+
+        self._ticksPerSecond = None
+        self._datetimes = None
+
+        #the last sample of every vehicle that can still cross a station, sorted by vehicle id
+        self._state = dict((key, np.zeros(0, dtype=np.int64 if key in ('vid', 'ticks', 'lane')
+                                          else np.float64)) for key in SAMPLE_COLUMNS)
+
+    def _samples(self, df, order=None):
+        """Returns the columns of the samples sorted by vehicle and time"""
+
+        ticks, ticksPerSecond = _timeTicks(df._time.values)
+        if self._ticksPerSecond is None:
+            self._ticksPerSecond = ticksPerSecond
+            self._datetimes = df._time.values.dtype.kind == 'M'
+
+        if '_vlen' in df.columns:
+            vlen = np.asarray(df._vlen.values, dtype=np.float64)
+        else:
+            vlen = np.full(df.shape[0], np.nan if self.vehicle_length is None else self.vehicle_length)
+
+        samples = {'vid':np.asarray(df._vid.values, dtype=np.int64),
+                   'ticks':ticks,
+                   'locy':np.asarray(df._locy.values, dtype=np.float64),
+                   'lane':np.asarray(df._lane.values, dtype=np.int64),
+                   'spd':np.asarray(df._spd.values, dtype=np.float64),
+                   'vlen':vlen}
+
+        if order is None:
+            order = np.lexsort((ticks, samples['vid']))
+
+        return dict((key, values[order]) for key, values in samples.items())
+
+    def _crossingsOf(self, df, order=None):
+        """Returns the interpolated crossings of the samples of df and of the
+        last samples of the previous frames and keeps the last sample of every
+        vehicle that can still cross a station"""
+
+        samples = self._samples(df, order)
+        vid = samples['vid']
+        starts = _groupStarts(vid)
+
+        #the last sample of a previous frame and the first sample of the vehicle
+        state = self._state
+        found = np.zeros(starts.shape[0], dtype=bool)
+        pos = np.zeros(starts.shape[0], dtype=np.int64)
+        if state['vid'].shape[0]:
+            pos = np.minimum(np.searchsorted(state['vid'], vid[starts]), state['vid'].shape[0] - 1)
+            found = state['vid'][pos] == vid[starts]
+
+        #and consecutive samples of a vehicle within the frame
+        same = np.flatnonzero(vid[1:] == vid[:-1])
+
+        first = dict((key, np.concatenate([state[key][pos[found]], samples[key][same]]))
+                     for key in SAMPLE_COLUMNS)
+        second = dict((key, np.concatenate([samples[key][starts[found]], samples[key][same + 1]]))
+                      for key in SAMPLE_COLUMNS)
+
+        pair, station, frac = _stationCrossings(first['locy'], second['locy'], self.stations)
+
+        def interpolate(key):
+            v0, v1 = first[key][pair], second[key][pair]
+            return v0 + frac * (v1 - v0)
+
+        crossings = {'vid':first['vid'][pair],
+                     'station':station,
+                     'lane':np.where(frac < 0.5, first['lane'][pair], second['lane'][pair]),
+                     'ticks':interpolate('ticks'),
+                     'spd':interpolate('spd'),
+                     'vlen':first['vlen'][pair]}
+
+        self._updateState(samples, starts)
+
+        return crossings
+
+    def _updateState(self, samples, starts):
+        """Keeps the last sample of every vehicle, sorted by vehicle id, unless it
+        is beyond the last station"""
+
+        last = np.append(starts[1:], samples['vid'].shape[0]) - 1
+        new = dict((key, samples[key][last]) for key in SAMPLE_COLUMNS)
+
+        keep = ~np.isin(self._state['vid'], new['vid'])
+        new = dict((key, np.concatenate([self._state[key][keep], new[key]])) for key in new)
+
+        order = np.argsort(new['vid'], kind='stable')
+        active = ~(new['locy'][order] >= self.stations[-1])
+
+        self._state = dict((key, values[order][active]) for key, values in new.items())
+
+    def fill(self, df, order=None):
+        """Adds the crossings of the samples of df, a frame with the _vid, _time,
+        _locy, _lane and _spd columns. Frames must be filled in time order. order
+        is an optional permutation that sorts df by _vid and _time, e.g.
+        vt._order('vehicle'). Returns self"""
+
+        if df.shape[0] == 0 or self.stations.shape[0] == 0:
+            return self
+
+        c = self._crossingsOf(df, order)
+        self.crossings += c['vid'].shape[0]
+
+        intervalTicks = _timeStepInTicks(self.interval, self._ticksPerSecond)
+        keys = [c['station'], c['lane'], np.floor(c['ticks'] / intervalTicks).astype(np.int64)]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            moving = np.where(c['spd'] > 0, c['spd'], np.nan)
+            occupied = (c['vlen'] + self.loop_length) / (moving * 5280 / 3600)
+
+            self._speed.fill(keys, c['spd'])
+            self._pace.fill(keys, 1 / moving)
+            self._occupied.fill(keys, occupied)
+
+        return self
+
+    def toFrame(self):
+        """Returns the count, the flow (vehicles per hour), the time mean and the
+        space mean speed (mph) and the occupancy (%) of every station, lane and
+        interval with crossings"""
+
+        stations, lanes, intervals = self._speed.bins or [np.zeros(0, dtype=np.int64)] * 3
+
+        ticksPerSecond = self._ticksPerSecond or 10**6
+        intervalTicks = _timeStepInTicks(self.interval, ticksPerSecond)
+        if self._datetimes:
+            starts = pd.to_datetime(intervals * intervalTicks)
+        else:
+            starts = intervals * intervalTicks / float(ticksPerSecond)
+
+        index = pd.MultiIndex.from_arrays([self.stations[stations], lanes, starts],
+                                          names=['station', '_lane', '_interval'])
+
+        duration = intervalTicks / float(ticksPerSecond)
+        count = self._speed.count
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            df = pd.DataFrame({'count':count.astype(np.int64),
+                               'flow':count * 3600 / duration,
+                               'speed':self._speed.mean,
+                               'space_mean_speed':self._pace.n / self._pace.sum,
+                               'occupancy':np.where(self._occupied.n > 0,
+                                                    self._occupied.sum / duration * 100, np.nan)},
+                              index=index)
+
+        return df
+
+
+def findCrossings(df, stations, order=None):
+    """Returns a table with the vehicle, station, lane, time and speed of every
+    crossing of the stations by the samples of df"""
+
+    detectors = VirtualDetectors(stations)
+    if df.shape[0] == 0 or detectors.stations.shape[0] == 0:
+        return pd.DataFrame(columns=['_vid', 'station', '_lane', '_time', '_spd'])
+
+    c = detectors._crossingsOf(df, order)
+
+    return pd.DataFrame({'_vid':c['vid'],
+                         'station':detectors.stations[c['station']],
+                         '_lane':c['lane'],
+                         '_time':_ticksToTime(np.round(c['ticks']), detectors._ticksPerSecond,
+                                              df._time.values),
+                         '_spd':c['spd']})